@@ -1,12 +1,14 @@
 from flask import Flask, request, jsonify, Response
 import os
+import hmac
 import logging
 import json
 import time
 from typing import Dict, Any
 
-from config import CONFIG, MCP_ERROR_CODES, DEFAULT_CORS_ORIGIN, PORT
+from config import CONFIG, MCP_ERROR_CODES, DEFAULT_CORS_ORIGIN, PORT, CACHE_ADMIN_TOKEN, CACHE_ADMIN_TOOLS
 from yuque_client import YuqueMCPClient
+from cache import cache_manager
 from utils.formatters import *
 
 app = Flask(__name__)
@@ -525,6 +527,36 @@ def handle_tools_list(data):
         }
     ]
     
+    # 缓存管理工具，需要 CACHE_ADMIN_TOOLS=true；预热由异步服务提供
+    if CACHE_ADMIN_TOOLS:
+        tools.extend([
+            {
+                "name": "cache_hot_keys",
+                "description": "列出最热的缓存键及剩余过期时间",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "limit": {"type": "integer", "description": "返回的键数量，默认20"},
+                        "sort": {"type": "string", "enum": ["hits", "size"], "description": "按命中次数或大小排序"}
+                    }
+                }
+            },
+            {
+                "name": "cache_purge",
+                "description": "按知识库、文档、团队或当前 Token 清除缓存",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "namespace": {"type": "string", "description": "知识库命名空间，未指定 doc 时清除整个知识库"},
+                        "repo_id": {"type": "integer", "description": "知识库 ID，与 namespace 对应的缓存一并清除（可选，未提供时从缓存中查找）"},
+                        "doc": {"type": "string", "description": "文档 slug 或 ID（需要同时提供 namespace 或 repo_id）"},
+                        "group": {"type": "string", "description": "团队登录名"},
+                        "own_token": {"type": "boolean", "description": "清除当前 Token 的私有缓存"}
+                    }
+                }
+            }
+        ])
+    
     return jsonify({
         "jsonrpc": "2.0",
         "id": data.get("id"),
@@ -541,6 +573,17 @@ def handle_tools_call(data):
     
     logger.info(f"调用工具: {tool_name}, 参数: {arguments}")
     
+    # 缓存管理工具影响所有租户，与 HTTP 管理接口一样需要请求头 X-Admin-Token
+    if CACHE_ADMIN_TOOLS and tool_name in ("cache_hot_keys", "cache_purge") and not is_admin_request():
+        return jsonify({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32002,
+                "message": "权限不足：缓存管理工具需要有效的 X-Admin-Token 请求头"
+            }
+        }), 403
+    
     # 获取 Token 并创建客户端
     try:
         token = get_yuque_token()
@@ -562,7 +605,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_user_info(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_user_info(result))}]
                 }
             })
         
@@ -573,7 +616,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_user_info(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_user_info(result))}]
                 }
             })
         
@@ -583,7 +626,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_repos_list(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                 }
             })
         
@@ -594,7 +637,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_repos_list(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                 }
             })
         
@@ -605,7 +648,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_repos_list(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                 }
             })
         
@@ -616,7 +659,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_repo_info(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_repo_info(result))}]
                 }
             })
         
@@ -688,7 +731,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_docs_list(result, namespace)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_docs_list(result, namespace))}]
                 }
             })
         
@@ -697,21 +740,14 @@ def handle_tools_call(data):
             slug = arguments["slug"]
             raw = arguments.get("raw", False)  # 支持 raw 参数
             
-            # 获取文档内容
-            result = yuque_client.get_doc(namespace, slug, raw=raw)
-            
-            # 获取知识库信息（用于显示完整元数据）
-            repo_info = None
-            try:
-                repo_info = yuque_client.get_repo(namespace)
-            except Exception as e:
-                logger.warning(f"获取知识库信息失败: {e}")
+            # 获取文档内容及知识库信息（用于显示完整元数据），两者的缓存一次批量读取
+            result, repo_info = yuque_client.get_doc_with_repo(namespace, slug, raw=raw)
             
             return jsonify({
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_doc_content(result, repo_info, namespace, slug, include_full=True)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_doc_content(result, repo_info, namespace, slug, include_full=True))}]
                 }
             })
         
@@ -724,7 +760,7 @@ def handle_tools_call(data):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_doc_content(result, include_full=True)}]
+                        "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_doc_content(result, include_full=True))}]
                     }
                 })
             except ValueError as e:
@@ -774,7 +810,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_doc_versions(result, doc_id)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_doc_versions(result, doc_id))}]
                 }
             })
         
@@ -785,7 +821,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_doc_version_detail(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_doc_version_detail(result))}]
                 }
             })
         
@@ -840,7 +876,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_search_results(result, query)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_search_results(result, query))}]
                 }
             })
         
@@ -850,7 +886,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_groups_list(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_groups_list(result))}]
                 }
             })
         
@@ -861,7 +897,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_info(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_info(result))}]
                 }
             })
         
@@ -872,7 +908,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_users(result, group_id)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_users(result, group_id))}]
                 }
             })
         
@@ -908,7 +944,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_statistics(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_statistics(result))}]
                 }
             })
         
@@ -920,7 +956,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_member_stats(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_member_stats(result))}]
                 }
             })
         
@@ -932,7 +968,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_book_stats(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_book_stats(result))}]
                 }
             })
         
@@ -944,7 +980,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_group_doc_stats(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_group_doc_stats(result))}]
                 }
             })
         
@@ -955,7 +991,7 @@ def handle_tools_call(data):
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "content": [{"type": "text", "text": format_repo_toc(result)}]
+                    "content": [{"type": "text", "text": yuque_client.render(tool_name, arguments, lambda: format_repo_toc(result))}]
                 }
             })
         
@@ -971,6 +1007,33 @@ def handle_tools_call(data):
                 }
             })
         
+        elif tool_name == "cache_hot_keys" and CACHE_ADMIN_TOOLS:
+            keys = cache_manager.get_hot_keys(arguments.get("limit", 20), arguments.get("sort", "hits"))
+            return jsonify({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{"type": "text", "text": format_cache_hot_keys(keys)}]
+                }
+            })
+        
+        elif tool_name == "cache_purge" and CACHE_ADMIN_TOOLS:
+            # 通过 MCP 只能清除当前 Token 的私有缓存
+            tags = cache_manager.purge(
+                namespace=arguments.get("namespace"),
+                repo_id=arguments.get("repo_id"),
+                doc=arguments.get("doc"),
+                group=arguments.get("group"),
+                token=token if arguments.get("own_token") else None
+            )
+            return jsonify({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{"type": "text", "text": f"✅ 已清除缓存: {', '.join(tags)}"}]
+                }
+            })
+        
         else:
             return jsonify({
                 "jsonrpc": "2.0",
@@ -1096,6 +1159,76 @@ def test_endpoint():
     })
 
 
+def is_admin_request() -> bool:
+    """当前请求是否携带有效的 X-Admin-Token，未配置 CACHE_ADMIN_TOKEN 时始终为False"""
+    return bool(CACHE_ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), CACHE_ADMIN_TOKEN)
+
+
+def check_admin_token():
+    """校验管理接口的 X-Admin-Token，未配置 CACHE_ADMIN_TOKEN 时管理接口不可用
+    
+    Returns:
+        校验失败时的错误响应，通过时返回None
+    """
+    if not CACHE_ADMIN_TOKEN:
+        return jsonify({'error': '缓存管理接口未启用，请配置 CACHE_ADMIN_TOKEN'}), 404
+    if not is_admin_request():
+        return jsonify({'error': '管理令牌无效'}), 403
+    return None
+
+
+def read_json_body():
+    """读取 JSON 请求体，没有请求体时返回空字典
+    
+    Raises:
+        ValueError: 请求体不是 JSON 对象
+    """
+    if not request.get_data():
+        return {}
+    body = request.get_json(force=True, silent=True)
+    if body is None:
+        raise ValueError('请求体不是有效的 JSON')
+    if not isinstance(body, dict):
+        raise ValueError('请求体必须是 JSON 对象')
+    return body
+
+
+@app.route('/admin/cache/keys', methods=['GET'])
+def admin_cache_keys():
+    """列出最热的缓存键，及其大小与剩余过期时间"""
+    error = check_admin_token()
+    if error:
+        return error
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'keys': cache_manager.get_hot_keys(limit, request.args.get('sort', 'hits'))})
+
+
+@app.route('/admin/cache/inspect', methods=['GET'])
+def admin_cache_inspect():
+    """查看缓存条目的剩余过期时间与元数据"""
+    error = check_admin_token()
+    if error:
+        return error
+    info = cache_manager.inspect(request.args.get('key', ''))
+    if info is None:
+        return jsonify({'error': '缓存键不存在'}), 404
+    return jsonify(info)
+
+
+@app.route('/admin/cache/purge', methods=['POST'])
+def admin_cache_purge():
+    """按知识库（namespace / repo_id）、文档（namespace + doc）、团队（group）或 Token（token / tenant）清除缓存"""
+    error = check_admin_token()
+    if error:
+        return error
+    try:
+        body = read_json_body()
+        tags = cache_manager.purge(**{name: body.get(name) for name in ('namespace', 'repo_id', 'doc', 'group', 'token', 'tenant')})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'purged_tags': tags})
+
+
 if __name__ == '__main__':
     print(f"🚀 语雀 MCP 服务器启动在 http://localhost:{PORT}")
     print(f"📊 健康检查: http://localhost:{PORT}/health")
@@ -1103,4 +1236,6 @@ if __name__ == '__main__':
     print(f"🧪 测试端点: http://localhost:{PORT}/test")
     print(f"📚 支持功能: 用户信息、知识库管理、文档CRUD、搜索、团队管理")
     
+    # 在后台连接Redis，连接建立前使用内存缓存
+    cache_manager.connect()
     app.run(host='0.0.0.0', port=PORT, debug=False)
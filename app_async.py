@@ -6,17 +6,20 @@
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
+import hmac
 import logging
 import json
 import time
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from config import CONFIG, MCP_ERROR_CODES, DEFAULT_CORS_ORIGIN, PORT
+from config import CONFIG, MCP_ERROR_CODES, DEFAULT_CORS_ORIGIN, PORT, CACHE_ADMIN_TOKEN, CACHE_ADMIN_TOOLS
 from async_yuque_client import AsyncYuqueMCPClient
 from utils.formatters import *
-from cache import cache_manager
+from cache import async_cache_manager
+from cache_warmup import CacheWarmer
 
 
 # 配置日志
@@ -518,6 +521,47 @@ async def handle_tools_list(data: Dict[str, Any]):
         }
     ]
     
+    # 缓存管理工具，需要 CACHE_ADMIN_TOOLS=true
+    if CACHE_ADMIN_TOOLS:
+        tools.extend([
+            {
+                "name": "cache_hot_keys",
+                "description": "列出最热的缓存键及剩余过期时间",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "limit": {"type": "integer", "description": "返回的键数量，默认20"},
+                        "sort": {"type": "string", "enum": ["hits", "size"], "description": "按命中次数或大小排序"}
+                    }
+                }
+            },
+            {
+                "name": "cache_purge",
+                "description": "按知识库、文档、团队或当前 Token 清除缓存",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "namespace": {"type": "string", "description": "知识库命名空间，未指定 doc 时清除整个知识库"},
+                        "repo_id": {"type": "integer", "description": "知识库 ID，与 namespace 对应的缓存一并清除（可选，未提供时从缓存中查找）"},
+                        "doc": {"type": "string", "description": "文档 slug 或 ID（需要同时提供 namespace 或 repo_id）"},
+                        "group": {"type": "string", "description": "团队登录名"},
+                        "own_token": {"type": "boolean", "description": "清除当前 Token 的私有缓存"}
+                    }
+                }
+            },
+            {
+                "name": "cache_warmup",
+                "description": "在后台预热指定知识库的缓存",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "namespace": {"type": "string", "description": "知识库命名空间"}
+                    },
+                    "required": ["namespace"]
+                }
+            }
+        ])
+    
     return {
         "jsonrpc": "2.0",
         "id": data.get("id"),
@@ -534,6 +578,17 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
     
     logger.info(f"调用工具: {tool_name}, 参数: {arguments}")
     
+    # 缓存管理工具影响所有租户，与 HTTP 管理接口一样需要请求头 X-Admin-Token
+    if CACHE_ADMIN_TOOLS and tool_name in ("cache_hot_keys", "cache_purge", "cache_warmup") and not is_admin_request(request):
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32002,
+                "message": "权限不足：缓存管理工具需要有效的 X-Admin-Token 请求头"
+            }
+        }
+    
     # 获取 Token 并创建客户端
     try:
         token = await get_yuque_token(request)
@@ -545,7 +600,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_user_info(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_user_info(result))}]
                     }
                 }
             
@@ -556,7 +611,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_user_info(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_user_info(result))}]
                     }
                 }
             
@@ -566,7 +621,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_repos_list(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                     }
                 }
             
@@ -577,7 +632,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_repos_list(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                     }
                 }
             
@@ -588,7 +643,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_repos_list(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_repos_list(result))}]
                     }
                 }
             
@@ -599,7 +654,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_repo_info(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_repo_info(result))}]
                     }
                 }
             
@@ -671,7 +726,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_docs_list(result, namespace)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_docs_list(result, namespace))}]
                     }
                 }
             
@@ -680,21 +735,14 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                 slug = arguments["slug"]
                 raw = arguments.get("raw", False)  # 支持 raw 参数
                 
-                # 获取文档内容
-                result = await yuque_client.get_doc(namespace, slug, raw=raw)
-                
-                # 获取知识库信息（用于显示完整元数据）
-                repo_info = None
-                try:
-                    repo_info = await yuque_client.get_repo(namespace)
-                except Exception as e:
-                    logger.warning(f"获取知识库信息失败: {e}")
+                # 获取文档内容及知识库信息（用于显示完整元数据），两者的缓存一次批量读取
+                result, repo_info = await yuque_client.get_doc_with_repo(namespace, slug, raw=raw)
                 
                 return {
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_doc_content(result, repo_info, namespace, slug, include_full=True)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_doc_content(result, repo_info, namespace, slug, include_full=True))}]
                     }
                 }
             
@@ -707,7 +755,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                         "jsonrpc": "2.0",
                         "id": request_id,
                         "result": {
-                            "content": [{"type": "text", "text": format_doc_content(result, include_full=True)}]
+                            "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_doc_content(result, include_full=True))}]
                         }
                     }
                 except ValueError as e:
@@ -757,7 +805,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_doc_versions(result, doc_id)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_doc_versions(result, doc_id))}]
                     }
                 }
             
@@ -768,7 +816,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_doc_version_detail(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_doc_version_detail(result))}]
                     }
                 }
             
@@ -822,7 +870,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_search_results(result, query)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_search_results(result, query))}]
                     }
                 }
             
@@ -832,7 +880,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_groups_list(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_groups_list(result))}]
                     }
                 }
             
@@ -843,7 +891,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_info(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_info(result))}]
                     }
                 }
             
@@ -854,7 +902,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_users(result, group_id)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_users(result, group_id))}]
                     }
                 }
             
@@ -890,7 +938,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_statistics(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_statistics(result))}]
                     }
                 }
             
@@ -902,7 +950,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_member_stats(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_member_stats(result))}]
                     }
                 }
             
@@ -914,7 +962,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_book_stats(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_book_stats(result))}]
                     }
                 }
             
@@ -926,7 +974,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_group_doc_stats(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_group_doc_stats(result))}]
                     }
                 }
             
@@ -937,7 +985,7 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "content": [{"type": "text", "text": format_repo_toc(result)}]
+                        "content": [{"type": "text", "text": await yuque_client.render(tool_name, arguments, lambda: format_repo_toc(result))}]
                     }
                 }
             
@@ -953,6 +1001,44 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
                     }
                 }
             
+            elif tool_name == "cache_hot_keys" and CACHE_ADMIN_TOOLS:
+                keys = await async_cache_manager.get_hot_keys(arguments.get("limit", 20), arguments.get("sort", "hits"))
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [{"type": "text", "text": format_cache_hot_keys(keys)}]
+                    }
+                }
+            
+            elif tool_name == "cache_purge" and CACHE_ADMIN_TOOLS:
+                # 通过 MCP 只能清除当前 Token 的私有缓存
+                tags = await async_cache_manager.purge(
+                    namespace=arguments.get("namespace"),
+                    repo_id=arguments.get("repo_id"),
+                    doc=arguments.get("doc"),
+                    group=arguments.get("group"),
+                    token=token if arguments.get("own_token") else None
+                )
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [{"type": "text", "text": f"✅ 已清除缓存: {', '.join(tags)}"}]
+                    }
+                }
+            
+            elif tool_name == "cache_warmup" and CACHE_ADMIN_TOOLS:
+                namespace = arguments["namespace"]
+                started = cache_warmer.trigger([namespace], token)
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [{"type": "text", "text": f"🔥 已开始预热知识库 {namespace}" if started else "⚠️ 已有缓存预热在进行，请稍后重试"}]
+                    }
+                }
+            
             else:
                 return {
                     "jsonrpc": "2.0",
@@ -1021,6 +1107,24 @@ async def handle_tools_call(data: Dict[str, Any], request: Request):
         }
 
 
+# 缓存预热：启动后在后台预取配置的知识库，可按计划重复执行
+cache_warmer = CacheWarmer.from_config(CONFIG)
+
+
+@app.on_event("startup")
+async def start_cache_warmup():
+    """在后台连接Redis并启动缓存预热，不阻塞服务启动"""
+    async_cache_manager.connect()
+    cache_warmer.start()
+
+
+@app.on_event("shutdown")
+async def close_cache():
+    """停止缓存预热并关闭异步缓存连接池"""
+    await cache_warmer.stop()
+    await async_cache_manager.close()
+
+
 @app.get("/ping")
 async def handle_ping():
     """处理 ping 请求"""
@@ -1053,7 +1157,8 @@ async def health_check(request: Request):
             'message': '语雀MCP服务器运行正常',
             'user': user_login,
             'token_source': token_source,
-            'cache_stats': cache_manager.get_stats()
+            'cache_stats': await async_cache_manager.get_stats(),
+            'cache_warmup': cache_warmer.get_status()
         }
     except ValueError as e:
         # Token 配置缺失
@@ -1061,13 +1166,15 @@ async def health_check(request: Request):
             'status': 'configured', 
             'message': '服务器运行正常，但缺少语雀 Token 配置',
             'error': str(e),
-            'cache_stats': cache_manager.get_stats()
+            'cache_stats': await async_cache_manager.get_stats(),
+            'cache_warmup': cache_warmer.get_status()
         }
     except Exception as e:
         return {
             'status': 'error', 
             'error': str(e),
-            'cache_stats': cache_manager.get_stats()
+            'cache_stats': await async_cache_manager.get_stats(),
+            'cache_warmup': cache_warmer.get_status()
         }
 
 
@@ -1079,10 +1186,105 @@ async def test_endpoint():
         'version': '1.2.3',
         'status': 'running',
         'mode': 'async',
-        'cache_stats': cache_manager.get_stats()
+        'cache_stats': await async_cache_manager.get_stats()
     }
 
 
+def is_admin_request(request: Request) -> bool:
+    """请求是否携带有效的 X-Admin-Token，未配置 CACHE_ADMIN_TOKEN 时始终为False"""
+    return bool(CACHE_ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), CACHE_ADMIN_TOKEN)
+
+
+def check_admin_token(request: Request) -> Optional[JSONResponse]:
+    """校验管理接口的 X-Admin-Token，未配置 CACHE_ADMIN_TOKEN 时管理接口不可用
+    
+    Returns:
+        校验失败时的错误响应，通过时返回None
+    """
+    if not CACHE_ADMIN_TOKEN:
+        return JSONResponse({'error': '缓存管理接口未启用，请配置 CACHE_ADMIN_TOKEN'}, status_code=404)
+    if not is_admin_request(request):
+        return JSONResponse({'error': '管理令牌无效'}, status_code=403)
+    return None
+
+
+async def read_json_body(request: Request) -> Dict[str, Any]:
+    """读取 JSON 请求体，没有请求体时返回空字典
+    
+    Raises:
+        ValueError: 请求体不是 JSON 对象
+    """
+    body = await request.body()
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError('请求体不是有效的 JSON')
+    if not isinstance(data, dict):
+        raise ValueError('请求体必须是 JSON 对象')
+    return data
+
+
+@app.get("/admin/cache/keys")
+async def admin_cache_keys(request: Request, limit: int = 20, sort: str = "hits"):
+    """列出最热的缓存键，及其大小与剩余过期时间"""
+    error = check_admin_token(request)
+    if error:
+        return error
+    return {'keys': await async_cache_manager.get_hot_keys(limit, sort)}
+
+
+@app.get("/admin/cache/inspect")
+async def admin_cache_inspect(request: Request, key: str):
+    """查看缓存条目的剩余过期时间与元数据"""
+    error = check_admin_token(request)
+    if error:
+        return error
+    info = await async_cache_manager.inspect(key)
+    if info is None:
+        return JSONResponse({'error': '缓存键不存在'}, status_code=404)
+    return info
+
+
+@app.post("/admin/cache/purge")
+async def admin_cache_purge(request: Request):
+    """按知识库（namespace / repo_id）、文档（namespace + doc）、团队（group）或 Token（token / tenant）清除缓存"""
+    error = check_admin_token(request)
+    if error:
+        return error
+    try:
+        body = await read_json_body(request)
+        tags = await async_cache_manager.purge(**{name: body.get(name) for name in ('namespace', 'repo_id', 'doc', 'group', 'token', 'tenant')})
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return {'purged_tags': tags}
+
+
+@app.post("/admin/cache/warmup")
+async def admin_cache_warmup(request: Request):
+    """在后台预热指定的知识库，使用请求头 X-Yuque-Token 或配置的 Token"""
+    error = check_admin_token(request)
+    if error:
+        return error
+    try:
+        body = await read_json_body(request)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    namespace = body.get('namespace')
+    if not namespace:
+        return JSONResponse({'error': '需要提供 namespace'}, status_code=400)
+    try:
+        token = await get_yuque_token(request)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    started = cache_warmer.trigger([namespace], token)
+    return JSONResponse(
+        {'started': started, 'cache_warmup': cache_warmer.get_status()},
+        status_code=202 if started else 409
+    )
+
+
 # 启动服务器
 if __name__ == '__main__':
     import uvicorn
@@ -5,15 +5,41 @@
 """
 
 import httpx
-from typing import Dict, Any, Optional, Union
+import asyncio
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from config import YUQUE_BASE_URL
-from cache import cache_manager, generate_cache_key
+from cache import (
+    CacheEntry,
+    async_cache_manager,
+    PUBLIC_TENANT,
+    get_request_cache_key,
+    get_access_key,
+    get_negative_cache_key,
+    NEGATIVE_STATUS_CODES,
+    get_cache_tags,
+    get_dependent_tags,
+    get_entry_ttl,
+    extract_validators,
+    build_conditional_headers,
+    get_doc_list_key,
+    get_content_version,
+    get_render_cache_key,
+    is_unchanged_in_list,
+    get_tenant_id,
+    get_shared_repo,
+    is_public_repo,
+)
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
+# 租户标识 -> 登录名，list_repos 据此与用户信息一起批量预取知识库列表
+_tenant_logins: Dict[str, str] = {}
+
+
 class AsyncYuqueMCPClient:
     """异步语雀 API 客户端封装"""
     
@@ -24,6 +50,12 @@ class AsyncYuqueMCPClient:
             token: 语雀 API Token
         """
         self.token: str = token
+        # 租户标识，用于隔离与Token身份相关的缓存条目及按租户统计
+        self.tenant: str = get_tenant_id(token)
+        # 缓存键 -> (是否可读取, 缓存条目, 否定缓存条目)，由 prefetch 批量读取，请求时取用一次
+        self._prefetched: Dict[str, Tuple[bool, Optional[CacheEntry], Optional[CacheEntry]]] = {}
+        # 缓存键 -> 本客户端已返回的GET结果的内容版本（未知时为None），用于渲染结果的缓存键
+        self._versions: Dict[str, Optional[str]] = {}
         self.base_url: str = YUQUE_BASE_URL
         self.client: httpx.AsyncClient = httpx.AsyncClient(
             headers={
@@ -44,58 +76,253 @@ class AsyncYuqueMCPClient:
     
     async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """发送异步请求到语雀 API，包含详细日志和缓存逻辑"""
-        # 生成缓存键
-        cache_key = generate_cache_key("yuque", method, endpoint, **kwargs)
+        # 生成缓存键，知识库范围的资源在各Token间共享
+        cache_key = get_request_cache_key(method, endpoint, self.token, **kwargs)
+        
+        if method != "GET":
+            return await self._fetch(method, endpoint, cache_key, **kwargs)
         
-        # 检查缓存
-        cached_result = cache_manager.get(cache_key)
-        if cached_result and method == "GET":
-            return cached_result
+        # 检查缓存，软过期的条目先返回旧值，再进行重验证；共享条目只对已证明有权访问该知识库的Token可见
+        repo = get_shared_repo(endpoint)
+        prefetched = self._prefetched.pop(cache_key, None)
+        if prefetched is not None:
+            allowed, entry, negative = prefetched
+            async_cache_manager.sync_manager.record_lookup(entry is not None, self.tenant, endpoint, cache_key)
+        else:
+            allowed, entry = repo is None or await async_cache_manager.has_access(repo, self.tenant), None
+            if allowed:
+                entry = await async_cache_manager.get_entry(cache_key, self.tenant, endpoint=endpoint)
+            else:
+                async_cache_manager.sync_manager.record_lookup(False, self.tenant, endpoint)
+        if entry is not None:
+            self._raise_negative(endpoint, entry)
+        if entry is not None and entry.value:
+            if entry.is_stale:
+                await self._revalidate(endpoint, cache_key, entry, **kwargs)
+            self._versions[cache_key] = entry.meta.get("version")
+            return entry.value
+        
+        # 知识库范围的 404/403 按租户单独缓存
+        if repo is not None:
+            if prefetched is None:
+                negative_key = get_negative_cache_key(method, endpoint, self.token, **kwargs)
+                negative = await async_cache_manager.get_entry(negative_key, self.tenant, record=False)
+            if negative is not None:
+                self._raise_negative(endpoint, negative)
         
+        # 相同GET请求并发未命中时，只向上游发送一次请求；版本由实际发送请求的 _fetch 记录
+        self._versions[cache_key] = None
+        if not allowed:
+            # 未证明有权访问该知识库，按租户单独合并，不能共享其他租户的请求结果
+            return await async_cache_manager.coalesce(
+                get_negative_cache_key(method, endpoint, self.token, **kwargs),
+                lambda: self._fetch(method, endpoint, cache_key, **kwargs)
+            )
+        return await async_cache_manager.coalesce(
+            cache_key,
+            lambda: self._fetch(method, endpoint, cache_key, **kwargs),
+            lambda: self._read_cached(cache_key)
+        )
+    
+    async def _read_cached(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """读取其他worker合并请求后写入的缓存，只在当前Token已证明有权访问时使用"""
+        entry = await async_cache_manager.get_entry(cache_key, self.tenant, record=False)
+        if entry is None or entry.negative is not None or not entry.value:
+            return None
+        return entry.value
+    
+    async def render(self, tool: str, arguments: Dict[str, Any], formatter: Callable[[], str]) -> str:
+        """返回工具的格式化输出，按工具名、参数和本客户端已读取的源条目版本缓存渲染结果
+        
+        源条目变化后版本不同，缓存键随之变化，旧的渲染结果不会再被读取；
+        任一源条目版本未知（旧格式的条目、与其他请求合并的请求等）时直接格式化，不缓存。
+        
+        Args:
+            tool: 工具名
+            arguments: 工具参数
+            formatter: 根据已获取的数据生成输出文本
+        """
+        key = get_render_cache_key(tool, arguments, self._versions.values())
+        text = await async_cache_manager.get_rendered(key, self.tenant)
+        if text is None:
+            text = formatter()
+            await async_cache_manager.set_rendered(key, text, self.tenant)
+        return text
+    
+    async def prefetch(self, endpoints: List[str]) -> None:
+        """通过一次缓存往返批量读取多个GET端点的缓存条目、访问权限证明与否定缓存
+        
+        读取结果在之后对这些端点的首次请求中使用，未命中的端点在请求时照常访问上游。
+        
+        Args:
+            endpoints: API端点，不支持额外的请求参数
+        """
+        plan: List[Tuple[str, str, Optional[str], Optional[str], List[str]]] = []
+        keys: List[str] = []
+        for endpoint in endpoints:
+            cache_key = get_request_cache_key('GET', endpoint, self.token)
+            repo = get_shared_repo(endpoint)
+            negative_key = None
+            proofs: List[str] = []
+            if repo is not None:
+                negative_key = get_negative_cache_key('GET', endpoint, self.token)
+                proofs = [get_access_key(repo, self.tenant), get_access_key(repo, PUBLIC_TENANT)]
+            plan.append((endpoint, cache_key, repo, negative_key, proofs))
+            keys.extend([cache_key] + ([negative_key] if negative_key else []) + proofs)
+        entries = await async_cache_manager.get_many(keys, self.tenant, record=False)
+        for endpoint, cache_key, repo, negative_key, proofs in plan:
+            allowed = repo is None or any(entries.get(key) is not None for key in proofs)
+            entry = entries.get(cache_key) if allowed else None
+            negative = entries.get(negative_key) if negative_key else None
+            self._prefetched[cache_key] = (allowed, entry, negative)
+    
+    def _raise_negative(self, endpoint: str, entry: CacheEntry) -> None:
+        """命中否定缓存时，还原并抛出上游的 404/403 错误"""
+        negative = entry.negative
+        if negative is None:
+            return
+        request = httpx.Request('GET', f"{self.base_url}{endpoint}")
+        response = httpx.Response(negative["status"], text=negative.get("body") or "", request=request)
+        raise httpx.HTTPStatusError(
+            f"Client error '{response.status_code}' (cached) for url '{request.url}'",
+            request=request,
+            response=response
+        )
+    
+    async def _revalidate(self, endpoint: str, cache_key: str, entry: CacheEntry, **kwargs) -> None:
+        """重验证软过期的条目
+        
+        文档先对照未过期的文档列表中的 updated_at，未变化时直接续期；
+        否则在后台发送携带 ETag/Last-Modified 的条件请求。
+        """
+        doc_list = get_doc_list_key(endpoint)
+        if doc_list is not None:
+            list_key, slug = doc_list
+            list_entry = await async_cache_manager.get_entry(list_key, self.tenant)
+            if is_unchanged_in_list(entry, list_entry, slug):
+                # 文档内容确认到文档列表的获取时间为止
+                async_cache_manager.sync_manager.record_revalidation(entry, not_modified=True)
+                await self._store(endpoint, cache_key, entry.value, dict(entry.meta, fetched_at=list_entry.meta["fetched_at"]), **kwargs)
+                return
+        async_cache_manager.schedule_refresh(
+            cache_key,
+            lambda: self._refresh(endpoint, cache_key, entry, **kwargs)
+        )
+    
+    async def _refresh(self, endpoint: str, cache_key: str, entry: CacheEntry, **kwargs) -> Dict[str, Any]:
+        """后台刷新缓存，使用独立的客户端，避免当前请求结束后连接已关闭"""
+        async with AsyncYuqueMCPClient(self.token) as client:
+            return await client._fetch('GET', endpoint, cache_key, entry=entry, **kwargs)
+    
+    async def _fetch(self, method: str, endpoint: str, cache_key: str, entry: Optional[CacheEntry] = None, **kwargs) -> Dict[str, Any]:
+        """请求语雀 API，并按接口类型的过期策略缓存GET结果
+        
+        Args:
+            entry: 需要重验证的旧条目，提供时发送条件请求，304 时沿用旧值并续期
+        """
         url: str = f"{self.base_url}{endpoint}"
+        request_kwargs: Dict[str, Any] = dict(kwargs)
+        if entry is not None:
+            conditional_headers: Dict[str, str] = build_conditional_headers(entry)
+            if conditional_headers:
+                request_kwargs["headers"] = conditional_headers
         
+        # 请求发出时间，记录在元数据中，用于判断文档列表是否晚于文档条目获取
+        fetched_at: float = time.time()
         try:
-            response: httpx.Response = await self.client.request(method, url, **kwargs)
+            response: httpx.Response = await self.client.request(method, url, **request_kwargs)
+            if entry is not None and response.status_code == 304:
+                async_cache_manager.sync_manager.record_revalidation(entry, not_modified=True)
+                await self._grant_access(endpoint, entry.value)
+                await self._store(endpoint, cache_key, entry.value, dict(entry.meta, fetched_at=fetched_at), **kwargs)
+                return entry.value
             response.raise_for_status()
             result: Dict[str, Any] = response.json()
             
             # 设置缓存，只缓存GET请求
             if method == "GET":
-                # 根据不同的API设置不同的过期时间
-                if endpoint == "/user":
-                    # 用户信息：24小时过期
-                    cache_manager.set(cache_key, result, expire=86400)
-                elif "/repos/" in endpoint and "/docs" not in endpoint:
-                    # 知识库详情：12小时过期
-                    cache_manager.set(cache_key, result, expire=43200)
-                elif "/docs" in endpoint and "/" not in endpoint.split("/docs")[1]:
-                    # 文档列表：6小时过期
-                    cache_manager.set(cache_key, result, expire=21600)
-                elif "/docs/" in endpoint:
-                    # 文档内容：3小时过期
-                    cache_manager.set(cache_key, result, expire=10800)
-                elif "/search" in endpoint:
-                    # 搜索结果：1小时过期
-                    cache_manager.set(cache_key, result, expire=3600)
-                else:
-                    # 其他GET请求：2小时过期
-                    cache_manager.set(cache_key, result, expire=7200)
+                validators: Dict[str, str] = extract_validators(response.headers, result)
+                if entry is not None:
+                    async_cache_manager.sync_manager.record_revalidation(entry, not_modified=False)
+                await self._grant_access(endpoint, result)
+                version = await self._store(endpoint, cache_key, result, {"validators": validators, "size": len(response.content), "fetched_at": fetched_at}, **kwargs)
+                if entry is None:
+                    self._versions[cache_key] = version
             
             return result
         except httpx.HTTPStatusError as e:
+            if method == "GET" and e.response.status_code in NEGATIVE_STATUS_CODES:
+                await self._store_negative(endpoint, cache_key, e.response.status_code, e.response.text, **kwargs)
             raise
         except httpx.RequestError as e:
             raise
     
+    async def _store(self, endpoint: str, cache_key: str, result: Dict[str, Any], meta: Dict[str, Any], **kwargs) -> str:
+        """写入缓存，文档按修改频率自适应过期，其余按接口类型的过期策略，所用过期时间与内容版本记录在元数据中
+        
+        Returns:
+            内容版本，续期的条目沿用原版本
+        """
+        ttl = get_entry_ttl(endpoint, result)
+        tags = get_cache_tags(endpoint, token=self.token, result=result, **kwargs)
+        version = meta.get("version") or get_content_version(result)
+        await async_cache_manager.set(cache_key, result, expire=ttl["hard"], tags=tags, soft_expire=ttl["soft"], meta=dict(meta, ttl=ttl, version=version), tenant=self.tenant, endpoint=endpoint)
+        return version
+    
+    async def _store_negative(self, endpoint: str, cache_key: str, status: int, body: str, **kwargs) -> None:
+        """缓存上游的 404/403 结果，标签与正常条目相同，写操作按相同的路径失效"""
+        negative_key = get_negative_cache_key('GET', endpoint, self.token, **kwargs)
+        if status == 404 and negative_key != cache_key and await async_cache_manager.has_access(get_shared_repo(endpoint), self.tenant):
+            # 已证明可以访问该知识库时，404 说明资源确已不存在，共享的旧条目一并删除；
+            # 否则 404 可能只是当前Token无权查看，只记录当前租户的否定缓存
+            await async_cache_manager.delete(cache_key)
+        tags = get_cache_tags(endpoint, token=self.token, **kwargs)
+        await async_cache_manager.set_negative(negative_key, status, body, tags=tags, tenant=self.tenant)
+    
+    async def _grant_access(self, endpoint: str, result: Dict[str, Any]) -> None:
+        """上游请求成功即证明当前Token可以访问该知识库，公开知识库对所有Token开放"""
+        repo = get_shared_repo(endpoint)
+        if repo is None:
+            return
+        await async_cache_manager.grant_access(repo, self.tenant)
+        if is_public_repo(endpoint, result):
+            await async_cache_manager.grant_access(repo, PUBLIC_TENANT)
+    
+    async def _invalidate(self, resource: str, **ids: Any) -> None:
+        """写操作成功后，按依赖表失效受影响的缓存条目，预取的条目一并丢弃"""
+        self._prefetched.clear()
+        await async_cache_manager.invalidate_tags(get_dependent_tags(resource, **ids))
+    
+    @staticmethod
+    def _doc_repo_ids(namespace: str, doc: Dict[str, Any]) -> List[Any]:
+        """文档所属知识库的命名空间与数字ID，目录与知识库详情可能按任一标识缓存"""
+        return [namespace, doc.get("book_id"), (doc.get("book") or {}).get("id")]
+    
+    @staticmethod
+    def _result_data(result: Dict[str, Any]) -> Dict[str, Any]:
+        """提取响应中的 data 字段，用于获取写操作返回的 slug、namespace 等标识"""
+        data = result.get("data") if isinstance(result, dict) else None
+        return data if isinstance(data, dict) else {}
+    
     async def get_user_info(self) -> Dict[str, Any]:
         """获取当前用户信息"""
-        return await self._request('GET', '/user')
+        result: Dict[str, Any] = await self._request('GET', '/user')
+        login = (result.get("data") or {}).get("login") if isinstance(result, dict) else None
+        if login:
+            _tenant_logins[self.tenant] = login
+        return result
     
     async def list_repos(self) -> Dict[str, Any]:
-        """列出用户的知识库"""
-        user_info: Dict[str, Any] = await self.get_user_info()
-        login: str = user_info["data"]["login"]
-        return await self._request('GET', f'/users/{login}/repos')
+        """列出用户的知识库，已知登录名时与用户信息一起批量预取"""
+        known_login: Optional[str] = _tenant_logins.get(self.tenant)
+        if known_login:
+            await self.prefetch(['/user', f'/users/{known_login}/repos'])
+        try:
+            user_info: Dict[str, Any] = await self.get_user_info()
+            login: str = user_info["data"]["login"]
+            return await self._request('GET', f'/users/{login}/repos')
+        finally:
+            self._prefetched.clear()
     
     async def get_repo(self, namespace: str) -> Dict[str, Any]:
         """获取知识库详情"""
@@ -118,6 +345,31 @@ class AsyncYuqueMCPClient:
             endpoint += '?raw=1'  # 支持 raw 参数
         return await self._request('GET', endpoint)
     
+    async def get_doc_with_repo(self, namespace: str, slug: str, raw: bool = False) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """获取文档内容及所属知识库详情，两者的缓存通过一次往返批量读取，未命中的并发请求上游
+        
+        Returns:
+            (文档内容, 知识库详情)，知识库详情获取失败时为None
+        """
+        endpoint: str = f'/repos/{namespace}/docs/{slug}'
+        if raw:
+            endpoint += '?raw=1'
+        await self.prefetch([endpoint, f'/repos/{namespace}'])
+        try:
+            result, repo_info = await asyncio.gather(
+                self._request('GET', endpoint),
+                self.get_repo(namespace),
+                return_exceptions=True
+            )
+        finally:
+            self._prefetched.clear()
+        if isinstance(result, BaseException):
+            raise result
+        if isinstance(repo_info, BaseException):
+            logger.warning(f"获取知识库信息失败: {repo_info}")
+            repo_info = None
+        return result, repo_info
+    
     async def create_doc(self, namespace: str, title: str, content: str, format_type: str = "markdown") -> Dict[str, Any]:
         """创建文档"""
         data: Dict[str, str] = {
@@ -125,7 +377,10 @@ class AsyncYuqueMCPClient:
             "format": format_type,
             "body": content
         }
-        return await self._request('POST', f'/repos/{namespace}/docs', json=data)
+        result: Dict[str, Any] = await self._request('POST', f'/repos/{namespace}/docs', json=data)
+        doc: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("doc", repo=self._doc_repo_ids(namespace, doc), doc_id=doc.get("id"), slug=doc.get("slug"))
+        return result
     
     async def update_doc(self, namespace: str, doc_id: int, title: Optional[str] = None, content: Optional[str] = None) -> Dict[str, Any]:
         """更新文档"""
@@ -135,11 +390,17 @@ class AsyncYuqueMCPClient:
         if content:
             data["body"] = content
         
-        return await self._request('PUT', f'/repos/{namespace}/docs/{doc_id}', json=data)
+        result: Dict[str, Any] = await self._request('PUT', f'/repos/{namespace}/docs/{doc_id}', json=data)
+        doc: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("doc", repo=self._doc_repo_ids(namespace, doc), doc_id=[doc_id, doc.get("id")], slug=doc.get("slug"))
+        return result
     
     async def delete_doc(self, namespace: str, doc_id: int) -> Dict[str, Any]:
         """删除文档"""
-        return await self._request('DELETE', f'/repos/{namespace}/docs/{doc_id}')
+        result: Dict[str, Any] = await self._request('DELETE', f'/repos/{namespace}/docs/{doc_id}')
+        doc: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("doc", repo=self._doc_repo_ids(namespace, doc), doc_id=[doc_id, doc.get("id")], slug=doc.get("slug"))
+        return result
     
     async def search(self, query: str, type: str = "doc") -> Dict[str, Any]:
         """搜索文档或知识库"""
@@ -206,7 +467,10 @@ class AsyncYuqueMCPClient:
             endpoint = f'/groups/{owner_login}/repos'
         else:
             endpoint = f'/users/{owner_login}/repos'
-        return await self._request('POST', endpoint, json=data)
+        result: Dict[str, Any] = await self._request('POST', endpoint, json=data)
+        repo: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("repo_list", owner=owner_login, repo=[repo.get("id"), repo.get("namespace")])
+        return result
     
     async def _build_repo_path(self, repo_id: Optional[int] = None, namespace: Optional[str] = None) -> str:
         """构建知识库路径"""
@@ -242,12 +506,19 @@ class AsyncYuqueMCPClient:
         if toc is not None:
             data["toc"] = toc
         path: str = await self._build_repo_path(repo_id, namespace)
-        return await self._request('PUT', path, json=data)
+        result: Dict[str, Any] = await self._request('PUT', path, json=data)
+        repo: Dict[str, Any] = self._result_data(result)
+        # 修改 slug 后命名空间会变化，新旧标识都需要失效
+        await self._invalidate("repo", repo=[repo_id, namespace, repo.get("id"), repo.get("namespace")])
+        return result
     
     async def delete_repo(self, repo_id: Optional[int] = None, namespace: Optional[str] = None) -> Dict[str, Any]:
         """删除知识库"""
         path: str = await self._build_repo_path(repo_id, namespace)
-        return await self._request('DELETE', path)
+        result: Dict[str, Any] = await self._request('DELETE', path)
+        repo: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("repo", repo=[repo_id, namespace, repo.get("id"), repo.get("namespace")])
+        return result
     
     async def get_user(self, login: str) -> Dict[str, Any]:
         """获取指定用户信息"""
@@ -263,15 +534,21 @@ class AsyncYuqueMCPClient:
     
     async def update_group_member(self, group_login: str, user_identity: str, role: int) -> Dict[str, Any]:
         """变更团队成员角色"""
-        return await self._request(
+        result: Dict[str, Any] = await self._request(
             'PUT',
             f'/groups/{group_login}/users/{user_identity}',
             json={"role": role}
         )
+        member: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("group_member", group=[group_login, member.get("group_id")])
+        return result
     
     async def remove_group_member(self, group_login: str, user_identity: str) -> Dict[str, Any]:
         """删除团队成员"""
-        return await self._request('DELETE', f'/groups/{group_login}/users/{user_identity}')
+        result: Dict[str, Any] = await self._request('DELETE', f'/groups/{group_login}/users/{user_identity}')
+        member: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("group_member", group=[group_login, member.get("group_id")])
+        return result
     
     async def get_group_statistics(self, login: str) -> Dict[str, Any]:
         """团队汇总统计"""
@@ -297,7 +574,10 @@ class AsyncYuqueMCPClient:
     async def update_repo_toc(self, repo_id: Optional[int] = None, namespace: Optional[str] = None, toc_markdown: str = "") -> Dict[str, Any]:
         """更新知识库目录（整体替换）"""
         path: str = await self._build_repo_path(repo_id, namespace)
-        return await self._request('PUT', path, json={"toc": toc_markdown})
+        result: Dict[str, Any] = await self._request('PUT', path, json={"toc": toc_markdown})
+        repo: Dict[str, Any] = self._result_data(result)
+        await self._invalidate("toc", repo=[repo_id, namespace, repo.get("id"), repo.get("namespace")])
+        return result
     
     async def list_doc_versions(self, doc_id: int) -> Dict[str, Any]:
         """列出文档版本（最新100条）"""
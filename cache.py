@@ -4,9 +4,26 @@
 使用Redis作为缓存存储，实现API响应的缓存管理
 """
 
+import os
 import json
+import sys
+import sqlite3
+import zlib
+import asyncio
+import uuid
+import hashlib
+import heapq
+import time
+import string
+import fnmatch
 import logging
-from typing import Any, Optional, Dict
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, quote, urlencode
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List
 from config import CONFIG
 
 # 尝试导入redis，如果失败则使用内存缓存
@@ -16,44 +33,2357 @@ try:
 except ImportError:
     logging.warning("❌ Redis模块未安装，将使用内存缓存作为备选方案")
 
+# redis.asyncio 随 redis>=4.2 提供，供异步客户端使用
+aioredis = None
+if redis:
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        logging.warning("⚠️ 当前Redis模块不支持asyncio，异步缓存将使用内存缓存")
+
+# zstandard 为可选依赖，未安装时使用 zlib 压缩
+zstd = None
+try:
+    import zstandard as zstd
+except ImportError:
+    pass
+
+# orjson、msgpack 为可选依赖，未安装时使用标准库json序列化
+orjson = None
+try:
+    import orjson
+except ImportError:
+    pass
+
+msgpack = None
+try:
+    import msgpack
+except ImportError:
+    pass
+
 
 logger = logging.getLogger(__name__)
 
 
+# 计入熔断的Redis错误：连接失败与超时，命令错误等不计入
+REDIS_CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError) if redis else ()
+
+# SCAN 每批扫描数量，以及 UNLINK 每批删除的键数
+SCAN_BATCH_SIZE = 500
+
+# 本服务写入的全部键，熔断恢复后需要整体清空时只删除这些键，不影响同一数据库中的其他数据
+CACHE_KEY_PATTERN = "yuque:*"
+
+# 仅当锁的持有者与释放者一致时才删除锁
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# 跨worker汇总统计使用的Redis哈希：字段为 <接口类型或total>:<计数名>，以及各worker最近一次上报时间
+STATS_KEY = "yuque:stats"
+STATS_WORKERS_KEY = "yuque:stats:workers"
+
+# 跨worker汇总的缓存键命中次数（有序集合），待上报的增量以该前缀加缓存键记录
+HOT_KEYS_KEY = "yuque:stats:hot"
+HOT_KEY_FIELD_PREFIX = "key:"
+
+# 按接口类型分类统计的计数
+ENDPOINT_STAT_FIELDS = ("hit_count", "miss_count", "l1_hit_count", "stale_hit_count", "negative_hit_count")
+
+
+def _build_entry(value: Any, soft_expire: Optional[int], meta: Optional[Dict[str, Any]] = None) -> "CacheEntry":
+    """根据软过期时间和元数据构造缓存条目"""
+    fresh_until = time.time() + soft_expire if soft_expire and soft_expire > 0 else None
+    return CacheEntry(value, fresh_until, meta)
+
+
+def _describe_entry(key: str, entry: "CacheEntry", remaining: Optional[float]) -> Dict[str, Any]:
+    """缓存条目的查看信息"""
+    return {
+        "key": key,
+        "ttl": entry.meta.get("ttl"),
+        "remaining": remaining,
+        "fresh_until": entry.fresh_until,
+        "stale": entry.is_stale,
+        "negative": entry.negative,
+        "validators": entry.validators,
+        "size": entry.meta.get("size")
+    }
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值序列化后的字节数"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+def split_bodies(value: Any, min_size: int) -> tuple:
+    """把响应 data 中较大的正文字段（body、body_html、body_lake 等）替换为内容哈希
+    
+    同一份正文只需存储一次：文档的普通/raw 请求、与当前内容相同的历史版本引用同一个正文条目。
+    
+    Args:
+        value: 缓存值，只处理 {"data": {...}} 形式的接口响应
+        min_size: 正文的最小字符数，较短的正文保留在条目中
+    
+    Returns:
+        (去掉正文的缓存值, 字段名 -> 内容哈希, 内容哈希 -> 正文)，不需要拆分时原样返回值和两个空字典；不修改传入的值
+    """
+    data = value.get("data") if isinstance(value, dict) else None
+    if not isinstance(data, dict):
+        return value, {}, {}
+    refs: Dict[str, str] = {}
+    bodies: Dict[str, str] = {}
+    for field, body in data.items():
+        if field.startswith("body") and isinstance(body, str) and len(body) >= min_size:
+            digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+            refs[field] = digest
+            bodies[digest] = body
+    if not refs:
+        return value, {}, {}
+    data = {field: item for field, item in data.items() if field not in refs}
+    return dict(value, data=data), refs, bodies
+
+
+def _body_refs(raw: Any) -> Dict[str, str]:
+    """条目引用的正文：字段名 -> 内容哈希"""
+    if isinstance(raw, dict) and raw.get(CacheEntry.MARKER):
+        return (raw.get("meta") or {}).get("bodies") or {}
+    return {}
+
+
+def _attach_all_bodies(values: Dict[str, Any], bodies: Dict[str, str]) -> Dict[str, Any]:
+    """把正文放回多个条目，引用的正文缺失的条目不返回"""
+    result = {}
+    for key, raw in values.items():
+        raw = _attach_bodies(raw, bodies)
+        if raw is not None:
+            result[key] = raw
+    return result
+
+
+def _attach_bodies(raw: Any, bodies: Dict[str, str]) -> Any:
+    """把引用的正文放回条目，引用的正文已被淘汰时返回None（视为未命中）"""
+    refs = _body_refs(raw)
+    if not refs:
+        return raw
+    if any(digest not in bodies for digest in refs.values()):
+        return None
+    value = raw["value"]
+    data = dict(value["data"], **{field: bodies[digest] for field, digest in refs.items()})
+    meta = {name: item for name, item in raw["meta"].items() if name != "bodies"}
+    return dict(raw, value=dict(value, data=data), meta=meta)
+
+
+class _MemoryEntry:
+    """内存缓存条目"""
+    
+    __slots__ = ("value", "size", "expire_at", "tags", "owner", "category", "hits", "priority", "seq")
+    
+    def __init__(
+        self,
+        value: Any,
+        size: int,
+        expire_at: Optional[float],
+        tags: Iterable[str] = (),
+        owner: Optional[str] = None,
+        category: Optional[str] = None
+    ):
+        self.value = value
+        self.size = size
+        self.expire_at = expire_at
+        self.tags = tuple(tags)
+        self.owner = owner
+        self.category = category
+        # GreedyDual-Size-Frequency 淘汰策略使用的访问次数、优先级与堆中记录的序号
+        self.hits = 1
+        self.priority = 0.0
+        self.seq = 0
+
+
+class MemoryCache:
+    """进程内缓存后端
+    
+    支持按条目过期、条目数与字节数上限，按条目序列化后的字节数计算占用。
+    超出上限时的淘汰策略：
+    - lru：淘汰最久未访问的条目，基于OrderedDict实现，get/set均为O(1)
+    - gdsf：GreedyDual-Size-Frequency，优先级 = 时钟 + 访问次数 / 字节数，淘汰优先级最低的条目并把时钟推进到该优先级；
+      大而冷的条目先被淘汰，一篇很大的文档不会挤掉大量小而热的条目，长期未访问的条目随时钟推进也会被淘汰。
+      get/set为O(log n)
+    同时维护标签到缓存键的索引，按标签失效时只访问标签成员。
+    条目可以记录写入者（租户），设置 max_owner_bytes 后，超出份额的租户按LRU顺序只淘汰自己的条目。
+    条目可以记录分类（接口类型），按分类统计当前、峰值与被淘汰的字节数。
+    """
+    
+    POLICIES = ("lru", "gdsf")
+    
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, max_owner_bytes: int = 0, policy: str = "lru"):
+        """初始化内存缓存
+        
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 最大字节数（按序列化后大小估算）
+            max_owner_bytes: 单个写入者的最大字节数，不大于0时不限制
+            policy: 淘汰策略，lru 或 gdsf
+        """
+        if policy not in self.POLICIES:
+            logger.warning(f"⚠️ 未知的缓存淘汰策略 {policy}，将使用 lru")
+            policy = "lru"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_owner_bytes = max_owner_bytes
+        self.policy = policy
+        self._data: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        # 写入者 -> 按LRU顺序排列的缓存键
+        self._owners: Dict[str, "OrderedDict[str, None]"] = {}
+        self.owner_bytes: Dict[str, int] = {}
+        # gdsf：(优先级, 序号, 缓存键) 最小堆，条目的优先级变化时压入新记录，旧记录在弹出时按序号跳过
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._clock = 0.0
+        # 分类 -> 当前字节数、峰值字节数、被淘汰的字节数与条目数
+        self.category_stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        self.evicted_bytes = 0
+        self.eviction_count = 0
+        self.expiration_count = 0
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，过期条目会被惰性删除"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.expire_at is not None and entry.expire_at <= time.monotonic():
+                self._remove(key)
+                self.expiration_count += 1
+                return None
+            self._data.move_to_end(key)
+            if entry.owner is not None:
+                self._owners[entry.owner].move_to_end(key)
+            if self.policy == "gdsf":
+                entry.hits += 1
+                self._push(key, entry)
+            return entry.value
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expire: Optional[int] = None,
+        tags: Iterable[str] = (),
+        owner: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> None:
+        """设置缓存值
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+            expire: 过期时间（秒），为空或不大于0时永不过期
+            tags: 缓存标签，用于按标签失效
+            owner: 写入者（租户标识），用于按租户统计内存并限制份额
+            category: 分类（接口类型），用于按分类统计字节数
+        """
+        size = _estimate_size(value)
+        expire_at = time.monotonic() + expire if expire and expire > 0 else None
+        with self._lock:
+            hits = 1
+            if key in self._data:
+                # 覆盖写入（如刷新）保留访问次数
+                hits = self._data[key].hits
+                self._remove(key)
+            if size > self.max_bytes:
+                # 单个条目超过总预算，直接拒绝写入
+                self._record_eviction(size, category)
+                return
+            entry = _MemoryEntry(value, size, expire_at, tags, owner, category)
+            entry.hits = hits
+            self._data[key] = entry
+            self.current_bytes += size
+            if category is not None:
+                self._category_stats(category)["bytes"] += size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            if self.policy == "gdsf":
+                self._push(key, entry)
+            if owner is not None:
+                self._owners.setdefault(owner, OrderedDict())[key] = None
+                self.owner_bytes[owner] = self.owner_bytes.get(owner, 0) + size
+                self._evict_owner(owner)
+            self._evict()
+            # 峰值在淘汰后记录，不包含写入与淘汰之间的瞬时超出
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+            if category is not None:
+                stats = self.category_stats[category]
+                stats["peak_bytes"] = max(stats["peak_bytes"], stats["bytes"])
+    
+    def ttl(self, key: str) -> Optional[float]:
+        """获取条目的剩余过期时间（秒），不存在返回None，永不过期返回-1"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.expire_at is None:
+                return -1
+            return max(entry.expire_at - time.monotonic(), 0)
+    
+    def size(self, key: str) -> Optional[int]:
+        """获取条目占用的字节数，不存在返回None"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry.size if entry is not None else None
+    
+    def delete(self, key: str) -> None:
+        """删除缓存值"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+    
+    def delete_pattern(self, pattern: str) -> int:
+        """按glob模式删除缓存值，返回删除的条目数"""
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    def delete_tag(self, tag: str) -> List[str]:
+        """删除标签下的全部缓存值，返回删除的缓存键"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return keys
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._owners.clear()
+            self.owner_bytes.clear()
+            self._heap.clear()
+            self.current_bytes = 0
+            for stats in self.category_stats.values():
+                stats["bytes"] = 0
+    
+    def _category_stats(self, category: str) -> Dict[str, int]:
+        stats = self.category_stats.get(category)
+        if stats is None:
+            stats = self.category_stats[category] = {"bytes": 0, "peak_bytes": 0, "evicted_bytes": 0, "eviction_count": 0}
+        return stats
+    
+    def _record_eviction(self, size: int, category: Optional[str]) -> None:
+        self.eviction_count += 1
+        self.evicted_bytes += size
+        if category is not None:
+            stats = self._category_stats(category)
+            stats["evicted_bytes"] += size
+            stats["eviction_count"] += 1
+    
+    def _push(self, key: str, entry: _MemoryEntry) -> None:
+        """按当前时钟重新计算条目的 gdsf 优先级并压入堆"""
+        entry.priority = self._clock + entry.hits / max(entry.size, 1)
+        entry.seq = next(self._seq)
+        heapq.heappush(self._heap, (entry.priority, entry.seq, key))
+        # 过期记录过多时重建堆，限制内存占用
+        if len(self._heap) > 2 * len(self._data) + 64:
+            self._heap = [(item.priority, item.seq, item_key) for item_key, item in self._data.items()]
+            heapq.heapify(self._heap)
+    
+    def _pop_victim(self) -> str:
+        """gdsf：弹出优先级最低的有效条目，并把时钟推进到其优先级"""
+        while True:
+            priority, seq, key = heapq.heappop(self._heap)
+            entry = self._data.get(key)
+            if entry is not None and entry.seq == seq:
+                self._clock = priority
+                return key
+    
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self.current_bytes -= entry.size
+        if entry.category is not None:
+            self.category_stats[entry.category]["bytes"] -= entry.size
+        for tag in entry.tags:
+            members = self._tags.get(tag)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._tags[tag]
+        if entry.owner is not None:
+            keys = self._owners[entry.owner]
+            del keys[key]
+            self.owner_bytes[entry.owner] -= entry.size
+            if not keys:
+                del self._owners[entry.owner]
+                del self.owner_bytes[entry.owner]
+    
+    def _evict_owner(self, owner: str) -> None:
+        """写入者超出份额时，按LRU顺序淘汰该写入者自己的条目"""
+        if self.max_owner_bytes <= 0:
+            return
+        while self.owner_bytes.get(owner, 0) > self.max_owner_bytes:
+            key = next(iter(self._owners[owner]))
+            entry = self._data[key]
+            self._remove(key)
+            self._record_eviction(entry.size, entry.category)
+    
+    def _evict(self) -> None:
+        """按淘汰策略淘汰条目，直到满足条目数和字节数上限"""
+        now = time.monotonic()
+        while self._data and (len(self._data) > self.max_entries or self.current_bytes > self.max_bytes):
+            key = self._pop_victim() if self.policy == "gdsf" else next(iter(self._data))
+            entry = self._data[key]
+            self._remove(key)
+            if entry.expire_at is not None and entry.expire_at <= now:
+                self.expiration_count += 1
+            else:
+                self._record_eviction(entry.size, entry.category)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取内存缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "tags": len(self._tags),
+                "policy": self.policy,
+                "bytes": self.current_bytes,
+                "peak_bytes": self.peak_bytes,
+                "evicted_bytes": self.evicted_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "max_owner_bytes": self.max_owner_bytes,
+                "eviction_count": self.eviction_count,
+                "expiration_count": self.expiration_count,
+                "categories": {category: dict(stats) for category, stats in self.category_stats.items()}
+            }
+
+
+class CacheEntry:
+    """缓存条目：缓存值及其元数据
+    
+    带元数据的条目以信封形式存储，不带元数据的条目直接存储缓存值，两种格式可以混合读取。
+    """
+    
+    MARKER = "__cache_entry__"
+    __slots__ = ("value", "fresh_until", "meta")
+    
+    def __init__(self, value: Any, fresh_until: Optional[float] = None, meta: Optional[Dict[str, Any]] = None):
+        """初始化缓存条目
+        
+        Args:
+            value: 缓存值
+            fresh_until: 软过期时间戳，超过后条目仍可返回，但需要后台刷新
+            meta: 元数据，如条件请求的校验信息（validators）、响应大小（size）和否定缓存的错误（negative）
+        """
+        self.value = value
+        self.fresh_until = fresh_until
+        self.meta = meta or {}
+    
+    @property
+    def validators(self) -> Dict[str, str]:
+        """条件请求的校验信息"""
+        return self.meta.get("validators") or {}
+    
+    @property
+    def negative(self) -> Optional[Dict[str, Any]]:
+        """否定缓存条目记录的上游错误（status、body），正常条目为None"""
+        return self.meta.get("negative")
+    
+    @property
+    def is_stale(self) -> bool:
+        """是否已超过软过期时间"""
+        return self.fresh_until is not None and time.time() >= self.fresh_until
+    
+    def to_raw(self) -> Any:
+        """转换为存储格式"""
+        if self.fresh_until is None and not self.meta:
+            return self.value
+        return {self.MARKER: 1, "value": self.value, "fresh_until": self.fresh_until, "meta": self.meta}
+    
+    @classmethod
+    def from_raw(cls, raw: Any) -> "CacheEntry":
+        """从存储格式还原条目"""
+        if isinstance(raw, dict) and raw.get(cls.MARKER):
+            return cls(raw.get("value"), raw.get("fresh_until"), raw.get("meta"))
+        return cls(raw)
+
+
+class JsonCodec:
+    """标准库json编解码器"""
+    
+    name = "json"
+    # 写入Redis时的编码标记，json 与 orjson 的输出格式相同，共用一个标记
+    tag = "json"
+    
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode("utf-8")
+    
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson编解码器，输出标准JSON，可与 JsonCodec 互相读取"""
+    
+    name = "orjson"
+    
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson 不支持超过64位的整数等少数类型，退回标准库
+            return super().dumps(value)
+    
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """msgpack编解码器，体积更小，但旧版本的worker无法读取"""
+    
+    name = "msgpack"
+    tag = "msgpack"
+    
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def get_codec(name: str = "auto") -> Any:
+    """根据名称获取编解码器
+    
+    Args:
+        name: auto（优先orjson，未安装时使用json）、orjson、msgpack 或 json；
+            msgpack 条目无法被旧版本读取，只在明确指定时使用
+        
+    Returns:
+        编解码器实例，指定的模块未安装时退回标准库json
+    """
+    name = name.lower()
+    if name == "auto":
+        name = "orjson" if orjson else "json"
+    if name == "orjson" and orjson:
+        return OrjsonCodec()
+    if name == "msgpack" and msgpack:
+        return MsgpackCodec()
+    if name not in ("json", "orjson", "msgpack"):
+        logger.warning(f"⚠️ 未知的缓存编解码器 {name}，将使用json")
+    elif name != "json":
+        logger.warning(f"⚠️ {name}模块未安装，缓存将使用json序列化")
+    return JsonCodec()
+
+
+class ValueCompressor:
+    """Redis缓存值的序列化与压缩，并统计压缩率和每次操作的CPU耗时
+    
+    非json编码或压缩后的值以 \\x00<编码>+<压缩算法>: 开头，json编码可省略，如 \\x00zlib:、\\x00msgpack+zstd:；
+    JSON 不会以 \\x00 开头，因此未压缩的旧条目与新条目可以混合读取，滚动升级期间各worker互不影响。
+    """
+    
+    COMPRESSIONS = ("zlib", "zstd")
+    
+    def __init__(self, algorithm: str = "auto", threshold: int = 1024, level: Optional[int] = None, codec: Any = None):
+        """初始化压缩器
+        
+        Args:
+            algorithm: 压缩算法，auto（优先zstd，未安装时使用zlib）、zstd、zlib 或 none
+            threshold: 序列化后达到该字节数才压缩
+            level: 压缩级别，默认zlib为6、zstd为3
+            codec: 写入时使用的编解码器，默认标准库json；读取时按标记选择编解码器
+        """
+        algorithm = algorithm.lower()
+        if algorithm == "auto":
+            algorithm = "zstd" if zstd else "zlib"
+        elif algorithm == "zstd" and not zstd:
+            logger.warning("⚠️ zstandard模块未安装，缓存压缩将使用zlib")
+            algorithm = "zlib"
+        self.algorithm = algorithm if algorithm in self.COMPRESSIONS else "none"
+        self.threshold = threshold
+        self.level = level
+        self.codec = codec or JsonCodec()
+        
+        # 读取时按标记选择编解码器，json 标记优先使用更快的 orjson
+        self._codecs: Dict[str, Any] = {"json": OrjsonCodec() if orjson else JsonCodec()}
+        if msgpack:
+            self._codecs["msgpack"] = MsgpackCodec()
+        
+        # zstd 压缩器与解压器不是线程安全的，编解码在多个线程中进行，每个线程各自创建
+        self._zstd_local = threading.local()
+        
+        # 压缩统计，编解码在多个线程中进行，统计在锁内更新
+        self._stats_lock = threading.Lock()
+        self.compress_count = 0
+        self.decompress_count = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.compress_time = 0.0
+        self.decompress_time = 0.0
+    
+    def encode(self, value: Any) -> bytes:
+        """序列化缓存值，超过阈值时压缩"""
+        data = self.codec.dumps(value)
+        parts = [] if self.codec.tag == "json" else [self.codec.tag]
+        if self.algorithm != "none" and len(data) >= self.threshold:
+            started = time.thread_time()
+            if self.algorithm == "zstd":
+                compressed = self._get_zstd("compressor").compress(data)
+            else:
+                compressed = zlib.compress(data, self.level if self.level is not None else 6)
+            elapsed = time.thread_time() - started
+            with self._stats_lock:
+                self.compress_time += elapsed
+                self.compress_count += 1
+                self.raw_bytes += len(data)
+                self.compressed_bytes += len(compressed)
+            data = compressed
+            parts.append(self.algorithm)
+        if not parts:
+            return data
+        return b"\x00" + "+".join(parts).encode("ascii") + b":" + data
+    
+    def _get_zstd(self, kind: str) -> Any:
+        """获取当前线程的zstd压缩器（compressor）或解压器（decompressor），首次使用时创建"""
+        instance = getattr(self._zstd_local, kind, None)
+        if instance is None:
+            if kind == "compressor":
+                instance = zstd.ZstdCompressor(level=self.level if self.level is not None else 3)
+            else:
+                instance = zstd.ZstdDecompressor()
+            setattr(self._zstd_local, kind, instance)
+        return instance
+    
+    def decode(self, data: Any) -> Any:
+        """还原缓存值，按标记识别编解码器和压缩算法，未带标记的值按JSON读取"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        tag = "json"
+        if data[:1] == b"\x00":
+            end = data.index(b":")
+            parts = data[1:end].decode("ascii").split("+")
+            data = data[end + 1:]
+            if parts[-1] in self.COMPRESSIONS:
+                started = time.thread_time()
+                if parts[-1] == "zstd":
+                    if not zstd:
+                        raise ValueError("缓存值使用zstd压缩，但zstandard模块未安装")
+                    data = self._get_zstd("decompressor").decompress(data)
+                else:
+                    data = zlib.decompress(data)
+                elapsed = time.thread_time() - started
+                with self._stats_lock:
+                    self.decompress_time += elapsed
+                    self.decompress_count += 1
+                parts.pop()
+            if parts:
+                tag = parts[0]
+        codec = self._codecs.get(tag)
+        if codec is None:
+            raise ValueError(f"缓存值使用{tag}编码，但对应模块未安装")
+        return codec.loads(data)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取压缩统计，ratio 为压缩后与压缩前的字节数之比"""
+        return {
+            "codec": self.codec.name,
+            "algorithm": self.algorithm,
+            "threshold": self.threshold,
+            "compress_count": self.compress_count,
+            "decompress_count": self.decompress_count,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "ratio": round(self.compressed_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+            "compress_ms_per_op": round(self.compress_time / self.compress_count * 1000, 4) if self.compress_count else 0,
+            "decompress_ms_per_op": round(self.decompress_time / self.decompress_count * 1000, 4) if self.decompress_count else 0
+        }
+
+
+class SqliteCache:
+    """基于SQLite（WAL模式）的磁盘缓存后端，重启后缓存仍然保留
+    
+    与 MemoryCache 接口一致，可替代其作为本地后端。同一主机上的多个worker进程可以共享同一个数据库文件：
+    写操作在 BEGIN IMMEDIATE 事务中完成，读写互不阻塞；每个线程使用独立的连接。
+    支持按条目过期、条目数与字节数上限（按最近访问时间淘汰）以及单个写入者的字节份额，
+    条目可以记录分类（接口类型），按分类统计当前与被淘汰的字节数。
+    """
+    
+    # 访问时间的更新间隔（秒），避免每次读取都产生写操作
+    TOUCH_INTERVAL = 60
+    # 每写入多少次清理一次过期条目
+    PURGE_INTERVAL = 100
+    
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100000,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_owner_bytes: int = 0,
+        compressor: Optional["ValueCompressor"] = None
+    ):
+        """初始化磁盘缓存
+        
+        Args:
+            path: 数据库文件路径
+            max_entries: 最大条目数
+            max_bytes: 最大字节数（按序列化后大小计算）
+            max_owner_bytes: 单个写入者的最大字节数，不大于0时不限制
+            compressor: 缓存值的序列化与压缩，默认使用标准库json
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_owner_bytes = max_owner_bytes
+        self.compressor = compressor or ValueCompressor(algorithm="none")
+        self._local = threading.local()
+        self._pid = os.getpid()
+        # fork 前打开的连接不能在子进程中使用，也不能关闭（会释放父进程持有的文件锁），只保留引用
+        self._inherited: List[threading.local] = []
+        self._write_count = 0
+        self.peak_bytes = 0
+        self.evicted_bytes = 0
+        self.eviction_count = 0
+        self.expiration_count = 0
+        # 分类 -> 本进程淘汰的字节数与条目数，以及统计时观察到的峰值字节数
+        self.category_stats: Dict[str, Dict[str, int]] = {}
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expire_at REAL, accessed_at REAL NOT NULL, owner TEXT, category TEXT)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "category" not in columns:
+                # 兼容旧版本创建的数据库
+                conn.execute("ALTER TABLE entries ADD COLUMN category TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expire ON entries (expire_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_owner ON entries (owner, accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries "
+                "BEGIN DELETE FROM tags WHERE key = old.key; END"
+            )
+            # 条目数与字节数的累计值：owner 为空字符串的行是全部条目，其余为各写入者；
+            # 由触发器在写事务内维护，淘汰检查不必每次扫描整个表，共享数据库的其他进程同样生效
+            has_totals = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'totals'"
+            ).fetchone()[0]
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals (owner TEXT PRIMARY KEY, count INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            if not has_totals:
+                # 旧版本创建的数据库，按现有条目初始化
+                conn.execute("INSERT INTO totals SELECT '', COUNT(*), COALESCE(SUM(size), 0) FROM entries")
+                conn.execute(
+                    "INSERT INTO totals SELECT owner, COUNT(*), SUM(size) FROM entries WHERE owner IS NOT NULL GROUP BY owner"
+                )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert_totals AFTER INSERT ON entries BEGIN "
+                "INSERT OR IGNORE INTO totals (owner, count, bytes) SELECT new.owner, 0, 0 WHERE new.owner IS NOT NULL; "
+                "UPDATE totals SET count = count + 1, bytes = bytes + new.size WHERE owner = '' OR owner = new.owner; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete_totals AFTER DELETE ON entries BEGIN "
+                "UPDATE totals SET count = count - 1, bytes = bytes - old.size WHERE owner = '' OR owner = old.owner; "
+                "DELETE FROM totals WHERE owner = old.owner AND count <= 0; END"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的连接，fork 后的子进程重新建立连接"""
+        if self._pid != os.getpid():
+            self._inherited.append(self._local)
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+    
+    def _transaction(self) -> "_SqliteTransaction":
+        return _SqliteTransaction(self._connect())
+    
+    def __len__(self) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM entries WHERE expire_at IS NULL OR expire_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，过期条目会被惰性删除"""
+        conn = self._connect()
+        row = conn.execute("SELECT value, expire_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, expire_at, accessed_at = row
+        now = time.time()
+        if expire_at is not None and expire_at <= now:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ? AND expire_at <= ?", (key, now))
+                # 计数在写事务内更新，各线程的写事务互斥
+                self.expiration_count += 1
+            return None
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            with self._transaction() as conn:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return self.compressor.decode(data)
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expire: Optional[int] = None,
+        tags: Iterable[str] = (),
+        owner: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> None:
+        """设置缓存值
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+            expire: 过期时间（秒），为空或不大于0时永不过期
+            tags: 缓存标签，用于按标签失效
+            owner: 写入者（租户标识），用于按租户统计并限制份额
+            category: 分类（接口类型），用于按分类统计字节数
+        """
+        data = self.compressor.encode(value)
+        size = len(data)
+        now = time.time()
+        expire_at = now + expire if expire and expire > 0 else None
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if size > self.max_bytes:
+                # 单个条目超过总预算，直接拒绝写入
+                self._record_eviction(size, category)
+                return
+            conn.execute(
+                "INSERT INTO entries (key, value, size, expire_at, accessed_at, owner, category) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), size, expire_at, now, owner, category)
+            )
+            conn.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+            self._write_count += 1
+            if self._write_count % self.PURGE_INTERVAL == 0:
+                self._purge_expired(conn, now)
+            if owner is not None and self.max_owner_bytes > 0:
+                self._evict(conn, self.max_owner_bytes, owner)
+            self._evict(conn, self.max_bytes)
+    
+    def _purge_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        cursor = conn.execute("DELETE FROM entries WHERE expire_at IS NOT NULL AND expire_at <= ?", (now,))
+        self.expiration_count += max(cursor.rowcount, 0)
+    
+    def _category_stats(self, category: str) -> Dict[str, int]:
+        stats = self.category_stats.get(category)
+        if stats is None:
+            stats = self.category_stats[category] = {"peak_bytes": 0, "evicted_bytes": 0, "eviction_count": 0}
+        return stats
+    
+    def _record_eviction(self, size: int, category: Optional[str]) -> None:
+        self.eviction_count += 1
+        self.evicted_bytes += size
+        if category is not None:
+            stats = self._category_stats(category)
+            stats["evicted_bytes"] += size
+            stats["eviction_count"] += 1
+    
+    def _evict(self, conn: sqlite3.Connection, max_bytes: int, owner: Optional[str] = None) -> None:
+        """按最近访问时间淘汰条目，直到满足条目数和字节数上限；指定写入者时只淘汰该写入者的条目"""
+        where, params = ("WHERE owner = ?", (owner,)) if owner is not None else ("", ())
+        count, total = self._totals(conn, owner)
+        max_entries = self.max_entries if owner is None else count
+        if count <= max_entries and total <= max_bytes:
+            if owner is None:
+                self.peak_bytes = max(self.peak_bytes, total)
+            return
+        if owner is None:
+            self._purge_expired(conn, time.time())
+            count, total = self._totals(conn)
+        victims: List[str] = []
+        query = f"SELECT key, size, category FROM entries {where} ORDER BY accessed_at, rowid"
+        for key, size, category in conn.execute(query, params):
+            if count <= max_entries and total <= max_bytes:
+                break
+            victims.append(key)
+            self._record_eviction(size, category)
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        if owner is None:
+            self.peak_bytes = max(self.peak_bytes, total)
+    
+    @staticmethod
+    def _totals(conn: sqlite3.Connection, owner: Optional[str] = None) -> tuple:
+        """读取全部条目（或指定写入者）的累计条目数与字节数"""
+        row = conn.execute("SELECT count, bytes FROM totals WHERE owner = ?", (owner if owner is not None else "",)).fetchone()
+        return row if row is not None else (0, 0)
+    
+    def ttl(self, key: str) -> Optional[float]:
+        """获取条目的剩余过期时间（秒），不存在返回None，永不过期返回-1"""
+        row = self._connect().execute("SELECT expire_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[0] is None:
+            return -1
+        return max(row[0] - time.time(), 0)
+    
+    def size(self, key: str) -> Optional[int]:
+        """获取条目占用的字节数，不存在返回None"""
+        row = self._connect().execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+    
+    def delete(self, key: str) -> None:
+        """删除缓存值"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+    
+    def delete_pattern(self, pattern: str) -> int:
+        """按glob模式删除缓存值，返回删除的条目数"""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM entries WHERE key GLOB ?", (pattern,))
+            return max(cursor.rowcount, 0)
+    
+    def delete_tag(self, tag: str) -> List[str]:
+        """删除标签下的全部缓存值，返回删除的缓存键"""
+        with self._transaction() as conn:
+            keys = [row[0] for row in conn.execute("SELECT key FROM tags WHERE tag = ?", (tag,))]
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+            conn.execute("DELETE FROM tags WHERE tag = ?", (tag,))
+            return keys
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM tags")
+    
+    @property
+    def owner_bytes(self) -> Dict[str, int]:
+        """各写入者占用的字节数"""
+        rows = self._connect().execute("SELECT owner, bytes FROM totals WHERE owner != ''").fetchall()
+        return {owner: size for owner, size in rows}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取磁盘缓存统计信息"""
+        conn = self._connect()
+        entries, total = self._totals(conn)
+        tags = conn.execute("SELECT COUNT(DISTINCT tag) FROM tags").fetchone()[0]
+        current = dict(conn.execute(
+            "SELECT category, SUM(size) FROM entries WHERE category IS NOT NULL GROUP BY category"
+        ).fetchall())
+        categories: Dict[str, Dict[str, int]] = {}
+        for category in set(current) | set(self.category_stats):
+            stats = self._category_stats(category)
+            stats["peak_bytes"] = max(stats["peak_bytes"], current.get(category, 0))
+            categories[category] = dict(stats, bytes=current.get(category, 0))
+        return {
+            "entries": entries,
+            "tags": tags,
+            "policy": "lru",
+            "bytes": total,
+            "peak_bytes": max(self.peak_bytes, total),
+            "evicted_bytes": self.evicted_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "max_owner_bytes": self.max_owner_bytes,
+            "eviction_count": self.eviction_count,
+            "expiration_count": self.expiration_count,
+            "categories": categories,
+            "path": self.path
+        }
+
+
+class _SqliteTransaction:
+    """以 BEGIN IMMEDIATE 开启写事务，退出时提交，异常时回滚"""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+    
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+
+
 class CacheManager:
     """缓存管理器，负责与Redis交互"""
     
     def __init__(self):
-        """初始化缓存管理器"""
-        self.redis_client = None
-        self.memory_cache: Dict[str, Any] = {}
+        """初始化缓存管理器，不访问网络；Redis连接在首次使用缓存或调用 connect 时于后台建立"""
+        # 当前使用的Redis连接，见 redis_client
+        self._redis_active = None
+        self._connect_started = False
+        # 配置的Redis连接；连接建立前与熔断期间不使用，后台通过此连接探测Redis是否可用
+        self._redis = None
+        # 单个租户（Token）在进程内缓存中的字节份额，避免一个租户淘汰其他租户的条目
+        self.tenant_max_bytes = int(CONFIG.get("CACHE_TENANT_MAX_BYTES", "0"))
         
-        # 从配置中获取Redis连接信息
+        # 从配置中获取Redis连接信息，命令与建立连接的超时较短，Redis故障时尽快失败
         self.redis_url = CONFIG.get("REDIS_URL", "redis://localhost:6379/0")
+        self.redis_timeout = float(CONFIG.get("REDIS_SOCKET_TIMEOUT", "2"))
+        # 标签集合的过期时间，每次登记成员时刷新
+        self.tag_ttl = int(CONFIG.get("CACHE_TAG_TTL", str(7 * 86400)))
+        # 否定缓存（404/403）的过期时间，不大于0时不缓存错误
+        self.negative_ttl = int(CONFIG.get("CACHE_NEGATIVE_TTL", "60"))
+        # Token对知识库访问权限的证明有效期，过期后需要重新向上游请求一次
+        self.access_ttl = int(CONFIG.get("CACHE_ACCESS_TTL", "3600"))
+        # 工具格式化输出（渲染结果）的过期时间，不大于0时不缓存渲染结果
+        self.render_ttl = int(CONFIG.get("CACHE_RENDER_TTL", "3600"))
+        # 按内容寻址存储文档正文：条目只保存正文的内容哈希，相同的正文只存储一次；
+        # 旧版本读取拆分后的条目会得到没有正文的文档，滚动升级完成后再启用
+        self.body_dedup = CONFIG.get("CACHE_BODY_DEDUP", "false").lower() == "true"
+        self.body_min_size = int(CONFIG.get("CACHE_BODY_DEDUP_MIN_SIZE", "1024"))
+        # 正文的过期时间取引用它的条目中最长的一个，且不超过该上限（秒），避免正文无限期保留
+        self.body_max_ttl = max(1, int(CONFIG.get("CACHE_BODY_DEDUP_MAX_TTL", "2592000")))
+        # Redis 是否支持 EXPIRE GT（7.0+），每次连接成功后通过 INFO 读取；不支持时正文的过期时间先读取再延长
+        self.expire_gt = False
+        # 缓存值的编解码器，较大的缓存值（主要是文档正文）写入Redis前压缩
+        compression_level = CONFIG.get("CACHE_COMPRESSION_LEVEL", "")
+        self.compressor = ValueCompressor(
+            algorithm=CONFIG.get("CACHE_COMPRESSION", "auto"),
+            threshold=int(CONFIG.get("CACHE_COMPRESSION_THRESHOLD", "1024")),
+            level=int(compression_level) if compression_level else None,
+            codec=get_codec(CONFIG.get("CACHE_CODEC", "auto"))
+        )
+        
+        # 进程内缓存（含L1）的淘汰策略，gdsf 按大小和访问频率淘汰，避免大文档挤掉大量小而热的条目
+        self.eviction_policy = CONFIG.get("CACHE_EVICTION_POLICY", "gdsf").lower()
+        
+        # 缓存后端：auto/redis 优先使用Redis，不可用时使用本地后端；memory 和 sqlite 不连接Redis
+        self.backend = CONFIG.get("CACHE_BACKEND", "auto").lower()
+        self.memory_cache = self._create_local_backend()
         
-        # 只有当redis模块可用时，才尝试连接Redis
-        if redis:
+        # 只有当redis模块可用时，才使用Redis；这里只创建连接对象，不建立连接
+        if self.backend not in ("auto", "redis"):
+            logger.info(f"✅ 使用本地缓存后端: {self.backend}")
+        elif redis:
             try:
-                self.redis_client = redis.from_url(self.redis_url)
-                # 测试Redis连接
-                self.redis_client.ping()
-                logger.info(f"✅ 成功连接到Redis: {self.redis_url}")
-            except redis.ConnectionError as e:
-                logger.warning(f"❌ Redis连接失败: {e}")
-                logger.warning("⚠️ 将使用内存缓存作为备选方案")
-                self.redis_client = None
+                self._redis = redis.from_url(self.redis_url, socket_timeout=self.redis_timeout, socket_connect_timeout=self.redis_timeout)
             except Exception as e:
                 logger.warning(f"❌ Redis初始化失败: {e}")
                 logger.warning("⚠️ 将使用内存缓存作为备选方案")
-                self.redis_client = None
+                self._redis = None
         else:
             logger.info("⚠️ Redis模块未安装，将使用内存缓存")
         
+        # Redis熔断：连接类错误在时间窗口内达到阈值后切换到本地缓存，后台定期探测，恢复后自动切回
+        self.redis_failure_threshold = max(1, int(CONFIG.get("CACHE_REDIS_FAILURE_THRESHOLD", "3")))
+        self.redis_failure_window = float(CONFIG.get("CACHE_REDIS_FAILURE_WINDOW", "10"))
+        self.redis_probe_interval = max(0.1, float(CONFIG.get("CACHE_REDIS_PROBE_INTERVAL", "5")))
+        self.redis_max_pending_invalidations = int(CONFIG.get("CACHE_REDIS_MAX_PENDING_INVALIDATIONS", "10000"))
+        self._breaker_lock = threading.Lock()
+        self._redis_failures: List[float] = []
+        # 熔断期间在本地执行的失效操作 (类型, 值)，恢复时在Redis上重放
+        self._pending_invalidations: List[tuple] = []
+        self._prober: Optional[threading.Thread] = None
+        # close() 后置位，后台线程（探测、统计上报、失效订阅）随之退出
+        self._closed = threading.Event()
+        # 熔断状态：connecting 首次连接尚未完成；closed 使用Redis；open 使用本地缓存并后台探测；
+        # half_open 探测成功、正在重放失效操作；disabled 未配置Redis或已关闭
+        self.redis_state = "connecting" if self._redis else "disabled"
+        self.redis_state_since = time.time()
+        self.redis_state_durations: Dict[str, float] = {}
+        self.redis_transition_count = 0
+        self.redis_transitions: List[Dict[str, Any]] = []
+        
         # 缓存统计
         self.hit_count = 0
         self.miss_count = 0
+        self.l1_hit_count = 0
+        self.stale_hit_count = 0
+        self.refresh_count = 0
+        self.revalidation_count = 0
+        self.not_modified_count = 0
+        self.revalidation_bytes_saved = 0
+        self.negative_hit_count = 0
+        self.negative_store_count = 0
+        self.render_hit_count = 0
+        self.render_miss_count = 0
+        # 租户标识 -> 命中、未命中次数与写入字节数
+        self.tenant_stats: Dict[str, Dict[str, int]] = {}
+        # 接口类型（user、repo、doc_list、doc、search、stats）-> ENDPOINT_STAT_FIELDS 计数
+        self.endpoint_stats: Dict[str, Dict[str, int]] = {}
+        # 统计计数会被多个线程（请求线程、后台刷新线程）同时更新
+        self._stats_lock = threading.Lock()
+        
+        # 可选的跨worker统计汇总：各worker定期把计数增量累加到Redis哈希
+        self.stats_aggregate = CONFIG.get("CACHE_STATS_AGGREGATE", "false").lower() == "true"
+        self.stats_flush_interval = max(1, int(CONFIG.get("CACHE_STATS_FLUSH_INTERVAL", "5")))
+        self._pending_stats: Dict[str, int] = {}
+        self._stats_flusher: Optional[threading.Thread] = None
+        
+        # 缓存键 -> 命中次数，用于列出最热的键；只跟踪有限数量的键，超出时保留命中较多的一半
+        self.hot_keys_limit = max(0, int(CONFIG.get("CACHE_HOT_KEYS_TRACKED", "1000")))
+        self.key_hits: Dict[str, int] = {}
+        
+        # 正在后台刷新（含排队中）的缓存键；刷新在有界线程池中执行，排队的键过多时跳过刷新，继续返回旧值
+        self._refreshing: set = set()
+        self._refresh_lock = threading.Lock()
+        self.refresh_max_pending = max(1, int(CONFIG.get("CACHE_REFRESH_MAX_PENDING", "100")))
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(CONFIG.get("CACHE_REFRESH_WORKERS", "4"))),
+            thread_name_prefix="cache-refresh"
+        )
+        
+        # 可选的进程内一级缓存（L1），通过Redis发布订阅保持各worker间一致
+        self.instance_id = uuid.uuid4().hex
+        self.invalidation_channel = CONFIG.get("CACHE_INVALIDATION_CHANNEL", "yuque:cache:invalidate")
+        self.l1_ttl = int(CONFIG.get("CACHE_L1_TTL", "60"))
+        self.l1_cache: Optional[MemoryCache] = None
+        self._subscriber: Optional[threading.Thread] = None
+        self._pubsub: Any = None
+        if self._redis and CONFIG.get("CACHE_L1_ENABLED", "false").lower() == "true":
+            self.l1_cache = MemoryCache(
+                max_entries=int(CONFIG.get("CACHE_L1_MAX_ENTRIES", "1000")),
+                max_bytes=int(CONFIG.get("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024))),
+                max_owner_bytes=self.tenant_max_bytes,
+                policy=self.eviction_policy
+            )
+        
+        if self.stats_aggregate and not self._redis:
+            logger.warning("⚠️ 跨worker统计汇总需要Redis，当前只统计本进程")
+    
+    @property
+    def redis_client(self) -> Any:
+        """当前使用的Redis连接，连接建立前与熔断期间为None；首次访问时在后台发起连接"""
+        if not self._connect_started:
+            self.connect()
+        return self._redis_active
+    
+    @redis_client.setter
+    def redis_client(self, client: Any) -> None:
+        self._redis_active = client
+    
+    def connect(self) -> None:
+        """在后台建立Redis连接并启动L1失效订阅、统计上报，不阻塞调用方，重复调用无副作用
+        
+        首次使用缓存时自动调用，应用也可在启动时调用以尽早连接；连接建立前的读写使用本地缓存。
+        """
+        with self._breaker_lock:
+            if self._connect_started:
+                return
+            self._connect_started = True
+        if self._redis is None:
+            return
+        if self.l1_cache is not None:
+            self._start_subscriber()
+        if self.stats_aggregate:
+            self._start_stats_flusher()
+        self._start_prober(delay=0)
+    
+    def _create_local_backend(self) -> Any:
+        """创建本地缓存后端：进程内缓存，或 CACHE_BACKEND=sqlite 时的磁盘缓存"""
+        if self.backend == "sqlite":
+            path = CONFIG.get("CACHE_SQLITE_PATH", os.path.join(os.getcwd(), "yuque-cache.db"))
+            try:
+                return SqliteCache(
+                    path,
+                    max_entries=int(CONFIG.get("CACHE_SQLITE_MAX_ENTRIES", "100000")),
+                    max_bytes=int(CONFIG.get("CACHE_SQLITE_MAX_BYTES", str(256 * 1024 * 1024))),
+                    max_owner_bytes=self.tenant_max_bytes,
+                    compressor=self.compressor
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"❌ SQLite缓存初始化失败: {e}")
+                logger.warning("⚠️ 将使用内存缓存作为备选方案")
+                self.backend = "memory"
+        return MemoryCache(
+            max_entries=int(CONFIG.get("CACHE_MEMORY_MAX_ENTRIES", "10000")),
+            max_bytes=int(CONFIG.get("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))),
+            max_owner_bytes=self.tenant_max_bytes,
+            policy=self.eviction_policy
+        )
+    
+    def _start_subscriber(self) -> None:
+        """启动后台线程订阅失效通知"""
+        def listen():
+            while not self._closed.is_set():
+                try:
+                    self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                    self._pubsub.subscribe(self.invalidation_channel)
+                    for message in self._pubsub.listen():
+                        self._apply_invalidation(message.get("data"))
+                except Exception as e:
+                    if self._closed.is_set():
+                        return
+                    # 订阅中断期间无法保证L1一致，先整体清空再重连
+                    logger.warning(f"❌ 缓存失效订阅中断: {e}")
+                    self.l1_cache.clear()
+                    self._closed.wait(self.redis_probe_interval)
+        
+        self._subscriber = threading.Thread(target=listen, name="cache-invalidation", daemon=True)
+        self._subscriber.start()
+        logger.info(f"✅ 已启用L1缓存，失效通知频道: {self.invalidation_channel}")
+    
+    def _build_invalidation(self, kind: str, value: Any = "") -> str:
+        """构造失效通知消息"""
+        return json.dumps({"origin": self.instance_id, "type": kind, "value": value})
+    
+    def _publish_invalidation(self, kind: str, value: Any = "") -> None:
+        """在本地L1执行失效并广播给其他worker"""
+        if self.l1_cache is None:
+            return
+        self._invalidate_l1(kind, value)
+        self._redis.publish(self.invalidation_channel, self._build_invalidation(kind, value))
+    
+    def _apply_invalidation(self, payload: Any) -> None:
+        """处理其他worker发来的失效通知"""
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.instance_id:
+            return
+        self._invalidate_l1(message.get("type"), message.get("value", ""))
+    
+    def _invalidate_l1(self, kind: Optional[str], value: Any) -> None:
+        """按通知类型使L1条目失效"""
+        if self.l1_cache is None:
+            return
+        if kind == "key":
+            self.l1_cache.delete(value)
+        elif kind == "keys":
+            for key in value:
+                self.l1_cache.delete(key)
+        elif kind == "pattern":
+            self.l1_cache.delete_pattern(value)
+        else:
+            self.l1_cache.clear()
+    
+    def _get_l1(self, key: str) -> Optional[Any]:
+        """从L1读取缓存值"""
+        if self.l1_cache is None:
+            return None
+        return self.l1_cache.get(key)
+    
+    def _set_l1(self, key: str, value: Any, expire: Optional[int], tenant: Optional[str] = None, endpoint: Optional[str] = None) -> None:
+        """写入L1，过期时间不超过CACHE_L1_TTL，以限制丢失通知时的陈旧窗口"""
+        if self.l1_cache is None:
+            return
+        ttl = min(expire, self.l1_ttl) if expire and expire > 0 else self.l1_ttl
+        self.l1_cache.set(key, value, expire=ttl, owner=tenant, category=get_endpoint_class(endpoint) if endpoint else None)
+    
+    def _start_stats_flusher(self) -> None:
+        """启动后台线程，定期把本进程的统计增量上报到Redis"""
+        def flush():
+            while not self._closed.wait(self.stats_flush_interval):
+                self.flush_stats()
+        
+        self._stats_flusher = threading.Thread(target=flush, name="cache-stats", daemon=True)
+        self._stats_flusher.start()
+        logger.info(f"✅ 已启用跨worker统计汇总，上报间隔: {self.stats_flush_interval}秒")
+    
+    def _transition(self, state: str, reason: str = "") -> None:
+        """切换熔断状态，累计在原状态停留的时间，调用方需持有 _breaker_lock"""
+        now = time.time()
+        previous = self.redis_state
+        self.redis_state_durations[previous] = self.redis_state_durations.get(previous, 0.0) + now - self.redis_state_since
+        self.redis_state, self.redis_state_since = state, now
+        self.redis_transition_count += 1
+        self.redis_transitions.append({"from": previous, "to": state, "time": now, "reason": reason})
+        del self.redis_transitions[:-10]
+    
+    def _record_redis_failure(self, error: Exception) -> None:
+        """记录一次Redis操作失败，连接类错误在 CACHE_REDIS_FAILURE_WINDOW 秒内达到阈值时打开熔断"""
+        if not isinstance(error, REDIS_CONNECTION_ERRORS):
+            return
+        now = time.time()
+        with self._breaker_lock:
+            if self.redis_state != "closed":
+                return
+            self._redis_failures = [t for t in self._redis_failures if t > now - self.redis_failure_window]
+            self._redis_failures.append(now)
+            if len(self._redis_failures) < self.redis_failure_threshold:
+                return
+            self._redis_failures = []
+            self.redis_client = None
+            self._transition("open", str(error))
+        logger.warning(f"🔥 Redis连续失败，已切换到本地缓存，每{self.redis_probe_interval}秒探测一次: {error}")
+        self._start_prober()
+    
+    def _start_prober(self, delay: Optional[float] = None) -> None:
+        """启动后台线程定期探测Redis，恢复后切回Redis
+        
+        Args:
+            delay: 首次探测前等待的秒数，默认为探测间隔
+        """
+        def probe():
+            self._closed.wait(self.redis_probe_interval if delay is None else delay)
+            while True:
+                self.probe_redis()
+                with self._breaker_lock:
+                    if self.redis_state == "closed" or self._redis is None or self._closed.is_set():
+                        self._prober = None
+                        return
+                self._closed.wait(self.redis_probe_interval)
+        
+        with self._breaker_lock:
+            if self._prober is not None:
+                return
+            self._prober = threading.Thread(target=probe, name="cache-redis-probe", daemon=True)
+            self._prober.start()
+    
+    def close(self) -> None:
+        """停止后台线程（连接探测、统计上报、失效订阅、后台刷新）并关闭Redis连接，之后的读写使用本地缓存
+        
+        关闭前上报尚未汇总的统计增量；关闭后不再自动连接，重复调用无副作用。
+        """
+        if self._closed.is_set():
+            return
+        if self.stats_aggregate and self._redis_active is not None:
+            self.flush_stats()
+        with self._breaker_lock:
+            self._closed.set()
+            self._connect_started = True
+            self.redis_client = None
+            if self.redis_state != "disabled":
+                self._transition("disabled", "closed")
+        self._refresh_executor.shutdown(wait=False)
+        try:
+            if self._pubsub is not None:
+                self._pubsub.close()
+            if self._redis is not None:
+                self._redis.close()
+        except Exception as e:
+            logger.debug(f"关闭Redis连接失败: {e}")
+    
+    def _detect_expire_gt(self) -> None:
+        """通过 INFO 读取Redis版本，判断是否支持 EXPIRE GT（7.0+）；读取失败时按不支持处理"""
+        try:
+            version = str(self._redis.info("server").get("redis_version", ""))
+            self.expire_gt = int(version.split(".")[0]) >= 7
+        except Exception as e:
+            logger.debug(f"读取Redis版本失败: {e}")
+            version, self.expire_gt = "未知版本", False
+        if self.body_dedup and not self.expire_gt:
+            logger.warning(f"⚠️ Redis {version} 不支持 EXPIRE GT（需要 7.0+），共享正文的过期时间将先读取再延长")
+    
+    def probe_redis(self) -> bool:
+        """探测Redis是否恢复：PING成功后在Redis上重放熔断期间的失效操作，再切回Redis
+        
+        熔断期间写入本地缓存的条目在切回后丢弃，L1 因可能错过其他worker的失效通知而整体清空。
+        
+        Returns:
+            当前是否使用Redis
+        """
+        if self._redis is None or self._closed.is_set():
+            return False
+        if self.redis_state == "closed":
+            return True
+        first_connect = self.redis_state == "connecting"
+        pending: List[tuple] = []
+        try:
+            self._redis.ping()
+            self._detect_expire_gt()
+            with self._breaker_lock:
+                self._transition("half_open", "ping")
+            while True:
+                with self._breaker_lock:
+                    pending, self._pending_invalidations = self._pending_invalidations, []
+                    if not pending:
+                        self.redis_client = self._redis
+                        self._transition("closed", "recovered")
+                        break
+                for kind, value in pending:
+                    self._replay_invalidation(kind, value)
+                pending = []
+        except Exception as e:
+            if first_connect:
+                logger.warning(f"❌ Redis连接失败: {e}")
+                logger.warning("⚠️ 将使用内存缓存作为备选方案，并在后台定期重连")
+            else:
+                logger.debug(f"Redis探测失败: {e}")
+            with self._breaker_lock:
+                self._pending_invalidations = pending + self._pending_invalidations
+                if self.redis_state != "open":
+                    self._transition("open", str(e))
+            return False
+        self.memory_cache.clear()
+        self._invalidate_l1("clear", "")
+        if first_connect:
+            logger.info(f"✅ 成功连接到Redis: {self.redis_url}")
+        else:
+            logger.info(f"✅ Redis已恢复，切回Redis缓存: {self.redis_url}")
+        return True
+    
+    def _defer_invalidation(self, kind: str, value: Any = "") -> None:
+        """熔断期间记录在本地执行的失效操作，Redis恢复后重放；积压过多时改为恢复后删除本服务的全部键"""
+        if self._redis is None:
+            return
+        with self._breaker_lock:
+            if self.redis_state == "closed" or self._pending_invalidations[:1] == [("clear", "")]:
+                return
+            if kind == "clear" or len(self._pending_invalidations) >= self.redis_max_pending_invalidations:
+                self._pending_invalidations = [("clear", "")]
+            else:
+                self._pending_invalidations.append((kind, value))
+    
+    def _replay_invalidation(self, kind: str, value: Any) -> None:
+        """在Redis上执行一项积压的失效操作，并通知其他worker"""
+        if kind == "key":
+            self._redis.delete(value)
+            self._publish_invalidation("key", value)
+        elif kind == "pattern":
+            self._unlink_pattern(pattern=value)
+        elif kind == "tags":
+            self._unlink_tags(value)
+        else:
+            # 不自动执行 FLUSHDB：Redis数据库可能与其他服务共用，只增量删除本服务的键
+            self._unlink_pattern(CACHE_KEY_PATTERN)
+            self._publish_invalidation("clear")
+    
+    def get_redis_status(self) -> Dict[str, Any]:
+        """Redis熔断状态：当前状态及其开始时间、切换次数、最近的切换记录和各状态累计停留的秒数"""
+        with self._breaker_lock:
+            durations = dict(self.redis_state_durations)
+            durations[self.redis_state] = durations.get(self.redis_state, 0.0) + time.time() - self.redis_state_since
+            return {
+                "state": self.redis_state,
+                "since": self.redis_state_since,
+                "transition_count": self.redis_transition_count,
+                "transitions": list(self.redis_transitions),
+                "time_in_state": {state: round(seconds, 3) for state, seconds in durations.items()},
+                "pending_invalidations": len(self._pending_invalidations)
+            }
+    
+    def _tenant_stats(self, tenant: str) -> Dict[str, int]:
+        stats = self.tenant_stats.get(tenant)
+        if stats is None:
+            stats = self.tenant_stats.setdefault(tenant, {"hit_count": 0, "miss_count": 0, "bytes_written": 0})
+        return stats
+    
+    def record_stat(self, name: str, amount: int = 1, endpoint_class: Optional[str] = None) -> None:
+        """在锁内累加一项统计计数
+        
+        Args:
+            name: 计数属性名，如 hit_count、refresh_count
+            amount: 增量
+            endpoint_class: 接口类型，提供时同时计入该类型的统计（仅限 ENDPOINT_STAT_FIELDS）
+        """
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+            fields = [f"total:{name}"]
+            if endpoint_class is not None and name in ENDPOINT_STAT_FIELDS:
+                stats = self.endpoint_stats.get(endpoint_class)
+                if stats is None:
+                    stats = self.endpoint_stats[endpoint_class] = dict.fromkeys(ENDPOINT_STAT_FIELDS, 0)
+                stats[name] += amount
+                fields.append(f"{endpoint_class}:{name}")
+            if self.stats_aggregate:
+                for field in fields:
+                    self._pending_stats[field] = self._pending_stats.get(field, 0) + amount
+    
+    def record_lookup(self, hit: bool, tenant: Optional[str] = None, endpoint: Optional[str] = None, key: Optional[str] = None) -> None:
+        """记录一次缓存查询结果，提供租户标识、API端点时同时计入该租户、该接口类型的统计，提供缓存键时命中计入该键的热度"""
+        endpoint_class = get_endpoint_class(endpoint) if endpoint else None
+        self.record_stat("hit_count" if hit else "miss_count", endpoint_class=endpoint_class)
+        if tenant is not None:
+            with self._stats_lock:
+                self._tenant_stats(tenant)["hit_count" if hit else "miss_count"] += 1
+        if hit and key is not None and self.hot_keys_limit > 0:
+            self._record_key_hit(key)
+    
+    def _record_key_hit(self, key: str) -> None:
+        """累计缓存键的命中次数，启用汇总时同时记录待上报的增量"""
+        with self._stats_lock:
+            if key not in self.key_hits and len(self.key_hits) >= self.hot_keys_limit:
+                kept = heapq.nlargest(self.hot_keys_limit // 2, self.key_hits.items(), key=lambda item: item[1])
+                self.key_hits = dict(kept)
+            self.key_hits[key] = self.key_hits.get(key, 0) + 1
+            if self.stats_aggregate:
+                field = HOT_KEY_FIELD_PREFIX + key
+                self._pending_stats[field] = self._pending_stats.get(field, 0) + 1
+    
+    def record_write(self, tenant: Optional[str], size: int) -> None:
+        """记录租户写入缓存的字节数"""
+        if tenant is not None:
+            with self._stats_lock:
+                self._tenant_stats(tenant)["bytes_written"] += size
+    
+    def _take_pending_stats(self) -> Dict[str, int]:
+        """取出尚未上报的统计增量"""
+        with self._stats_lock:
+            pending, self._pending_stats = self._pending_stats, {}
+        return pending
+    
+    def _restore_pending_stats(self, pending: Dict[str, int]) -> None:
+        """上报失败时把增量放回，下次一并上报"""
+        with self._stats_lock:
+            for field, amount in pending.items():
+                self._pending_stats[field] = self._pending_stats.get(field, 0) + amount
+    
+    def _pipe_pending_stats(self, pipe: Any, pending: Dict[str, int]) -> None:
+        """把统计增量加入管道：计数累加到 STATS_KEY 哈希，键的命中次数累加到 HOT_KEYS_KEY 有序集合"""
+        hot_keys = False
+        for field, amount in pending.items():
+            if field.startswith(HOT_KEY_FIELD_PREFIX):
+                pipe.zincrby(HOT_KEYS_KEY, amount, field[len(HOT_KEY_FIELD_PREFIX):])
+                hot_keys = True
+            else:
+                pipe.hincrby(STATS_KEY, field, amount)
+        if hot_keys:
+            # 只保留命中最多的键，避免有序集合无限增长
+            pipe.zremrangebyrank(HOT_KEYS_KEY, 0, -self.hot_keys_limit - 1)
+        pipe.hset(STATS_WORKERS_KEY, self.instance_id, time.time())
+    
+    def flush_stats(self) -> None:
+        """把本进程累计的统计增量累加到Redis，并登记本worker的上报时间"""
+        if not (self.stats_aggregate and self.redis_client):
+            return
+        pending = self._take_pending_stats()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._pipe_pending_stats(pipe, pending)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"❌ 上报缓存统计失败: {e}")
+            self._record_redis_failure(e)
+            self._restore_pending_stats(pending)
+    
+    def _build_aggregated_stats(self, counters: Dict[Any, Any], workers: Dict[Any, Any]) -> Dict[str, Any]:
+        """根据Redis哈希的内容计算各worker的汇总统计
+        
+        Args:
+            counters: STATS_KEY 哈希，<接口类型或total>:<计数名> -> 累计值
+            workers: STATS_WORKERS_KEY 哈希，worker标识 -> 最近一次上报时间
+        """
+        result: Dict[str, Any] = {"endpoints": {}}
+        for field, value in counters.items():
+            field = field.decode("utf-8") if isinstance(field, bytes) else field
+            scope, _, name = field.partition(":")
+            stats = result if scope == "total" else result["endpoints"].setdefault(scope, dict.fromkeys(ENDPOINT_STAT_FIELDS, 0))
+            stats[name] = int(value)
+        for stats in [result, *result["endpoints"].values()]:
+            total = stats.get("hit_count", 0) + stats.get("miss_count", 0)
+            stats["total_count"] = total
+            stats["hit_rate"] = round(stats.get("hit_count", 0) / total * 100, 2) if total > 0 else 0
+        result["workers"] = len(workers) - len(self._stale_workers(workers))
+        return result
+    
+    def _stale_workers(self, workers: Dict[Any, Any]) -> List[Any]:
+        """超过3个上报间隔未上报的worker视为已退出，返回其在 STATS_WORKERS_KEY 哈希中的字段"""
+        active_since = time.time() - self.stats_flush_interval * 3
+        return [worker for worker, value in workers.items() if float(value) < active_since]
+    
+    def get_aggregated_stats(self) -> Optional[Dict[str, Any]]:
+        """获取各worker汇总后的统计，未启用汇总或Redis不可用时返回None"""
+        if not (self.stats_aggregate and self.redis_client):
+            return None
+        self.flush_stats()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(STATS_KEY)
+            pipe.hgetall(STATS_WORKERS_KEY)
+            counters, workers = pipe.execute()
+            # 删除已退出worker的上报时间，避免哈希随worker重启无限增长
+            stale = self._stale_workers(workers)
+            if stale:
+                self.redis_client.hdel(STATS_WORKERS_KEY, *stale)
+        except Exception as e:
+            logger.warning(f"❌ 获取汇总统计失败: {e}")
+            self._record_redis_failure(e)
+            return None
+        return self._build_aggregated_stats(counters, workers)
+    
+    def get_endpoint_stats(self, categories: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Dict[str, Any]]:
+        """按接口类型统计本进程的命中、未命中次数与命中率
+        
+        Args:
+            categories: 本地缓存按接口类型的字节统计（见 MemoryCache.get_stats 的 categories），
+                提供时合并当前、峰值与被淘汰的字节数
+        """
+        with self._stats_lock:
+            result = {endpoint_class: dict(stats) for endpoint_class, stats in self.endpoint_stats.items()}
+        for endpoint_class in categories or {}:
+            result.setdefault(endpoint_class, dict.fromkeys(ENDPOINT_STAT_FIELDS, 0))
+        for endpoint_class, stats in result.items():
+            total = stats["hit_count"] + stats["miss_count"]
+            stats["total_count"] = total
+            stats["hit_rate"] = round(stats["hit_count"] / total * 100, 2) if total > 0 else 0
+            if categories is not None:
+                usage = categories.get(endpoint_class) or {}
+                for name in ("bytes", "peak_bytes", "evicted_bytes"):
+                    stats[name] = usage.get(name, 0)
+        return result
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            缓存值，如果不存在则返回None
+        """
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+    
+    def get_entry(self, key: str, tenant: Optional[str] = None, record: bool = True, endpoint: Optional[str] = None) -> Optional[CacheEntry]:
+        """获取缓存条目及其元数据
+        
+        Args:
+            key: 缓存键
+            tenant: 发起查询的租户标识，用于按租户统计命中率
+            record: 是否计入命中率统计，辅助查询（如否定缓存）不计入
+            endpoint: 对应的API端点，用于按接口类型统计命中率
+            
+        Returns:
+            缓存条目，如果不存在则返回None
+        """
+        value, from_l1 = None, False
+        try:
+            if self.redis_client:
+                # 优先读取L1
+                value = self._get_l1(key)
+                from_l1 = value is not None
+                if value is None:
+                    # 使用Redis缓存
+                    data = self.redis_client.get(key)
+                    if data:
+                        value = self.compressor.decode(data)
+                        self._set_l1(key, value, None, tenant, endpoint)
+            else:
+                # 使用内存缓存
+                value = self.memory_cache.get(key)
+            value = self._load_bodies({key: value}).get(key)
+        except Exception as e:
+            logger.error(f"获取缓存失败: {e}")
+            self._record_redis_failure(e)
+            value, from_l1 = None, False
+        return self._to_entry(key, value, from_l1 and value is not None, tenant, record, endpoint)
+    
+    def _to_entry(self, key: str, value: Any, from_l1: bool, tenant: Optional[str], record: bool, endpoint: Optional[str] = None) -> Optional[CacheEntry]:
+        """将读取到的缓存值还原为条目，并计入统计"""
+        endpoint_class = get_endpoint_class(endpoint) if endpoint else None
+        if record:
+            self.record_lookup(value is not None, tenant, endpoint, key)
+            if from_l1:
+                self.record_stat("l1_hit_count", endpoint_class=endpoint_class)
+        if value is None:
+            return None
+        entry = CacheEntry.from_raw(value)
+        if entry.is_stale:
+            self.record_stat("stale_hit_count", endpoint_class=endpoint_class)
+        if entry.negative is not None:
+            self.record_stat("negative_hit_count", endpoint_class=endpoint_class)
+        return entry
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expire: Optional[int] = 3600,
+        tags: Iterable[str] = (),
+        soft_expire: Optional[int] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        endpoint: Optional[str] = None
+    ) -> None:
+        """设置缓存值
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+            expire: 过期时间（秒），默认3600秒，到期后条目被删除，为None时永不过期（只会因容量被淘汰）
+            tags: 缓存标签，写操作可通过 invalidate_tags 按标签失效
+            soft_expire: 软过期时间（秒），到期后仍返回旧值并后台刷新
+            meta: 条目元数据，见 CacheEntry
+            tenant: 写入者的租户标识，用于按租户统计内存并限制份额
+            endpoint: 对应的API端点，用于按接口类型统计本地缓存占用的字节数
+        """
+        try:
+            if self.redis_client:
+                # 使用Redis缓存，键与标签登记在同一次往返中完成
+                pipe = self.redis_client.pipeline(transaction=False)
+                extend = self._pipe_set(pipe, key, value, expire, tags, soft_expire, meta, tenant)
+                pipe.execute()
+                self._extend_bodies(extend)
+                self._publish_invalidation("key", key)
+            else:
+                # 使用内存缓存
+                category = get_endpoint_class(endpoint) if endpoint else None
+                value, meta, bodies = self._split_bodies(value, meta)
+                body_ttl = self._get_body_ttl(expire)
+                for digest, body in bodies.items():
+                    # 正文由多个条目共享，只延长不缩短过期时间；正文字节计入写入者的份额
+                    remaining = self.memory_cache.ttl(get_body_key(digest))
+                    if remaining is None or 0 <= remaining < body_ttl:
+                        self.memory_cache.set(get_body_key(digest), body, expire=body_ttl, owner=tenant, category=category)
+                value = _build_entry(value, soft_expire, meta).to_raw()
+                self.memory_cache.set(key, value, expire=expire, tags=tags, owner=tenant, category=category)
+        except Exception as e:
+            logger.error(f"设置缓存失败: {e}")
+            self._record_redis_failure(e)
+    
+    def get_many(
+        self,
+        keys: Iterable[str],
+        tenant: Optional[str] = None,
+        record: bool = True,
+        endpoints: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Optional[CacheEntry]]:
+        """批量获取缓存条目，Redis后端先读取L1，其余的键通过一次 MGET 读取
+        
+        Args:
+            keys: 缓存键
+            tenant: 发起查询的租户标识，用于按租户统计命中率
+            record: 是否计入命中率统计
+            endpoints: 缓存键 -> 对应的API端点，用于按接口类型统计命中率
+        
+        Returns:
+            缓存键 -> 缓存条目，不存在的键对应None
+        """
+        keys = list(dict.fromkeys(keys))
+        endpoints = endpoints or {}
+        values: Dict[str, Any] = {}
+        from_l1: set = set()
+        try:
+            if self.redis_client:
+                missing = []
+                for key in keys:
+                    value = self._get_l1(key)
+                    if value is None:
+                        missing.append(key)
+                    else:
+                        values[key] = value
+                        from_l1.add(key)
+                if missing:
+                    for key, data in zip(missing, self.redis_client.mget(missing)):
+                        if data:
+                            values[key] = self.compressor.decode(data)
+                            self._set_l1(key, values[key], None, tenant, endpoints.get(key))
+            else:
+                for key in keys:
+                    value = self.memory_cache.get(key)
+                    if value is not None:
+                        values[key] = value
+            values = self._load_bodies(values)
+        except Exception as e:
+            logger.error(f"批量获取缓存失败: {e}")
+            self._record_redis_failure(e)
+            values, from_l1 = {}, set()
+        return {key: self._to_entry(key, values.get(key), key in from_l1, tenant, record, endpoints.get(key)) for key in keys}
+    
+    def set_many(self, items: Iterable[Dict[str, Any]]) -> None:
+        """批量设置缓存值，Redis后端的全部写入（SET EX）与标签登记在一次管道往返中完成
+        
+        Args:
+            items: 每一项为 set 的参数字典，必须包含 key 和 value，
+                可选 expire、tags、soft_expire、meta、tenant、endpoint，含义与 set 相同
+        """
+        items = list(items)
+        if not items:
+            return
+        if not self.redis_client:
+            for item in items:
+                self.set(**item)
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            extend: Dict[str, int] = {}
+            for item in items:
+                extend.update(self._pipe_set(pipe, **item))
+            pipe.execute()
+            self._extend_bodies(extend)
+            self._publish_invalidation("keys", [item["key"] for item in items])
+        except Exception as e:
+            logger.error(f"批量设置缓存失败: {e}")
+            self._record_redis_failure(e)
+    
+    def _pipe_set(
+        self,
+        pipe: Any,
+        key: str,
+        value: Any,
+        expire: Optional[int] = 3600,
+        tags: Iterable[str] = (),
+        soft_expire: Optional[int] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        endpoint: Optional[str] = None
+    ) -> Dict[str, int]:
+        """在Redis管道中登记一次写入：缓存值与其标签；endpoint 只用于本地缓存的分类统计，这里不使用
+        
+        Returns:
+            需要在管道执行后延长过期时间的正文键 -> 过期时间（秒），见 _extend_bodies；支持 EXPIRE GT 时为空
+        """
+        value, meta, bodies = self._split_bodies(value, meta)
+        data = self.compressor.encode(_build_entry(value, soft_expire, meta).to_raw())
+        written = len(data)
+        pipe.set(key, data, ex=expire)
+        body_ttl = self._get_body_ttl(expire)
+        extend: Dict[str, int] = {}
+        for digest, body in bodies.items():
+            # 正文由多个条目共享：不存在时写入，已存在时只延长过期时间（EXPIRE GT，需要 Redis 7.0+），
+            # 不会因为较短的条目而缩短；正文先于引用它的条目过期时，条目按未命中处理
+            body_data = self.compressor.encode(body)
+            written += len(body_data)
+            pipe.set(get_body_key(digest), body_data, ex=body_ttl, nx=True)
+            if self.expire_gt:
+                pipe.expire(get_body_key(digest), body_ttl, gt=True)
+            else:
+                extend[get_body_key(digest)] = body_ttl
+        self.record_write(tenant, written)
+        for tag in tags:
+            _pipe_tag(pipe, tag, key, expire, self.tag_ttl)
+        return extend
+    
+    def _extend_bodies(self, body_ttls: Dict[str, int]) -> None:
+        """Redis 7.0 以下不支持 EXPIRE GT：读取正文剩余的过期时间，只延长比新过期时间短的正文
+        
+        读取与延长不是原子操作，并发写入同一正文时过期时间可能被较短的一方覆盖，引用它的条目届时按未命中处理。
+        """
+        if not body_ttls:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for body_key in body_ttls:
+            pipe.ttl(body_key)
+        extend = _short_bodies(body_ttls, pipe.execute())
+        if extend:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for body_key, ttl in extend:
+                pipe.expire(body_key, ttl)
+            pipe.execute()
+    
+    def _split_bodies(self, value: Any, meta: Optional[Dict[str, Any]]) -> tuple:
+        """启用正文去重时拆出较大的正文，见 split_bodies
+        
+        Returns:
+            (缓存值, 元数据, 内容哈希 -> 正文)，元数据的 bodies 记录字段名 -> 内容哈希
+        """
+        meta = {name: item for name, item in (meta or {}).items() if name != "bodies"}
+        if not self.body_dedup:
+            return value, meta, {}
+        value, refs, bodies = split_bodies(value, self.body_min_size)
+        if refs:
+            meta["bodies"] = refs
+        return value, meta, bodies
+    
+    def _get_body_ttl(self, expire: Optional[int]) -> int:
+        """正文的过期时间：与条目相同，不超过 body_max_ttl，条目永不过期时使用 body_max_ttl"""
+        return min(expire, self.body_max_ttl) if expire and expire > 0 else self.body_max_ttl
+    
+    def _load_bodies(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """还原条目引用的正文，引用的正文先读取L1，其余通过一次 MGET 读取
+        
+        Args:
+            values: 缓存键 -> 读取到的缓存值
+        
+        Returns:
+            缓存键 -> 还原后的缓存值，引用的正文已被淘汰的条目不返回
+        """
+        digests = {digest for raw in values.values() for digest in _body_refs(raw).values()}
+        if not digests:
+            return values
+        bodies: Dict[str, str] = {}
+        if self.redis_client:
+            missing = []
+            for digest in digests:
+                body = self._get_l1(get_body_key(digest))
+                if body is None:
+                    missing.append(digest)
+                else:
+                    bodies[digest] = body
+            if missing:
+                for digest, data in zip(missing, self.redis_client.mget([get_body_key(digest) for digest in missing])):
+                    if data:
+                        bodies[digest] = self._decode_body(digest, data)
+        else:
+            for digest in digests:
+                body = self.memory_cache.get(get_body_key(digest))
+                if body is not None:
+                    bodies[digest] = body
+        return _attach_all_bodies(values, bodies)
+    
+    def _decode_body(self, digest: str, data: bytes) -> str:
+        """解码从Redis读取的正文，并放入L1：正文内容不会变化，热点正文由各worker就近读取"""
+        body = self.compressor.decode(data)
+        self._set_l1(get_body_key(digest), body, None)
+        return body
+    
+    def delete(self, key: str) -> None:
+        """删除缓存值
+        
+        Args:
+            key: 缓存键
+        """
+        try:
+            if self.redis_client:
+                # 使用Redis缓存
+                self.redis_client.delete(key)
+                self._publish_invalidation("key", key)
+            else:
+                # 使用内存缓存
+                self.memory_cache.delete(key)
+                self._defer_invalidation("key", key)
+        except Exception as e:
+            logger.error(f"删除缓存失败: {e}")
+            self._record_redis_failure(e)
+    
+    def delete_pattern(self, pattern: str) -> None:
+        """删除匹配模式的缓存值
+        
+        优先使用 invalidate_tags；此方法在Redis上使用增量SCAN和批量UNLINK，不会长时间阻塞Redis。
+        
+        Args:
+            pattern: 匹配模式，如 "yuque:repo:*"
+        """
+        try:
+            if self.redis_client:
+                # 使用Redis缓存
+                self._unlink_pattern(pattern)
+            else:
+                # 使用内存缓存
+                self.memory_cache.delete_pattern(pattern)
+                self._defer_invalidation("pattern", pattern)
+        except Exception as e:
+            logger.error(f"删除匹配缓存失败: {e}")
+            self._record_redis_failure(e)
+    
+    def _unlink_pattern(self, pattern: str) -> None:
+        """在Redis上增量SCAN并批量UNLINK匹配的键"""
+        batch: List[Any] = []
+        for key in self._redis.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                self._redis.unlink(*batch)
+                batch = []
+        if batch:
+            self._redis.unlink(*batch)
+        self._publish_invalidation("pattern", pattern)
+    
+    def set_negative(self, key: str, status: int, body: str, tags: Iterable[str] = (), tenant: Optional[str] = None) -> None:
+        """缓存上游的 404/403 结果，过期时间为 CACHE_NEGATIVE_TTL
+        
+        Args:
+            key: 缓存键，见 get_negative_cache_key
+            status: 上游状态码
+            body: 上游响应内容，命中时用于还原错误
+            tags: 缓存标签，与正常条目相同，写操作按标签失效
+            tenant: 写入者的租户标识
+        """
+        if self.negative_ttl <= 0:
+            return
+        self.record_stat("negative_store_count")
+        self.set(key, None, expire=self.negative_ttl, tags=tags, meta={"negative": {"status": status, "body": body}}, tenant=tenant)
+    
+    def get_rendered(self, key: Optional[str], tenant: Optional[str] = None) -> Optional[str]:
+        """读取工具的渲染结果
+        
+        Args:
+            key: 缓存键，见 get_render_cache_key，为None时视为不可缓存
+            tenant: 发起查询的租户标识
+        """
+        if key is None or self.render_ttl <= 0:
+            return None
+        entry = self.get_entry(key, tenant, record=False)
+        text = entry.value if entry is not None and isinstance(entry.value, str) else None
+        self.record_stat("render_hit_count" if text is not None else "render_miss_count")
+        return text
+    
+    def set_rendered(self, key: Optional[str], text: str, tenant: Optional[str] = None) -> None:
+        """缓存工具的渲染结果，过期时间为 CACHE_RENDER_TTL；缓存键包含源条目的版本，源条目变化后旧结果不再被读取"""
+        if key is None or self.render_ttl <= 0:
+            return
+        self.set(key, text, expire=self.render_ttl, tenant=tenant)
+    
+    def record_revalidation(self, entry: CacheEntry, not_modified: bool) -> None:
+        """记录一次条件重验证结果，未修改时累计节省的响应字节数
+        
+        Args:
+            entry: 被重验证的旧条目
+            not_modified: 上游确认内容未变化（304 或 updated_at 未变）
+        """
+        self.record_stat("revalidation_count")
+        if not_modified:
+            self.record_stat("not_modified_count")
+            self.record_stat("revalidation_bytes_saved", int(entry.meta.get("size") or _estimate_size(entry.value)))
+    
+    def schedule_refresh(self, key: str, fetch: Callable[[], Any]) -> None:
+        """在后台线程池中刷新软过期的条目，同一缓存键同时只刷新一次
+        
+        Args:
+            key: 缓存键
+            fetch: 请求上游并写入缓存的函数
+        """
+        with self._refresh_lock:
+            if key in self._refreshing or len(self._refreshing) >= self.refresh_max_pending:
+                return
+            self._refreshing.add(key)
+        
+        def run():
+            try:
+                fetch()
+            except Exception as e:
+                logger.warning(f"❌ 后台刷新缓存失败: {key}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+        
+        try:
+            self._refresh_executor.submit(run)
+        except RuntimeError:
+            # 已调用 close，线程池不再接受任务
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            return
+        self.record_stat("refresh_count")
+    
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        """删除标签下的全部缓存值，只访问标签成员，不扫描键空间
+        
+        Args:
+            tags: 缓存标签，通常由 get_dependent_tags 生成
+        """
+        tags = list(tags)
+        if not tags:
+            return
+        try:
+            if self.redis_client:
+                self._unlink_tags(tags)
+            else:
+                # 使用内存缓存
+                for tag in tags:
+                    self.memory_cache.delete_tag(tag)
+                self._defer_invalidation("tags", tags)
+        except Exception as e:
+            logger.error(f"按标签删除缓存失败: {e}")
+            self._record_redis_failure(e)
+    
+    def _unlink_tags(self, tags: List[str]) -> None:
+        """在Redis上删除标签下的全部键及标签集合"""
+        # 在事务中读取并删除标签集合，避免并发登记的成员丢失
+        pipe = self._redis.pipeline(transaction=True)
+        _pipe_pop_tags(pipe, tags)
+        keys = _popped_tag_keys(pipe.execute())
+        for start in range(0, len(keys), SCAN_BATCH_SIZE):
+            self._redis.unlink(*keys[start:start + SCAN_BATCH_SIZE])
+        self._publish_invalidation("keys", [key.decode("utf-8") for key in keys])
+    
+    def inspect(self, key: str) -> Optional[Dict[str, Any]]:
+        """查看缓存条目的过期时间与元数据，不计入命中率统计
+        
+        Returns:
+            包含写入时的过期时间（ttl）、剩余时间（remaining）、软过期时间戳与校验信息的字典，不存在返回None
+        """
+        entry = self.get_entry(key, record=False)
+        if entry is None:
+            return None
+        try:
+            remaining = self.redis_client.ttl(key) if self.redis_client else self.memory_cache.ttl(key)
+        except Exception as e:
+            logger.error(f"获取缓存过期时间失败: {e}")
+            self._record_redis_failure(e)
+            remaining = None
+        return _describe_entry(key, entry, remaining)
+    
+    def get_hot_keys(self, limit: int = 20, sort: str = "hits") -> List[Dict[str, Any]]:
+        """列出最热的缓存键及其大小与剩余过期时间，不计入命中率统计
+        
+        命中次数来自各worker的汇总（启用 CACHE_STATS_AGGREGATE 时）或本进程的计数，
+        只查询被跟踪的键（见 CACHE_HOT_KEYS_TRACKED），不扫描键空间。
+        
+        Args:
+            limit: 返回的键数量
+            sort: 排序方式，hits 按命中次数，size 按占用的字节数
+        
+        Returns:
+            列表，每项包含 key、hits、size（字节）和 remaining（剩余秒数，永不过期为-1）；已不存在的键不列出
+        """
+        with self._stats_lock:
+            hits = dict(self.key_hits)
+        client = self.redis_client
+        try:
+            if client and self.stats_aggregate:
+                self.flush_stats()
+                hits = {
+                    key.decode("utf-8") if isinstance(key, bytes) else key: int(score)
+                    for key, score in client.zrevrange(HOT_KEYS_KEY, 0, -1, withscores=True)
+                }
+            keys = list(hits)
+            if client:
+                pipe = client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.ttl(key)
+                    pipe.strlen(key)
+                results = pipe.execute()
+                # Redis对不存在的键返回-2
+                details = [(remaining, size) if remaining != -2 else None for remaining, size in zip(results[::2], results[1::2])]
+            else:
+                details = []
+                for key in keys:
+                    remaining = self.memory_cache.ttl(key)
+                    details.append((remaining, self.memory_cache.size(key)) if remaining is not None else None)
+        except Exception as e:
+            logger.error(f"获取热点缓存键失败: {e}")
+            self._record_redis_failure(e)
+            return []
+        
+        rows, missing = [], []
+        for key, detail in zip(keys, details):
+            if detail is None:
+                missing.append(key)
+            else:
+                rows.append({"key": key, "hits": hits[key], "size": detail[1], "remaining": detail[0]})
+        self._forget_hot_keys(missing)
+        rows.sort(key=lambda row: row["size" if sort == "size" else "hits"] or 0, reverse=True)
+        return rows[:max(0, limit)]
+    
+    def _forget_hot_keys(self, keys: List[str]) -> None:
+        """不再跟踪已过期或被删除的键，让其他键进入热点列表"""
+        if not keys:
+            return
+        with self._stats_lock:
+            for key in keys:
+                self.key_hits.pop(key, None)
+        if self.redis_client and self.stats_aggregate:
+            try:
+                self.redis_client.zrem(HOT_KEYS_KEY, *keys)
+            except Exception as e:
+                logger.warning(f"❌ 移除热点缓存键失败: {e}")
+                self._record_redis_failure(e)
+    
+    def purge(self, **scope: Optional[str]) -> List[str]:
+        """按知识库、文档、团队或Token清除缓存，只删除对应标签下的条目，不扫描键空间
+        
+        Args:
+            **scope: 清除范围，见 get_purge_tags
+        
+        Returns:
+            被清除的缓存标签
+        
+        Raises:
+            ValueError: 未指定清除范围
+        """
+        if scope.get("namespace") and not scope.get("repo_id"):
+            # 知识库的条目可能以命名空间或ID缓存，未提供 repo_id 时从缓存的知识库信息中补全另一个标识
+            entry = self.get_entry(get_request_cache_key("GET", f"/repos/{scope['namespace']}", None), record=False)
+            scope["repo_id"] = get_repo_alias(scope["namespace"], entry.value if entry is not None else None)
+        tags = get_purge_tags(**scope)
+        self.invalidate_tags(tags)
+        logger.info(f"✅ 已按标签清除缓存: {', '.join(tags)}")
+        return tags
+    
+    def grant_access(self, repo: str, tenant: str) -> None:
+        """记录租户已通过上游请求证明可以访问知识库，之后可直接读取该知识库的共享缓存
+        
+        Args:
+            repo: 知识库标识（ID或命名空间）
+            tenant: 租户标识，PUBLIC_TENANT 表示公开知识库，所有租户均可读取
+        """
+        key = get_access_key(repo, tenant)
+        tag = f"repo:{repo}"
+        try:
+            if self.redis_client:
+                # 随知识库标签一起失效，知识库可见性变化后需要重新证明
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.set(key, 1, ex=self.access_ttl)
+                _pipe_tag(pipe, tag, key, self.access_ttl, self.tag_ttl)
+                pipe.execute()
+            else:
+                self.memory_cache.set(key, 1, expire=self.access_ttl, tags=(tag,))
+        except Exception as e:
+            logger.error(f"记录访问权限失败: {e}")
+            self._record_redis_failure(e)
+    
+    def has_access(self, repo: str, tenant: str) -> bool:
+        """租户是否已证明可以访问知识库，公开知识库对所有租户返回True"""
+        keys = [get_access_key(repo, tenant), get_access_key(repo, PUBLIC_TENANT)]
+        try:
+            if self.redis_client:
+                return bool(self.redis_client.exists(*keys))
+            return any(self.memory_cache.get(key) is not None for key in keys)
+        except Exception as e:
+            logger.error(f"检查访问权限失败: {e}")
+            self._record_redis_failure(e)
+            return False
+    
+    def get_tenant_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按租户统计命中、未命中次数、写入字节数，以及在进程内缓存中占用的字节数"""
+        memory_bytes = dict(self.memory_cache.owner_bytes)
+        if self.l1_cache is not None:
+            for tenant, size in self.l1_cache.owner_bytes.items():
+                memory_bytes[tenant] = memory_bytes.get(tenant, 0) + size
+        result: Dict[str, Dict[str, Any]] = {}
+        for tenant in set(self.tenant_stats) | set(memory_bytes):
+            stats = dict(self.tenant_stats.get(tenant) or {"hit_count": 0, "miss_count": 0, "bytes_written": 0})
+            total = stats["hit_count"] + stats["miss_count"]
+            stats["hit_rate"] = round(stats["hit_count"] / total * 100, 2) if total > 0 else 0
+            stats["memory_bytes"] = memory_bytes.get(tenant, 0)
+            result[tenant] = stats
+        return result
+    
+    def get_stats(self, aggregate: bool = True) -> Dict[str, Any]:
+        """获取缓存统计信息
+        
+        Args:
+            aggregate: 是否读取各worker的汇总统计（需要 CACHE_STATS_AGGREGATE=true）
+        
+        Returns:
+            缓存统计字典，包含命中次数、未命中次数、命中率，以及内存缓存的淘汰和过期次数；
+            endpoints 为本进程按接口类型的统计，aggregate 为各worker的汇总（未启用时为None）
+        """
+        total = self.hit_count + self.miss_count
+        hit_rate = round(self.hit_count / total * 100, 2) if total > 0 else 0
+        memory_stats = self.memory_cache.get_stats()
+        l1_stats = self.l1_cache.get_stats() if self.l1_cache is not None else None
+        # Redis的内存由Redis自身管理，按接口类型的字节统计来自本地缓存：内存/磁盘后端，或Redis可用时的L1
+        local_stats = memory_stats if not self.redis_client else l1_stats
+        return {
+            "hit_count": self.hit_count,
+            "miss_count": self.miss_count,
+            "total_count": total,
+            "hit_rate": hit_rate,
+            "backend": "redis" if self.redis_client else ("sqlite" if isinstance(self.memory_cache, SqliteCache) else "memory"),
+            "eviction_count": memory_stats["eviction_count"],
+            "expiration_count": memory_stats["expiration_count"],
+            "memory": memory_stats,
+            "stale_hit_count": self.stale_hit_count,
+            "refresh_count": self.refresh_count,
+            "revalidation_count": self.revalidation_count,
+            "not_modified_count": self.not_modified_count,
+            "revalidation_bytes_saved": self.revalidation_bytes_saved,
+            "negative_hit_count": self.negative_hit_count,
+            "negative_store_count": self.negative_store_count,
+            "render_hit_count": self.render_hit_count,
+            "render_miss_count": self.render_miss_count,
+            "l1_enabled": self.l1_cache is not None,
+            "l1_hit_count": self.l1_hit_count,
+            "l1": l1_stats,
+            "compression": self.compressor.get_stats(),
+            "adaptive_ttl": adaptive_ttl.get_stats(),
+            "tenant_max_bytes": self.tenant_max_bytes,
+            "tenants": self.get_tenant_stats(),
+            "endpoints": self.get_endpoint_stats(local_stats["categories"] if local_stats else None),
+            "aggregate": self.get_aggregated_stats() if aggregate else None,
+            "redis": self.get_redis_status()
+        }
+    
+    def clear(self) -> None:
+        """清空所有缓存"""
+        try:
+            if self.redis_client:
+                # 使用Redis缓存
+                self.redis_client.flushdb()
+                self._publish_invalidation("clear")
+            else:
+                # 使用内存缓存
+                self.memory_cache.clear()
+                self._defer_invalidation("clear")
+            logger.info("✅ 缓存已清空")
+        except Exception as e:
+            logger.error(f"清空缓存失败: {e}")
+            self._record_redis_failure(e)
+
+
+class AsyncCacheManager:
+    """异步缓存管理器，基于redis.asyncio，不阻塞事件循环
+    
+    使用独立的连接池访问Redis；Redis不可用时退回到同步管理器的内存缓存，
+    命中统计与同步管理器共享。
+    """
+    
+    def __init__(self, sync_manager: CacheManager):
+        """初始化异步缓存管理器
+        
+        Args:
+            sync_manager: 同步缓存管理器，提供内存缓存和统计信息
+        """
+        self.sync_manager = sync_manager
+        # 配置的异步Redis连接，是否使用由同步管理器的熔断状态决定，见 redis_client
+        self._redis = None
+        self.pool = None
+        
+        # 请求合并：同一进程内共享进行中的请求；可选使用Redis锁跨worker合并
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesce_lock_enabled = CONFIG.get("CACHE_COALESCE_REDIS_LOCK", "false").lower() == "true"
+        self.coalesce_lock_timeout = float(CONFIG.get("CACHE_COALESCE_LOCK_TIMEOUT", "10"))
+        self.coalesced_count = 0
+        self.lock_wait_count = 0
+        
+        # 正在后台刷新的缓存键及其任务
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        
+        # 连接池按需建立连接，启动时Redis不可用也先创建，恢复后由熔断状态切回
+        if aioredis and sync_manager._redis:
+            try:
+                self.pool = aioredis.ConnectionPool.from_url(
+                    sync_manager.redis_url,
+                    max_connections=int(CONFIG.get("REDIS_MAX_CONNECTIONS", "50")),
+                    socket_timeout=sync_manager.redis_timeout,
+                    socket_connect_timeout=sync_manager.redis_timeout
+                )
+                self._redis = aioredis.Redis(connection_pool=self.pool)
+            except Exception as e:
+                logger.warning(f"❌ 异步Redis初始化失败: {e}")
+                self.pool = None
+                self._redis = None
+    
+    @property
+    def redis_client(self) -> Any:
+        """当前使用的异步Redis连接，同步管理器熔断期间为None，读写退回本地缓存"""
+        return self._redis if self.sync_manager.redis_client is not None else None
+    
+    @property
+    def memory_cache(self) -> MemoryCache:
+        return self.sync_manager.memory_cache
+    
+    def connect(self) -> None:
+        """在后台建立Redis连接，不阻塞事件循环，见 CacheManager.connect"""
+        self.sync_manager.connect()
+    
+    async def _run_local(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """调用本地后端；磁盘缓存在线程池中执行，避免阻塞事件循环"""
+        if isinstance(self.sync_manager.memory_cache, SqliteCache):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+        return func(*args, **kwargs)
+    
+    async def _publish_invalidation(self, kind: str, value: Any = "") -> None:
+        """在本地L1执行失效并广播给其他worker"""
+        if self.sync_manager.l1_cache is None:
+            return
+        self.sync_manager._invalidate_l1(kind, value)
+        await self.redis_client.publish(
+            self.sync_manager.invalidation_channel,
+            self.sync_manager._build_invalidation(kind, value)
+        )
     
-    def get(self, key: str) -> Optional[Any]:
+    async def get(self, key: str) -> Optional[Any]:
         """获取缓存值
         
         Args:
@@ -62,128 +2392,528 @@ class CacheManager:
         Returns:
             缓存值，如果不存在则返回None
         """
+        entry = await self.get_entry(key)
+        return entry.value if entry is not None else None
+    
+    async def get_entry(self, key: str, tenant: Optional[str] = None, record: bool = True, endpoint: Optional[str] = None) -> Optional[CacheEntry]:
+        """获取缓存条目及其元数据
+        
+        Args:
+            key: 缓存键
+            tenant: 发起查询的租户标识，用于按租户统计命中率
+            record: 是否计入命中率统计，辅助查询（如否定缓存）不计入
+            endpoint: 对应的API端点，用于按接口类型统计命中率
+            
+        Returns:
+            缓存条目，如果不存在则返回None
+        """
+        if not self.redis_client:
+            return await self._run_local(self.sync_manager.get_entry, key, tenant, record, endpoint)
+        value, from_l1 = None, False
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                value = self.redis_client.get(key)
-                if value:
-                    self.hit_count += 1
-                    return json.loads(value)
-                else:
-                    self.miss_count += 1
-                    return None
-            else:
-                # 使用内存缓存
-                if key in self.memory_cache:
-                    self.hit_count += 1
-                    return self.memory_cache[key]
-                else:
-                    self.miss_count += 1
-                    return None
+            value = self.sync_manager._get_l1(key)
+            from_l1 = value is not None
+            if value is None:
+                data = await self.redis_client.get(key)
+                if data:
+                    value = self.sync_manager.compressor.decode(data)
+                    self.sync_manager._set_l1(key, value, None, tenant, endpoint)
+            value = (await self._load_bodies({key: value})).get(key)
         except Exception as e:
             logger.error(f"获取缓存失败: {e}")
-            self.miss_count += 1
-            return None
+            self.sync_manager._record_redis_failure(e)
+            value, from_l1 = None, False
+        return self.sync_manager._to_entry(key, value, from_l1 and value is not None, tenant, record, endpoint)
+    
+    async def _load_bodies(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """还原条目引用的正文，见 CacheManager._load_bodies"""
+        manager = self.sync_manager
+        digests = {digest for raw in values.values() for digest in _body_refs(raw).values()}
+        if not digests:
+            return values
+        bodies: Dict[str, str] = {}
+        missing = []
+        for digest in digests:
+            body = manager._get_l1(get_body_key(digest))
+            if body is None:
+                missing.append(digest)
+            else:
+                bodies[digest] = body
+        if missing:
+            for digest, data in zip(missing, await self.redis_client.mget([get_body_key(digest) for digest in missing])):
+                if data:
+                    bodies[digest] = manager._decode_body(digest, data)
+        return _attach_all_bodies(values, bodies)
     
-    def set(self, key: str, value: Any, expire: int = 3600) -> None:
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        expire: Optional[int] = 3600,
+        tags: Iterable[str] = (),
+        soft_expire: Optional[int] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        endpoint: Optional[str] = None
+    ) -> None:
         """设置缓存值
         
         Args:
             key: 缓存键
             value: 缓存值
-            expire: 过期时间（秒），默认3600秒
+            expire: 过期时间（秒），默认3600秒，到期后条目被删除，为None时永不过期（只会因容量被淘汰）
+            tags: 缓存标签，写操作可通过 invalidate_tags 按标签失效
+            soft_expire: 软过期时间（秒），到期后仍返回旧值并后台刷新
+            meta: 条目元数据，见 CacheEntry
+            tenant: 写入者的租户标识，用于按租户统计内存并限制份额
+            endpoint: 对应的API端点，用于按接口类型统计本地缓存占用的字节数
         """
+        if not self.redis_client:
+            await self._run_local(
+                self.sync_manager.set, key, value,
+                expire=expire, tags=tags, soft_expire=soft_expire, meta=meta, tenant=tenant, endpoint=endpoint
+            )
+            return
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                self.redis_client.set(key, json.dumps(value), ex=expire)
-            else:
-                # 使用内存缓存
-                self.memory_cache[key] = value
+            pipe = self.redis_client.pipeline(transaction=False)
+            extend = self.sync_manager._pipe_set(pipe, key, value, expire, tags, soft_expire, meta, tenant)
+            await pipe.execute()
+            await self._extend_bodies(extend)
+            await self._publish_invalidation("key", key)
         except Exception as e:
             logger.error(f"设置缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
     
-    def delete(self, key: str) -> None:
+    async def get_many(
+        self,
+        keys: Iterable[str],
+        tenant: Optional[str] = None,
+        record: bool = True,
+        endpoints: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Optional[CacheEntry]]:
+        """批量获取缓存条目，见 CacheManager.get_many"""
+        if not self.redis_client:
+            return await self._run_local(self.sync_manager.get_many, keys, tenant, record, endpoints)
+        manager = self.sync_manager
+        keys = list(dict.fromkeys(keys))
+        endpoints = endpoints or {}
+        values: Dict[str, Any] = {}
+        from_l1: set = set()
+        try:
+            missing = []
+            for key in keys:
+                value = manager._get_l1(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    values[key] = value
+                    from_l1.add(key)
+            if missing:
+                for key, data in zip(missing, await self.redis_client.mget(missing)):
+                    if data:
+                        values[key] = manager.compressor.decode(data)
+                        manager._set_l1(key, values[key], None, tenant, endpoints.get(key))
+            values = await self._load_bodies(values)
+        except Exception as e:
+            logger.error(f"批量获取缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+            values, from_l1 = {}, set()
+        return {key: manager._to_entry(key, values.get(key), key in from_l1, tenant, record, endpoints.get(key)) for key in keys}
+    
+    async def set_many(self, items: Iterable[Dict[str, Any]]) -> None:
+        """批量设置缓存值，见 CacheManager.set_many"""
+        items = list(items)
+        if not items:
+            return
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.set_many, items)
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            extend: Dict[str, int] = {}
+            for item in items:
+                extend.update(self.sync_manager._pipe_set(pipe, **item))
+            await pipe.execute()
+            await self._extend_bodies(extend)
+            await self._publish_invalidation("keys", [item["key"] for item in items])
+        except Exception as e:
+            logger.error(f"批量设置缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+    
+    async def _extend_bodies(self, body_ttls: Dict[str, int]) -> None:
+        """Redis 7.0 以下不支持 EXPIRE GT 时延长共享正文的过期时间，见 CacheManager._extend_bodies"""
+        if not body_ttls:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for body_key in body_ttls:
+            pipe.ttl(body_key)
+        extend = _short_bodies(body_ttls, await pipe.execute())
+        if extend:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for body_key, ttl in extend:
+                pipe.expire(body_key, ttl)
+            await pipe.execute()
+    
+    async def delete(self, key: str) -> None:
         """删除缓存值
         
         Args:
             key: 缓存键
         """
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.delete, key)
+            return
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                self.redis_client.delete(key)
-            else:
-                # 使用内存缓存
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
+            await self.redis_client.delete(key)
+            await self._publish_invalidation("key", key)
         except Exception as e:
             logger.error(f"删除缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
     
-    def delete_pattern(self, pattern: str) -> None:
+    async def delete_pattern(self, pattern: str) -> None:
         """删除匹配模式的缓存值
         
         Args:
             pattern: 匹配模式，如 "yuque:repo:*"
         """
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.delete_pattern, pattern)
+            return
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
-            else:
-                # 使用内存缓存
-                keys_to_delete = [key for key in self.memory_cache if pattern.replace("*", "") in key]
-                for key in keys_to_delete:
-                    del self.memory_cache[key]
+            batch: List[Any] = []
+            async for key in self.redis_client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    await self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                await self.redis_client.unlink(*batch)
+            await self._publish_invalidation("pattern", pattern)
         except Exception as e:
             logger.error(f"删除匹配缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
     
-    def get_stats(self) -> Dict[str, int]:
-        """获取缓存统计信息
+    async def coalesce(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cached: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """合并相同缓存键的并发请求
+        
+        同一时刻只有一个调用者执行 fetch，其他调用者等待并共享它的结果或异常；
+        共享缓存键只能由有权读取该条目的调用者合并，其他调用者应使用按租户区分的键。
         
+        Args:
+            key: 缓存键
+            fetch: 请求上游并写入缓存的协程函数
+            cached: 等待其他worker的请求完成后读取缓存的协程函数，由调用者负责访问权限检查，
+                返回None或未提供时自行请求上游
+            
         Returns:
-            缓存统计字典，包含命中次数、未命中次数和命中率
+            fetch 或 cached 的结果
         """
-        total = self.hit_count + self.miss_count
-        hit_rate = round(self.hit_count / total * 100, 2) if total > 0 else 0
-        return {
-            "hit_count": self.hit_count,
-            "miss_count": self.miss_count,
-            "total_count": total,
-            "hit_rate": hit_rate
-        }
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced_count += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 发起请求的调用者被取消时，由等待者重新发起
+                if future.cancelled():
+                    continue
+                raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._fetch_with_lock(key, fetch, cached)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免出现 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
     
-    def clear(self) -> None:
+    async def _fetch_with_lock(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cached: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """启用Redis锁时，跨worker只允许一个请求访问上游，其余等待其写入缓存后通过 cached 读取"""
+        if not (self.coalesce_lock_enabled and self.redis_client):
+            return await fetch()
+        
+        lock_key = f"yuque:lock:{key}"
+        lock_token = uuid.uuid4().hex
+        timeout = self.coalesce_lock_timeout
+        try:
+            acquired = await self.redis_client.set(lock_key, lock_token, nx=True, px=int(timeout * 1000))
+        except Exception as e:
+            logger.warning(f"❌ 获取请求合并锁失败: {e}")
+            return await fetch()
+        
+        if acquired:
+            try:
+                return await fetch()
+            finally:
+                try:
+                    await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
+                except Exception as e:
+                    logger.warning(f"❌ 释放请求合并锁失败: {e}")
+        
+        # 其他worker正在请求，等待锁释放后读取它写入的缓存
+        self.lock_wait_count += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while loop.time() < deadline and await self.redis_client.exists(lock_key):
+                await asyncio.sleep(0.05)
+        except Exception as e:
+            logger.warning(f"❌ 等待请求合并锁失败: {e}")
+        if cached is not None:
+            result = await cached()
+            if result is not None:
+                return result
+        return await fetch()
+    
+    def schedule_refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        """在后台任务中刷新软过期的条目，同一缓存键同时只刷新一次
+        
+        Args:
+            key: 缓存键
+            fetch: 请求上游并写入缓存的协程函数
+        """
+        if key in self._refreshing or len(self._refreshing) >= self.sync_manager.refresh_max_pending:
+            return
+        self.sync_manager.record_stat("refresh_count")
+        
+        async def run():
+            try:
+                await self.coalesce(key, fetch)
+            except Exception as e:
+                logger.warning(f"❌ 后台刷新缓存失败: {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+        
+        self._refreshing[key] = asyncio.get_running_loop().create_task(run())
+    
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        """删除标签下的全部缓存值，只访问标签成员，不扫描键空间
+        
+        Args:
+            tags: 缓存标签，通常由 get_dependent_tags 生成
+        """
+        tags = list(tags)
+        if not tags:
+            return
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.invalidate_tags, tags)
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            _pipe_pop_tags(pipe, tags)
+            keys = _popped_tag_keys(await pipe.execute())
+            for start in range(0, len(keys), SCAN_BATCH_SIZE):
+                await self.redis_client.unlink(*keys[start:start + SCAN_BATCH_SIZE])
+            await self._publish_invalidation("keys", [key.decode("utf-8") for key in keys])
+        except Exception as e:
+            logger.error(f"按标签删除缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+    
+    async def set_negative(self, key: str, status: int, body: str, tags: Iterable[str] = (), tenant: Optional[str] = None) -> None:
+        """缓存上游的 404/403 结果，见 CacheManager.set_negative"""
+        if self.sync_manager.negative_ttl <= 0:
+            return
+        self.sync_manager.record_stat("negative_store_count")
+        await self.set(key, None, expire=self.sync_manager.negative_ttl, tags=tags, meta={"negative": {"status": status, "body": body}}, tenant=tenant)
+    
+    async def get_rendered(self, key: Optional[str], tenant: Optional[str] = None) -> Optional[str]:
+        """读取工具的渲染结果，见 CacheManager.get_rendered"""
+        if key is None or self.sync_manager.render_ttl <= 0:
+            return None
+        entry = await self.get_entry(key, tenant, record=False)
+        text = entry.value if entry is not None and isinstance(entry.value, str) else None
+        self.sync_manager.record_stat("render_hit_count" if text is not None else "render_miss_count")
+        return text
+    
+    async def set_rendered(self, key: Optional[str], text: str, tenant: Optional[str] = None) -> None:
+        """缓存工具的渲染结果，见 CacheManager.set_rendered"""
+        if key is None or self.sync_manager.render_ttl <= 0:
+            return
+        await self.set(key, text, expire=self.sync_manager.render_ttl, tenant=tenant)
+    
+    async def inspect(self, key: str) -> Optional[Dict[str, Any]]:
+        """查看缓存条目的过期时间与元数据，见 CacheManager.inspect"""
+        if not self.redis_client:
+            return await self._run_local(self.sync_manager.inspect, key)
+        entry = await self.get_entry(key, record=False)
+        if entry is None:
+            return None
+        try:
+            remaining = await self.redis_client.ttl(key)
+        except Exception as e:
+            logger.error(f"获取缓存过期时间失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+            remaining = None
+        return _describe_entry(key, entry, remaining)
+    
+    async def get_hot_keys(self, limit: int = 20, sort: str = "hits") -> List[Dict[str, Any]]:
+        """列出最热的缓存键，在线程池中执行，见 CacheManager.get_hot_keys"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.sync_manager.get_hot_keys(limit, sort))
+    
+    async def purge(self, **scope: Optional[str]) -> List[str]:
+        """按知识库、文档、团队或Token清除缓存，见 CacheManager.purge"""
+        if scope.get("namespace") and not scope.get("repo_id"):
+            entry = await self.get_entry(get_request_cache_key("GET", f"/repos/{scope['namespace']}", None), record=False)
+            scope["repo_id"] = get_repo_alias(scope["namespace"], entry.value if entry is not None else None)
+        tags = get_purge_tags(**scope)
+        await self.invalidate_tags(tags)
+        logger.info(f"✅ 已按标签清除缓存: {', '.join(tags)}")
+        return tags
+    
+    async def grant_access(self, repo: str, tenant: str) -> None:
+        """记录租户已通过上游请求证明可以访问知识库，见 CacheManager.grant_access"""
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.grant_access, repo, tenant)
+            return
+        key = get_access_key(repo, tenant)
+        tag = f"repo:{repo}"
+        access_ttl = self.sync_manager.access_ttl
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.set(key, 1, ex=access_ttl)
+            _pipe_tag(pipe, tag, key, access_ttl, self.sync_manager.tag_ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"记录访问权限失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+    
+    async def has_access(self, repo: str, tenant: str) -> bool:
+        """租户是否已证明可以访问知识库，公开知识库对所有租户返回True"""
+        if not self.redis_client:
+            return await self._run_local(self.sync_manager.has_access, repo, tenant)
+        try:
+            return bool(await self.redis_client.exists(get_access_key(repo, tenant), get_access_key(repo, PUBLIC_TENANT)))
+        except Exception as e:
+            logger.error(f"检查访问权限失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+            return False
+    
+    async def clear(self) -> None:
         """清空所有缓存"""
+        if not self.redis_client:
+            await self._run_local(self.sync_manager.clear)
+            return
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                self.redis_client.flushdb()
-            else:
-                # 使用内存缓存
-                self.memory_cache.clear()
+            await self.redis_client.flushdb()
+            await self._publish_invalidation("clear")
             logger.info("✅ 缓存已清空")
         except Exception as e:
             logger.error(f"清空缓存失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息，并检测异步Redis连接状态"""
+        stats = self.sync_manager.get_stats(aggregate=False)
+        stats["aggregate"] = await self.get_aggregated_stats()
+        stats["coalesced_count"] = self.coalesced_count
+        stats["lock_wait_count"] = self.lock_wait_count
+        if self.redis_client:
+            try:
+                await self.redis_client.ping()
+                stats["redis_connected"] = True
+            except Exception as e:
+                logger.warning(f"❌ Redis连接检测失败: {e}")
+                stats["redis_connected"] = False
+        else:
+            stats["redis_connected"] = False
+        return stats
+    
+    async def get_aggregated_stats(self) -> Optional[Dict[str, Any]]:
+        """获取各worker汇总后的统计，见 CacheManager.get_aggregated_stats"""
+        manager = self.sync_manager
+        if not (manager.stats_aggregate and manager.redis_client):
+            return None
+        if not self.redis_client:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, manager.get_aggregated_stats)
+        pending = manager._take_pending_stats()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            manager._pipe_pending_stats(pipe, pending)
+            pipe.hgetall(STATS_KEY)
+            pipe.hgetall(STATS_WORKERS_KEY)
+            results = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"❌ 获取汇总统计失败: {e}")
+            self.sync_manager._record_redis_failure(e)
+            manager._restore_pending_stats(pending)
+            return None
+        stale = manager._stale_workers(results[-1])
+        if stale:
+            try:
+                await self.redis_client.hdel(STATS_WORKERS_KEY, *stale)
+            except Exception as e:
+                logger.warning(f"❌ 删除已退出worker的上报时间失败: {e}")
+                self.sync_manager._record_redis_failure(e)
+        return manager._build_aggregated_stats(results[-2], results[-1])
+    
+    async def close(self) -> None:
+        """关闭异步连接池，并停止同步管理器的后台线程"""
+        if self.pool:
+            await self.pool.disconnect()
+        self.sync_manager.close()
 
 
 # 创建全局缓存管理器实例
 cache_manager = CacheManager()
+async_cache_manager = AsyncCacheManager(cache_manager)
 
 
 # 缓存键生成函数
+# 缓存键的最大长度，超过时可读前缀之后的部分替换为哈希
+CACHE_KEY_MAX_LENGTH = max(64, int(CONFIG.get("CACHE_KEY_MAX_LENGTH", "200")))
+# 哈希部分的长度（十六进制字符数）
+CACHE_KEY_DIGEST_LENGTH = 32
+
+
+def _canonical_value(value: Any) -> str:
+    """参数值的规范形式：字典、列表按键排序后序列化为紧凑JSON，语义相同的参数得到相同的字符串"""
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(value)
+
+
+def compact_cache_key(key: str) -> str:
+    """超过 CACHE_KEY_MAX_LENGTH 的缓存键截取可读前缀，并追加完整键的哈希，长度固定为上限"""
+    if len(key) <= CACHE_KEY_MAX_LENGTH:
+        return key
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:CACHE_KEY_DIGEST_LENGTH]
+    return f"{key[:CACHE_KEY_MAX_LENGTH - CACHE_KEY_DIGEST_LENGTH - 1]}#{digest}"
+
+
 def generate_cache_key(prefix: str, *args, **kwargs) -> str:
     """生成缓存键
     
     Args:
         prefix: 缓存前缀
         *args: 位置参数，用于生成缓存键
-        **kwargs: 关键字参数，用于生成缓存键
+        **kwargs: 关键字参数，用于生成缓存键，字典、列表等取规范形式
         
     Returns:
-        生成的缓存键
+        生成的缓存键，过长时见 compact_cache_key
     """
     key_parts = [prefix]
     
@@ -193,6 +2923,604 @@ def generate_cache_key(prefix: str, *args, **kwargs) -> str:
     
     # 添加关键字参数，按字母顺序排序
     for key, value in sorted(kwargs.items()):
-        key_parts.append(f"{key}={value}")
+        key_parts.append(f"{key}={_canonical_value(value)}")
+    
+    return compact_cache_key(":".join(key_parts))
+
+
+def normalize_endpoint(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """将端点规范为 路径?排序后的查询参数 的形式
+    
+    端点中的查询字符串与 params 合并后按参数名、值排序，路径去掉多余的斜杠，
+    如 /search?type=doc&q=a 与 /search?q=a&type=doc、/search + params={"q": "a", "type": "doc"} 得到相同结果。
+    """
+    path, _, query = endpoint.partition("?")
+    path = "/" + "/".join(part for part in path.split("/") if part)
+    pairs = parse_qsl(query, keep_blank_values=True)
+    for name, value in (params or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        pairs.extend((name, str(item).lower() if isinstance(item, bool) else str(item)) for item in values)
+    if not pairs:
+        return path
+    return path + "?" + urlencode(sorted(pairs), quote_via=quote, safe="/:,")
+
+
+# 各接口类型的默认过期时间（秒）：(软过期, 硬过期)
+# 软过期后返回旧值并在后台刷新，硬过期后条目被删除；硬过期即原先各类型的过期时间，不会返回更旧的数据
+DEFAULT_TTL_POLICIES: Dict[str, tuple] = {
+    "user": (43200, 86400),       # 用户信息
+    "repo": (21600, 43200),       # 知识库详情、目录与知识库列表
+    "doc_list": (10800, 21600),   # 文档列表
+    "doc": (5400, 10800),         # 文档内容
+    "search": (1800, 3600),       # 搜索结果
+    "stats": (3600, 7200),        # 团队统计
+    "other": (3600, 7200),        # 其他GET请求
+}
+
+
+def load_ttl_policies(config: Dict[str, str]) -> Dict[str, tuple]:
+    """加载过期策略，可通过 CACHE_TTL_<类型>=软过期,硬过期 覆盖默认值"""
+    policies = dict(DEFAULT_TTL_POLICIES)
+    for endpoint_class, (soft_ttl, hard_ttl) in DEFAULT_TTL_POLICIES.items():
+        value = config.get(f"CACHE_TTL_{endpoint_class.upper()}")
+        if not value:
+            continue
+        try:
+            parts = [int(part) for part in value.split(",")]
+            soft_ttl = parts[0]
+            hard_ttl = max(parts[1] if len(parts) > 1 else soft_ttl, soft_ttl)
+            policies[endpoint_class] = (soft_ttl, hard_ttl)
+        except ValueError:
+            logger.warning(f"⚠️ 无效的缓存过期配置 CACHE_TTL_{endpoint_class.upper()}={value}")
+    return policies
+
+
+TTL_POLICIES = load_ttl_policies(CONFIG)
+
+# 不可变资源的接口类型：内容一经创建不再变化（如文档的历史版本），写入后不设软过期、不重验证；
+# 硬过期默认30天，避免不再访问的条目在Redis中无限累积（maxmemory-policy 为 volatile-* 时不淘汰没有过期时间的键），
+# CACHE_IMMUTABLE_TTL=0 表示永不过期，只会因容量被淘汰
+IMMUTABLE_ENDPOINT_CLASSES = ("doc_version",)
+IMMUTABLE_TTL = max(0, int(CONFIG.get("CACHE_IMMUTABLE_TTL", "2592000")))
+
+
+def get_endpoint_class(endpoint: str) -> str:
+    """根据API端点判断接口类型，用于选择过期策略和统计分类"""
+    path = endpoint.split("?", 1)[0]
+    parts = path.strip("/").split("/")
+    if parts[0] == "user" or (parts[0] == "users" and len(parts) == 2):
+        return "user"
+    if parts[0] == "search":
+        return "search"
+    if parts[0] == "groups" and "statistics" in parts:
+        return "stats"
+    if parts[0] == "repos":
+        if "docs" in parts:
+            return "doc" if parts[-1] != "docs" else "doc_list"
+        return "repo"
+    if parts[0] in ("users", "groups") and parts[-1] == "repos":
+        return "repo"
+    if parts[0] == "doc_versions" and len(parts) == 2:
+        return "doc_version"
+    return "other"
+
+
+def is_immutable(endpoint: str) -> bool:
+    """端点对应的资源是否不可变，见 IMMUTABLE_ENDPOINT_CLASSES"""
+    return get_endpoint_class(endpoint) in IMMUTABLE_ENDPOINT_CLASSES
+
+
+def get_ttl_policy(endpoint: str) -> tuple:
+    """获取端点的 (软过期, 硬过期) 时间"""
+    return TTL_POLICIES.get(get_endpoint_class(endpoint), TTL_POLICIES["other"])
+
+
+def _parse_time(value: Any) -> Optional[float]:
+    """解析语雀接口中的 ISO 8601 时间，如 2024-06-01T08:00:00.000Z"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class AdaptiveTTL:
+    """根据文档的 updated_at 历史推算过期时间
+    
+    从文档列表和文档详情中记录每篇文档最近几次的 updated_at，估算其修改间隔：
+    有多次记录时取平均间隔与距上次修改时长中的较大者，否则取距上次修改时长。
+    软过期为修改间隔乘以系数，并限制在配置的上下限之间；硬过期按该接口类型默认策略的比例放大。
+    频繁修改的文档因此过期更快，长期未修改的文档缓存更久。
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        min_ttl: int = 60,
+        max_ttl: int = 86400,
+        factor: float = 0.1,
+        max_tracked: int = 10000,
+        history_size: int = 5
+    ):
+        """初始化自适应过期策略
+        
+        Args:
+            enabled: 是否启用，关闭时始终使用默认策略
+            min_ttl: 软过期下限（秒）
+            max_ttl: 软过期上限（秒）
+            factor: 软过期与估算修改间隔的比例
+            max_tracked: 最多记录的文档数，超出时按LRU淘汰
+            history_size: 每篇文档保留的 updated_at 记录数
+        """
+        self.enabled = enabled
+        self.min_ttl = min_ttl
+        self.max_ttl = max(max_ttl, min_ttl)
+        self.factor = factor
+        self.max_tracked = max_tracked
+        self.history_size = history_size
+        self._history: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.assigned_count = 0
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> "AdaptiveTTL":
+        """根据 CACHE_ADAPTIVE_TTL* 配置创建"""
+        return cls(
+            enabled=config.get("CACHE_ADAPTIVE_TTL", "true").lower() == "true",
+            min_ttl=int(config.get("CACHE_ADAPTIVE_TTL_MIN", "60")),
+            max_ttl=int(config.get("CACHE_ADAPTIVE_TTL_MAX", "86400")),
+            factor=float(config.get("CACHE_ADAPTIVE_TTL_FACTOR", "0.1"))
+        )
+    
+    def _record(self, doc_key: str, updated_at: float) -> List[float]:
+        with self._lock:
+            history = self._history.get(doc_key)
+            if history is None:
+                history = self._history[doc_key] = []
+            else:
+                self._history.move_to_end(doc_key)
+            if updated_at not in history:
+                history.append(updated_at)
+                history.sort()
+                del history[:-self.history_size]
+            while len(self._history) > self.max_tracked:
+                self._history.popitem(last=False)
+            return list(history)
+    
+    def _estimate_interval(self, history: List[float], now: float) -> float:
+        """估算修改间隔（秒）"""
+        age = max(now - history[-1], 0)
+        if len(history) < 2:
+            return age
+        gaps = [later - earlier for earlier, later in zip(history, history[1:])]
+        return max(sum(gaps) / len(gaps), age)
+    
+    def observe(self, endpoint: str, result: Any) -> Optional[float]:
+        """记录文档列表或文档详情中的 updated_at，返回推算出的最短修改间隔，无法推算时返回None"""
+        endpoint_class = get_endpoint_class(endpoint)
+        if not self.enabled or endpoint_class not in ("doc", "doc_list"):
+            return None
+        parts = endpoint.split("?", 1)[0].strip("/").split("/")
+        repo, rest = _split_repo(parts)
+        data = result.get("data") if isinstance(result, dict) else None
+        if endpoint_class == "doc_list":
+            docs = data if isinstance(data, list) else []
+        else:
+            # 按ID请求的文档，以响应中的slug记录
+            docs = [dict(data, slug=data.get("slug") or rest[1])] if isinstance(data, dict) and len(rest) > 1 else []
+        
+        now = time.time()
+        intervals: List[float] = []
+        for doc in docs:
+            if not isinstance(doc, dict) or not doc.get("slug"):
+                continue
+            updated_at = _parse_time(doc.get("updated_at"))
+            if updated_at is None:
+                continue
+            history = self._record(f"{repo}/{doc['slug']}", updated_at)
+            intervals.append(self._estimate_interval(history, now))
+        return min(intervals) if intervals else None
+    
+    def get_ttl(self, endpoint: str, result: Any) -> tuple:
+        """获取条目的 (软过期, 硬过期, 来源)，来源为 adaptive 或 policy；自适应的过期时间不超过默认策略的硬过期"""
+        soft_ttl, hard_ttl = get_ttl_policy(endpoint)
+        interval = self.observe(endpoint, result)
+        if interval is None:
+            return soft_ttl, hard_ttl, "policy"
+        adaptive_soft = int(min(max(interval * self.factor, self.min_ttl), self.max_ttl))
+        adaptive_hard = int(adaptive_soft * hard_ttl / soft_ttl) if soft_ttl > 0 else adaptive_soft
+        # 很少修改的文档可以推迟刷新，但缓存的数据不会比默认策略允许的更旧
+        adaptive_hard = min(max(adaptive_hard, adaptive_soft), hard_ttl)
+        self.assigned_count += 1
+        return min(adaptive_soft, adaptive_hard), adaptive_hard, "adaptive"
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取自适应过期统计"""
+        return {
+            "enabled": self.enabled,
+            "min_ttl": self.min_ttl,
+            "max_ttl": self.max_ttl,
+            "factor": self.factor,
+            "tracked_docs": len(self._history),
+            "assigned_count": self.assigned_count
+        }
+
+
+adaptive_ttl = AdaptiveTTL.from_config(CONFIG)
+
+
+def get_entry_ttl(endpoint: str, result: Any) -> Dict[str, Any]:
+    """获取写入缓存时使用的过期时间：不可变资源不过期，文档与文档列表按修改频率自适应，其余按接口类型的默认策略
+    
+    Returns:
+        {"soft": 软过期, "hard": 硬过期, "source": immutable、adaptive 或 policy}，会记录在条目元数据中供查看；
+        不可变资源的软过期为None，硬过期为 CACHE_IMMUTABLE_TTL（为0时为None，永不过期）
+    """
+    if is_immutable(endpoint):
+        return {"soft": None, "hard": IMMUTABLE_TTL or None, "source": "immutable"}
+    soft_ttl, hard_ttl, source = adaptive_ttl.get_ttl(endpoint, result)
+    return {"soft": soft_ttl, "hard": hard_ttl, "source": source}
+
+
+# 条件重验证函数
+def extract_validators(headers: Any, result: Any) -> Dict[str, str]:
+    """提取条件请求所需的校验信息：ETag、Last-Modified 以及响应数据中的 updated_at"""
+    validators: Dict[str, str] = {}
+    for header, name in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+        value = headers.get(header) if headers is not None else None
+        if isinstance(value, str) and value:
+            validators[name] = value
+    data = result.get("data") if isinstance(result, dict) else None
+    if isinstance(data, dict) and isinstance(data.get("updated_at"), str):
+        validators["updated_at"] = data["updated_at"]
+    return validators
+
+
+def build_conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+    """根据旧条目的校验信息构造条件请求头"""
+    headers: Dict[str, str] = {}
+    validators = entry.validators
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def get_doc_list_key(endpoint: str) -> Optional[tuple]:
+    """文档端点对应的 (文档列表缓存键, 文档slug)，非文档端点返回None"""
+    path = endpoint.split("?", 1)[0]
+    parts = path.strip("/").split("/")
+    if len(parts) == 5 and parts[0] == "repos" and parts[3] == "docs":
+        return get_request_cache_key("GET", f"/repos/{parts[1]}/{parts[2]}/docs", None), parts[4]
+    return None
+
+
+def is_unchanged_in_list(entry: CacheEntry, list_entry: Optional[CacheEntry], slug: str) -> bool:
+    """通过未过期的文档列表判断文档是否变化：列表中该文档的 updated_at 与旧条目一致即未变化
+    
+    文档列表须晚于文档条目获取（元数据 fetched_at），更早的列表不能说明文档之后没有变化
+    """
+    updated_at = entry.validators.get("updated_at")
+    if not updated_at or list_entry is None or list_entry.is_stale:
+        return False
+    entry_fetched_at = entry.meta.get("fetched_at")
+    list_fetched_at = list_entry.meta.get("fetched_at")
+    if entry_fetched_at is None or list_fetched_at is None or list_fetched_at <= entry_fetched_at:
+        return False
+    docs = list_entry.value.get("data") if isinstance(list_entry.value, dict) else None
+    for doc in docs or []:
+        if isinstance(doc, dict) and (doc.get("slug") == slug or str(doc.get("id")) == slug):
+            return doc.get("updated_at") == updated_at
+    return False
+
+
+# 缓存标签函数
+def get_tag_key(tag: str) -> str:
+    """生成标签在Redis中的键：有序集合，成员为缓存键，分数为该键的过期时间戳"""
+    return f"yuque:tags:{tag}"
+
+
+def get_legacy_tag_key(tag: str) -> str:
+    """旧版本使用的标签集合（SET）的键，滚动升级期间仍可能被写入，失效时一并读取"""
+    return f"yuque:tag:{tag}"
+
+
+def _pipe_tag(pipe: Any, tag: str, key: str, expire: Optional[int], tag_ttl: int) -> None:
+    """在Redis管道中把缓存键登记到标签下，并删除标签中已过期的成员
+    
+    成员的分数为缓存键的过期时间戳（永不过期为 +inf），过期或被淘汰的键不会在标签中无限累积
+    """
+    now = time.time()
+    tag_key = get_tag_key(tag)
+    pipe.zadd(tag_key, {key: now + expire if expire and expire > 0 else float("inf")})
+    pipe.zremrangebyscore(tag_key, "-inf", now)
+    pipe.expire(tag_key, max(expire or 0, tag_ttl))
+
+
+def _pipe_pop_tags(pipe: Any, tags: Iterable[str]) -> None:
+    """在事务管道中读取并删除标签下未过期的缓存键，结果由 _popped_tag_keys 汇总"""
+    now = time.time()
+    for tag in tags:
+        pipe.zrangebyscore(get_tag_key(tag), now, "+inf")
+        pipe.smembers(get_legacy_tag_key(tag))
+        pipe.unlink(get_tag_key(tag), get_legacy_tag_key(tag))
+
+
+def _popped_tag_keys(results: List[Any]) -> List[bytes]:
+    """汇总 _pipe_pop_tags 的执行结果，返回排序后的缓存键"""
+    return sorted(set().union(*results[0::3], *results[1::3]))
+
+
+def get_body_key(digest: str) -> str:
+    """生成按内容寻址存储的正文的键，见 split_bodies"""
+    return f"yuque:body:{digest}"
+
+
+def _short_bodies(body_ttls: Dict[str, int], remaining: List[int]) -> List[tuple]:
+    """根据正文剩余的过期时间（TTL 的结果），返回需要延长的 (正文键, 过期时间)；不存在或永不过期的正文不处理"""
+    return [(body_key, ttl) for (body_key, ttl), left in zip(body_ttls.items(), remaining) if 0 <= left < ttl]
+
+
+# 公开知识库的访问权限对所有租户有效
+PUBLIC_TENANT = "*"
+
+
+def get_access_key(repo: str, tenant: str) -> str:
+    """生成租户对知识库访问权限证明的缓存键"""
+    return f"yuque:access:{repo}:{tenant}"
+
+
+def get_tenant_id(token: str) -> str:
+    """生成租户标识，即Token的哈希值，Token本身不会出现在缓存键、标签或统计中"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def get_token_tag(token: str) -> str:
+    """生成Token标签，只保存Token的哈希值"""
+    return "token:" + get_tenant_id(token)
+
+
+def _split_repo(parts: List[str]) -> tuple:
+    """从 repos/... 路径片段中拆出知识库标识与剩余片段，知识库可以用ID或 owner/slug 形式的命名空间标识"""
+    if parts[1].isdigit():
+        return parts[1], parts[2:]
+    return "/".join(parts[1:3]), parts[3:]
+
+
+def get_shared_repo(endpoint: str) -> Optional[str]:
+    """知识库范围的端点返回知识库标识，其缓存条目可在已证明有权访问的Token间共享；其余端点按Token隔离，返回None"""
+    parts = endpoint.split("?", 1)[0].strip("/").split("/")
+    if parts[0] == "repos" and len(parts) >= 2:
+        return _split_repo(parts)[0]
+    return None
+
+
+def get_request_cache_key(method: str, endpoint: str, token: Optional[str], **kwargs) -> str:
+    """生成API请求的缓存键
+    
+    键由方法、规范化的端点（见 normalize_endpoint，params 合并到查询参数中）和其余请求参数组成，
+    过长时只保留可读前缀（租户、方法与路径）并以哈希结尾。
+    知识库范围的资源在各Token间共享同一个缓存键；用户、团队、搜索等与Token身份相关的资源，
+    缓存键中带有租户标识，避免不同Token互相读取。
+    """
+    endpoint = normalize_endpoint(endpoint, kwargs.pop("params", None))
+    if token and get_shared_repo(endpoint) is None:
+        return generate_cache_key("yuque", "tenant", get_tenant_id(token), method.upper(), endpoint, **kwargs)
+    return generate_cache_key("yuque", method.upper(), endpoint, **kwargs)
+
+
+# 会被否定缓存的上游状态码
+NEGATIVE_STATUS_CODES = (403, 404)
+
+
+def get_content_version(result: Any) -> str:
+    """缓存值的内容版本：规范序列化后的哈希，内容不变时版本不变"""
+    return hashlib.sha256(_canonical_value(result).encode("utf-8")).hexdigest()[:CACHE_KEY_DIGEST_LENGTH]
+
+
+def get_render_cache_key(tool: str, arguments: Dict[str, Any], versions: Iterable[Optional[str]]) -> Optional[str]:
+    """生成工具渲染结果的缓存键，由工具名、规范化的参数和渲染所用源条目的版本组成
+    
+    渲染结果只取决于参数和源条目的内容，内容相同的源条目得到相同的键，因此可以在租户间共享；
+    没有源条目或任一源条目版本未知时返回None，不缓存。
+    """
+    versions = list(versions)
+    if not versions or any(version is None for version in versions):
+        return None
+    digest = hashlib.sha256(",".join(versions).encode("utf-8")).hexdigest()[:CACHE_KEY_DIGEST_LENGTH]
+    args = [f"{name}={_canonical_value(value)}" for name, value in sorted(arguments.items())]
+    return generate_cache_key("yuque", "render", tool, digest, *args)
+
+
+def get_negative_cache_key(method: str, endpoint: str, token: Optional[str], **kwargs) -> str:
+    """生成否定缓存（404/403）的缓存键
+    
+    错误结果与Token的权限相关，知识库范围的资源也按租户隔离；其余端点与 get_request_cache_key 相同。
+    """
+    endpoint = normalize_endpoint(endpoint, kwargs.pop("params", None))
+    if token:
+        return generate_cache_key("yuque", "tenant", get_tenant_id(token), method.upper(), endpoint, **kwargs)
+    return generate_cache_key("yuque", method.upper(), endpoint, **kwargs)
+
+
+def is_public_repo(endpoint: str, result: Any) -> bool:
+    """知识库详情响应中标记为公开的知识库，任何Token都可以读取其缓存"""
+    parts = endpoint.split("?", 1)[0].strip("/").split("/")
+    if parts[0] != "repos" or len(parts) < 2 or _split_repo(parts)[1]:
+        return False
+    data = result.get("data") if isinstance(result, dict) else None
+    # public: 0 私密，1 互联网公开，2 仅空间成员可见
+    return isinstance(data, dict) and data.get("public") == 1
+
+
+def get_cache_tags(endpoint: str, token: Optional[str] = None, result: Any = None, **kwargs) -> List[str]:
+    """根据GET端点生成缓存标签
+    
+    标签按命名空间、文档、团队和Token划分，写操作通过 get_dependent_tags 找到需要失效的标签。
+    
+    Args:
+        endpoint: API端点，可带查询字符串
+        token: 发起请求的语雀Token
+        result: 接口响应，用于补充文档ID等端点中没有的标识
+        **kwargs: 请求参数，如 params
+        
+    Returns:
+        标签列表
+    """
+    path = endpoint.split("?", 1)[0]
+    parts = path.strip("/").split("/")
+    tags: List[str] = []
+    
+    if parts[0] == "repos" and len(parts) >= 2:
+        repo, rest = _split_repo(parts)
+        tags.append(f"repo:{repo}")
+        if not rest:
+            tags.append(f"repo_info:{repo}")
+        elif rest == ["docs"]:
+            tags.append(f"doc_list:{repo}")
+        elif rest[0] == "docs":
+            tags.append(f"doc:{repo}/{rest[1]}")
+            data = result.get("data") if isinstance(result, dict) else None
+            if isinstance(data, dict) and data.get("id") is not None:
+                tags.append(f"doc_id:{data['id']}")
+        elif rest == ["toc"]:
+            tags.append(f"toc:{repo}")
+    elif parts[0] == "groups" and len(parts) >= 2:
+        group, rest = parts[1], parts[2:]
+        tags.append(f"group:{group}")
+        if rest[:1] == ["users"]:
+            tags.append(f"group_users:{group}")
+        elif rest[:1] == ["statistics"]:
+            tags.append(f"group_stats:{group}")
+        elif rest == ["repos"]:
+            tags.extend(["repo_list", f"repo_list:{group}"])
+    elif parts[0] == "users" and len(parts) == 3 and parts[2] == "repos":
+        tags.extend(["repo_list", f"repo_list:{parts[1]}"])
+    elif parts[0] == "doc_versions":
+        if len(parts) >= 2:
+            tags.append(f"doc_version:{parts[1]}")
+        else:
+            doc_id = (kwargs.get("params") or {}).get("doc_id")
+            if doc_id is not None:
+                tags.append(f"doc_id:{doc_id}")
+    elif parts[0] == "search":
+        tags.append("search")
+    
+    if token:
+        tags.append(get_token_tag(token))
+    return tags
+
+
+# 写操作依赖表：资源类型 -> 需要失效的缓存标签模板
+CACHE_DEPENDENCIES: Dict[str, List[str]] = {
+    # 文档写入：知识库详情（文档数）、文档列表、目录，以及该文档本身（含raw变体）和版本列表
+    "doc": [
+        "repo_info:{repo}",
+        "doc_list:{repo}",
+        "toc:{repo}",
+        "doc:{repo}/{slug}",
+        "doc_id:{doc_id}",
+    ],
+    # 知识库写入：该知识库下的全部条目，以及用户/团队的知识库列表
+    "repo": [
+        "repo:{repo}",
+        "repo_list",
+    ],
+    # 目录写入：目录与知识库详情
+    "toc": [
+        "repo_info:{repo}",
+        "toc:{repo}",
+    ],
+    # 新建知识库：所属用户或团队的知识库列表，以及新知识库此前被缓存的 404
+    "repo_list": [
+        "repo_list:{owner}",
+        "repo:{repo}",
+    ],
+    # 团队成员变更：成员列表与团队统计
+    "group_member": [
+        "group_users:{group}",
+        "group_stats:{group}",
+    ],
+}
+
+
+def get_dependent_tags(resource: str, **ids: Any) -> List[str]:
+    """根据依赖表生成写操作需要失效的缓存标签
+    
+    Args:
+        resource: 资源类型，见 CACHE_DEPENDENCIES
+        **ids: 模板参数，值可以是单个值或列表，空值会被忽略
+        
+    Returns:
+        缓存标签列表
+    """
+    values: Dict[str, List[Any]] = {}
+    for name, value in ids.items():
+        candidates = value if isinstance(value, (list, tuple)) else [value]
+        values[name] = list(dict.fromkeys(v for v in candidates if v not in (None, "")))
+    
+    tags: List[str] = []
+    for template in CACHE_DEPENDENCIES[resource]:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template) if field]
+        if any(not values.get(field) for field in fields):
+            continue
+        for combo in itertools.product(*(values[field] for field in fields)):
+            tags.append(template.format(**dict(zip(fields, combo))))
+    return list(dict.fromkeys(tags))
+
+
+def get_purge_tags(
+    namespace: Optional[str] = None,
+    doc: Optional[str] = None,
+    group: Optional[str] = None,
+    token: Optional[str] = None,
+    tenant: Optional[str] = None,
+    repo_id: Optional[Any] = None
+) -> List[str]:
+    """根据清除范围生成缓存标签，管理接口按知识库、文档、团队或Token清除缓存
+    
+    Args:
+        namespace: 知识库命名空间或ID，未指定 doc 时清除该知识库下的全部条目
+        doc: 文档slug或ID，需要同时指定 namespace 或 repo_id
+        group: 团队登录名
+        token: 语雀Token，清除该Token的私有条目
+        tenant: 租户标识（Token的哈希值，见 get_tenant_id），与 token 作用相同
+        repo_id: 知识库的数字ID；同一知识库的条目可能以命名空间或ID缓存，两者同时提供时一并清除
+    
+    Returns:
+        缓存标签列表
     
-    return ":".join(key_parts)
+    Raises:
+        ValueError: 未指定任何范围，或指定 doc 时缺少 namespace 和 repo_id
+    """
+    repos = list(dict.fromkeys(str(repo) for repo in (namespace, repo_id) if repo not in (None, "")))
+    tags: List[str] = []
+    if doc:
+        if not repos:
+            raise ValueError("清除文档缓存需要同时提供 namespace 或 repo_id")
+        tags.extend(f"doc:{repo}/{doc}" for repo in repos)
+        if str(doc).isdigit():
+            tags.append(f"doc_id:{doc}")
+    else:
+        tags.extend(f"repo:{repo}" for repo in repos)
+    if group:
+        tags.append(f"group:{group}")
+    if token:
+        tags.append(get_token_tag(token))
+    if tenant:
+        tags.append(f"token:{tenant}")
+    if not tags:
+        raise ValueError("需要提供 namespace、repo_id、doc、group、token 或 tenant 之一")
+    return tags
+
+
+def get_repo_alias(repo: Any, repo_info: Any) -> Optional[Any]:
+    """根据缓存的知识库信息（GET /repos/{repo} 的响应）取得知识库的另一个标识：命名空间对应ID，ID对应命名空间"""
+    data = repo_info.get("data") if isinstance(repo_info, dict) else None
+    if not isinstance(data, dict):
+        return None
+    return data.get("namespace") if str(repo).isdigit() else data.get("id")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+缓存预热模块
+服务启动后（以及按计划定期）预取配置的知识库：知识库详情、目录、文档列表以及最近更新的文档
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def load_warmup_namespaces(config: Dict[str, str]) -> List[str]:
+    """从配置中读取需要预热的知识库命名空间
+    
+    CACHE_WARMUP_NAMESPACES 以逗号分隔，如 owner/repo-a,owner/repo-b
+    """
+    value = config.get("CACHE_WARMUP_NAMESPACES", "")
+    return [namespace.strip() for namespace in value.split(",") if namespace.strip()]
+
+
+class CacheWarmer:
+    """缓存预热器
+    
+    每次预热按知识库并发预取，全部上游请求共享一个并发上限；同一时间只运行一次预热，
+    配置了间隔时在后台按计划重复执行，进度通过 get_status 在 /health 中展示。
+    """
+    
+    def __init__(
+        self,
+        namespaces: List[str],
+        token: Optional[str],
+        concurrency: int = 4,
+        recent_docs: int = 20,
+        interval: int = 0,
+        client_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """初始化缓存预热器
+        
+        Args:
+            namespaces: 需要预热的知识库命名空间
+            token: 预热使用的语雀 Token
+            concurrency: 同时进行的上游请求数上限
+            recent_docs: 每个知识库预取的最近更新文档数
+            interval: 定期预热的间隔（秒），不大于0时只在启动时预热一次
+            client_factory: 根据Token创建异步客户端的函数，默认 AsyncYuqueMCPClient
+        """
+        self.namespaces = namespaces
+        self.token = token
+        self.concurrency = max(1, concurrency)
+        self.recent_docs = recent_docs
+        self.interval = interval
+        self.client_factory = client_factory
+        
+        self._task: Optional[asyncio.Task] = None
+        # 管理接口触发的预热
+        self._manual_task: Optional[asyncio.Task] = None
+        self._running = False
+        
+        # 预热进度
+        self.run_count = 0
+        self.targets: List[str] = []
+        self.state = "idle" if self.enabled else "disabled"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> "CacheWarmer":
+        """根据配置创建预热器，Token 优先读取环境变量 YUQUE_TOKEN"""
+        return cls(
+            namespaces=load_warmup_namespaces(config),
+            token=os.getenv("YUQUE_TOKEN") or config.get("YUQUE_TOKEN"),
+            concurrency=int(config.get("CACHE_WARMUP_CONCURRENCY", "4")),
+            recent_docs=int(config.get("CACHE_WARMUP_RECENT_DOCS", "20")),
+            interval=int(config.get("CACHE_WARMUP_INTERVAL", "0"))
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        """配置了知识库和Token时才进行预热"""
+        return bool(self.namespaces and self.token)
+    
+    def start(self) -> None:
+        """在后台启动预热，不阻塞服务启动；配置了间隔时按计划重复执行"""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.ensure_future(self._loop())
+    
+    def trigger(self, namespaces: List[str], token: Optional[str] = None) -> bool:
+        """在后台预热指定的知识库，不等待完成，供管理接口调用
+        
+        Returns:
+            是否开始预热，已有预热在进行或缺少Token时返回False
+        """
+        if self._running or not namespaces or not (token or self.token):
+            return False
+        self._manual_task = asyncio.ensure_future(self.run(namespaces, token))
+        return True
+    
+    async def stop(self) -> None:
+        """停止后台预热"""
+        for task in (self._task, self._manual_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._manual_task = None
+    
+    async def _loop(self) -> None:
+        while True:
+            await self.run()
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+    
+    def _create_client(self, token: str) -> Any:
+        if self.client_factory is not None:
+            return self.client_factory(token)
+        from async_yuque_client import AsyncYuqueMCPClient
+        return AsyncYuqueMCPClient(token)
+    
+    async def run(self, namespaces: Optional[List[str]] = None, token: Optional[str] = None) -> bool:
+        """执行一次预热
+        
+        Args:
+            namespaces: 本次预热的知识库，默认为配置的全部知识库；管理接口可指定单个知识库
+            token: 本次预热使用的语雀 Token，默认为配置的 Token
+        
+        Returns:
+            是否执行了预热，已有预热在进行、没有知识库或Token时返回False
+        """
+        namespaces = namespaces or self.namespaces
+        token = token or self.token
+        if not (namespaces and token) or self._running:
+            return False
+        self._running = True
+        self.run_count += 1
+        self.targets = list(namespaces)
+        self.state = "running"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        logger.info(f"🔥 开始缓存预热: {len(namespaces)} 个知识库")
+        try:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            async with self._create_client(token) as client:
+                await asyncio.gather(
+                    *(self._warm_namespace(client, namespace, semaphore) for namespace in namespaces)
+                )
+            self.state = "completed"
+            logger.info(f"✅ 缓存预热完成: 成功 {self.completed}，失败 {self.failed}")
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = str(e)
+            logger.error(f"❌ 缓存预热失败: {e}")
+        finally:
+            self.finished_at = time.time()
+            self._running = False
+        return True
+    
+    async def _fetch(self, semaphore: asyncio.Semaphore, call: Callable[[], Any]) -> Optional[Dict[str, Any]]:
+        """在并发上限内执行一次预取，失败只记录，不影响其他预取"""
+        self.total += 1
+        async with semaphore:
+            try:
+                result = await call()
+                self.completed += 1
+                return result
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+                logger.warning(f"⚠️ 缓存预热请求失败: {e}")
+                return None
+    
+    async def _warm_namespace(self, client: Any, namespace: str, semaphore: asyncio.Semaphore) -> None:
+        """预热单个知识库：详情、目录、文档列表，以及最近更新的文档"""
+        repo, docs = await asyncio.gather(
+            self._fetch(semaphore, lambda: client.get_repo(namespace)),
+            self._fetch(semaphore, lambda: client.list_docs(namespace))
+        )
+        
+        tasks = []
+        repo_id = ((repo or {}).get("data") or {}).get("id")
+        if repo_id is not None:
+            # 目录工具按知识库ID请求，预取相同的端点
+            tasks.append(self._fetch(semaphore, lambda: client.get_repo_toc(repo_id=repo_id)))
+        
+        doc_list = [doc for doc in (docs or {}).get("data") or [] if isinstance(doc, dict) and doc.get("slug")]
+        doc_list.sort(key=lambda doc: doc.get("updated_at") or "", reverse=True)
+        for doc in doc_list[:max(0, self.recent_docs)]:
+            tasks.append(self._fetch(semaphore, lambda slug=doc["slug"]: client.get_doc(namespace, slug)))
+        await asyncio.gather(*tasks)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取预热进度"""
+        return {
+            "state": self.state,
+            "namespaces": self.namespaces,
+            "targets": self.targets,
+            "run_count": self.run_count,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "interval": self.interval,
+            "last_error": self.last_error
+        }
@@ -48,6 +48,11 @@ DEFAULT_CORS_ORIGIN = CONFIG.get("DEFAULT_CORS_ORIGIN", "*")
 # 服务配置
 PORT = int(CONFIG.get("PORT", os.getenv("PORT", "3000")))
 
+# 缓存管理配置：HTTP 管理接口（/admin/cache/*）需要请求头 X-Admin-Token 与 CACHE_ADMIN_TOKEN 一致，未配置时不可用；
+# CACHE_ADMIN_TOOLS=true 时在 MCP 工具列表中提供缓存管理工具，调用时同样校验 X-Admin-Token
+CACHE_ADMIN_TOKEN = CONFIG.get("CACHE_ADMIN_TOKEN", "")
+CACHE_ADMIN_TOOLS = CONFIG.get("CACHE_ADMIN_TOOLS", "false").lower() == "true"
+
 # MCP 标准错误码扩展
 MCP_ERROR_CODES = {
     # JSON-RPC 2.0 标准错误码
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+缓存编解码器性能基准
+使用与语雀接口结构一致的数据（文档列表、文档详情），比较各编解码器和压缩算法的耗时与体积
+
+运行方式：python tests/bench_cache_codecs.py [重复次数]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ValueCompressor, get_codec, orjson, msgpack, zstd
+
+
+def build_doc_list(count: int = 2000) -> dict:
+    """构造 list_docs 的响应，结构与 GET /repos/{namespace}/docs 一致"""
+    return {
+        "data": [
+            {
+                "id": 100000 + i,
+                "type": "Doc",
+                "slug": f"doc-{i:05d}",
+                "title": f"产品需求文档 第{i}版",
+                "description": "本文档描述了语雀知识库同步功能的需求背景、方案设计与验收标准。",
+                "user_id": 42,
+                "book_id": 7,
+                "format": "lake",
+                "public": 0,
+                "status": 1,
+                "view_status": 0,
+                "read_status": 1,
+                "likes_count": i % 17,
+                "read_count": i * 3,
+                "comments_count": i % 5,
+                "word_count": 1200 + i,
+                "cover": None,
+                "created_at": "2024-01-01T08:00:00.000Z",
+                "updated_at": "2024-06-01T08:00:00.000Z",
+                "content_updated_at": "2024-06-01T08:00:00.000Z",
+                "published_at": "2024-06-01T08:00:00.000Z",
+                "first_published_at": "2024-01-01T08:00:00.000Z",
+                "last_editor": {"id": 42, "type": "User", "login": "yuque-user", "name": "语雀用户", "avatar_url": None},
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def build_doc(paragraphs: int = 300) -> dict:
+    """构造 get_doc 的响应，结构与 GET /repos/{namespace}/docs/{slug} 一致"""
+    body = "\n\n".join(
+        f"## 第{i}节\n\n语雀是一款专业的云端知识库，本段落用于模拟真实文档正文，包含 **Markdown** 格式与代码 `print({i})`。"
+        for i in range(paragraphs)
+    )
+    return {
+        "data": {
+            "id": 123456,
+            "slug": "design-doc",
+            "title": "缓存层设计文档",
+            "format": "markdown",
+            "body": body,
+            "body_html": "<div class=\"lake-content\">" + body.replace("\n\n", "</p><p>") + "</div>",
+            "word_count": len(body),
+            "created_at": "2024-01-01T08:00:00.000Z",
+            "updated_at": "2024-06-01T08:00:00.000Z",
+        }
+    }
+
+
+def bench(compressor: ValueCompressor, value: dict, rounds: int) -> tuple:
+    """返回 (每次编码毫秒数, 每次解码毫秒数, 编码后字节数)"""
+    data = compressor.encode(value)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        compressor.encode(value)
+    encode_ms = (time.perf_counter() - started) / rounds * 1000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        compressor.decode(data)
+    decode_ms = (time.perf_counter() - started) / rounds * 1000
+    return encode_ms, decode_ms, len(data)
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    payloads = {"list_docs(2000)": build_doc_list(), "get_doc": build_doc()}
+    codecs = ["json"] + [name for name, module in (("orjson", orjson), ("msgpack", msgpack)) if module]
+    algorithms = ["none", "zlib"] + (["zstd"] if zstd else [])
+
+    print(f"{'数据':<18}{'编解码器':<10}{'压缩':<8}{'编码(ms)':>10}{'解码(ms)':>10}{'大小(字节)':>12}")
+    for payload_name, value in payloads.items():
+        for codec_name in codecs:
+            for algorithm in algorithms:
+                compressor = ValueCompressor(algorithm=algorithm, threshold=1024, codec=get_codec(codec_name))
+                encode_ms, decode_ms, size = bench(compressor, value, rounds)
+                print(f"{payload_name:<18}{codec_name:<10}{algorithm:<8}{encode_ms:>10.3f}{decode_ms:>10.3f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
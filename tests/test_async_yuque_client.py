@@ -0,0 +1,99 @@
+import time
+import asyncio
+import unittest
+import httpx
+from unittest.mock import patch
+from async_yuque_client import AsyncYuqueMCPClient
+from cache import async_cache_manager
+
+
+class TestAsyncYuqueMCPClient(unittest.TestCase):
+    """测试异步语雀 API 客户端"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        async_cache_manager.sync_manager.clear()
+        self.calls = []
+        self.doc_key = "yuque:GET:/repos/test-user/test-repo/docs/test-doc"
+    
+    def create_client(self, token, handler):
+        """创建使用模拟传输层的客户端，handler 根据请求返回响应"""
+        async def record(request):
+            self.calls.append((request.headers["X-Auth-Token"], request.url.path))
+            return await handler(request)
+        
+        client = AsyncYuqueMCPClient(token)
+        client.client = httpx.AsyncClient(
+            headers=client.client.headers,
+            transport=httpx.MockTransport(record)
+        )
+        return client
+    
+    def test_coalesce_isolated_by_access(self):
+        """测试未证明有权访问知识库的Token不会共享其他租户进行中的请求结果"""
+        async def handler(request):
+            if request.headers["X-Auth-Token"] == "token-a":
+                await asyncio.sleep(0.05)
+                return httpx.Response(200, json={"data": {"id": 1, "body": "secret"}})
+            return httpx.Response(403, json={"message": "无权访问"})
+        
+        async def run():
+            async with self.create_client("token-a", handler) as client_a, self.create_client("token-b", handler) as client_b:
+                return await asyncio.gather(
+                    client_a.get_doc("a/private", "doc"),
+                    client_b.get_doc("a/private", "doc"),
+                    return_exceptions=True
+                )
+        
+        result_a, result_b = asyncio.run(run())
+        self.assertEqual(result_a["data"]["body"], "secret")
+        self.assertIsInstance(result_b, httpx.HTTPStatusError, "无权访问的Token不应得到其他租户的结果")
+        self.assertEqual(result_b.response.status_code, 403)
+        self.assertEqual(sorted(token for token, _ in self.calls), ["token-a", "token-b"])
+
+    
+    def prepare_stale_doc(self, list_age: float, doc_age: float):
+        """写入软过期的文档条目与未过期的文档列表，两者获取时间分别早于当前 list_age、doc_age 秒"""
+        manager = async_cache_manager.sync_manager
+        now = time.time()
+        manager.set("yuque:GET:/repos/test-user/test-repo/docs",
+                    {"data": [{"slug": "test-doc", "updated_at": "2024-01-01T00:00:00Z"}]}, expire=3600,
+                    meta={"fetched_at": now - list_age})
+        manager.set(self.doc_key, {"data": {"body": "旧内容"}}, expire=3600, soft_expire=1,
+                    meta={"validators": {"updated_at": "2024-01-01T00:00:00Z"}, "fetched_at": now - doc_age})
+        manager.grant_access("test-user/test-repo", AsyncYuqueMCPClient("token-a").tenant)
+        time.sleep(1.1)
+    
+    def get_stale_doc(self):
+        """读取软过期的文档，返回结果与是否安排了后台条件请求"""
+        async def handler(request):
+            return httpx.Response(500)
+        
+        async def run():
+            async with self.create_client("token-a", handler) as client:
+                return await client.get_doc("test-user/test-repo", "test-doc")
+        
+        with patch.object(async_cache_manager, "schedule_refresh") as schedule_refresh:
+            result = asyncio.run(run())
+        return result, schedule_refresh.called
+    
+    def test_revalidation_with_doc_list(self):
+        """测试晚于文档条目获取的文档列表中 updated_at 未变化时，直接续期"""
+        self.prepare_stale_doc(list_age=0, doc_age=60)
+        result, refreshed = self.get_stale_doc()
+        self.assertEqual(result["data"]["body"], "旧内容")
+        self.assertFalse(refreshed)
+        self.assertFalse(async_cache_manager.sync_manager.get_entry(self.doc_key).is_stale)
+        self.assertEqual(self.calls, [])
+    
+    def test_revalidation_ignores_older_doc_list(self):
+        """测试早于文档条目获取的文档列表不能用于续期，仍安排条件请求"""
+        self.prepare_stale_doc(list_age=60, doc_age=0)
+        result, refreshed = self.get_stale_doc()
+        self.assertEqual(result["data"]["body"], "旧内容")
+        self.assertTrue(refreshed)
+        self.assertTrue(async_cache_manager.sync_manager.get_entry(self.doc_key).is_stale)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
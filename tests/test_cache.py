@@ -4,10 +4,17 @@
 重点验证Redis缓存功能的正确性和性能
 """
 
+import os
+import json
+import zlib
 import time
+import asyncio
 import unittest
+import tempfile
 import threading
-from cache import CacheManager, generate_cache_key
+import multiprocessing
+from unittest.mock import patch, ANY
+from cache import CacheManager, AsyncCacheManager, MemoryCache, SqliteCache, ValueCompressor, AdaptiveTTL, JsonCodec, get_codec, generate_cache_key, get_request_cache_key, get_tenant_id, CACHE_KEY_MAX_LENGTH, get_cache_tags, get_dependent_tags, get_purge_tags, load_ttl_policies, get_endpoint_class, get_entry_ttl, get_body_key
 
 
 class TestCacheManager(unittest.TestCase):
@@ -16,9 +23,15 @@ class TestCacheManager(unittest.TestCase):
     def setUp(self):
         """设置测试环境"""
         self.cache_manager = CacheManager()
+        # 不启动后台连接与探测线程，使用本地缓存
+        self.cache_manager._connect_started = True
         # 清空缓存，确保测试环境干净
         self.cache_manager.clear()
     
+    def tearDown(self):
+        """停止缓存管理器的后台线程"""
+        self.cache_manager.close()
+    
     def test_cache_basic_operations(self):
         """测试缓存基本操作：设置、获取、删除"""
         # 测试数据
@@ -95,6 +108,182 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(stats["total_count"], 3, "总次数统计错误")
         self.assertEqual(stats["hit_rate"], 66.67, "命中率计算错误")
     
+    def test_endpoint_stats(self):
+        """测试按接口类型统计，以及多线程同时计数"""
+        self.cache_manager.set("test:doc", {"data": {}})
+        self.cache_manager.get_entry("test:doc", endpoint="/repos/owner/repo/docs/intro")
+        self.cache_manager.get_entry("test:missing", endpoint="/repos/owner/repo/docs")
+        
+        def lookup():
+            for _ in range(1000):
+                self.cache_manager.record_lookup(False, "tenant", "/search?q=cache")
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        endpoints = self.cache_manager.get_stats()["endpoints"]
+        self.assertEqual(endpoints["doc"]["hit_count"], 1)
+        self.assertEqual(endpoints["doc_list"]["miss_count"], 1)
+        self.assertEqual(endpoints["search"]["miss_count"], 8000)
+        self.assertEqual(self.cache_manager.miss_count, 8001)
+        self.assertEqual(self.cache_manager.tenant_stats["tenant"]["miss_count"], 8000)
+    
+    def test_aggregated_stats(self):
+        """测试根据Redis哈希内容计算各worker的汇总统计"""
+        counters = {
+            b"total:hit_count": b"30", b"total:miss_count": b"10", b"total:refresh_count": b"2",
+            b"doc:hit_count": b"20", b"doc:miss_count": b"5", b"user:hit_count": b"10"
+        }
+        now = time.time()
+        workers = {b"worker-a": str(now).encode(), b"worker-b": str(now - 3600).encode()}
+        result = self.cache_manager._build_aggregated_stats(counters, workers)
+        self.assertEqual(result["workers"], 1, "长时间未上报的worker不应计入")
+        self.assertEqual(result["hit_count"], 30)
+        self.assertEqual(result["hit_rate"], 75.0)
+        self.assertEqual(result["refresh_count"], 2)
+        self.assertEqual(result["endpoints"]["doc"]["hit_rate"], 80.0)
+        self.assertEqual(result["endpoints"]["user"]["miss_count"], 0)
+        
+        # 汇总时删除已退出worker的上报时间
+        from unittest.mock import MagicMock
+        manager = CacheManager()
+        manager._connect_started = True
+        manager.stats_aggregate = True
+        client = MagicMock()
+        with manager._breaker_lock:
+            manager._redis = manager.redis_client = client
+            manager._transition("closed", "测试")
+        client.pipeline.return_value.execute.side_effect = [[], [counters, workers]]
+        self.assertEqual(manager.get_aggregated_stats()["workers"], 1)
+        client.hdel.assert_called_once_with("yuque:stats:workers", b"worker-b")
+        manager.stats_aggregate = False
+        manager.close()
+    
+    def test_get_many_set_many(self):
+        """测试批量读写缓存"""
+        self.cache_manager.set_many([
+            {"key": "test:many:1", "value": {"v": 1}, "tags": ["many"]},
+            {"key": "test:many:2", "value": {"v": 2}, "soft_expire": 60, "meta": {"size": 10}}
+        ])
+        entries = self.cache_manager.get_many(
+            ["test:many:1", "test:many:2", "test:many:3"],
+            endpoints={"test:many:1": "/user"}
+        )
+        self.assertEqual(entries["test:many:1"].value, {"v": 1})
+        self.assertEqual(entries["test:many:2"].meta["size"], 10)
+        self.assertIsNone(entries["test:many:3"])
+        stats = self.cache_manager.get_stats()
+        self.assertEqual((stats["hit_count"], stats["miss_count"]), (2, 1))
+        self.assertEqual(stats["endpoints"]["user"]["hit_count"], 1)
+        
+        self.cache_manager.invalidate_tags(["many"])
+        self.assertIsNone(self.cache_manager.get("test:many:1"))
+    
+    def test_redis_circuit_breaker(self):
+        """测试Redis连续失败后切换到本地缓存，探测成功后重放失效操作并切回Redis"""
+        import redis
+        from unittest.mock import MagicMock
+        # 不启动后台连接与探测，由测试直接调用 probe_redis
+        manager = CacheManager()
+        manager._connect_started = True
+        manager.redis_probe_interval = 60
+        client = MagicMock()
+        client.get.side_effect = redis.ConnectionError("连接被拒绝")
+        client.ping.side_effect = redis.ConnectionError("连接被拒绝")
+        with manager._breaker_lock:
+            manager._redis = manager.redis_client = client
+            manager._transition("closed", "测试")
+        
+        # 达到失败阈值后打开熔断，之后的读写使用本地缓存
+        for _ in range(manager.redis_failure_threshold):
+            self.assertIsNone(manager.get("test:breaker"))
+        self.assertIsNone(manager.redis_client)
+        self.assertEqual(manager.get_redis_status()["state"], "open")
+        manager.set("test:breaker", "本地")
+        self.assertEqual(manager.get("test:breaker"), "本地")
+        self.assertEqual(client.get.call_count, manager.redis_failure_threshold, "熔断期间不应再访问Redis")
+        
+        # 熔断期间的失效操作在Redis恢复后重放
+        manager.invalidate_tags(["doc:1"])
+        self.assertFalse(manager.probe_redis())
+        client.ping.side_effect = None
+        client.pipeline.return_value.execute.return_value = [[], set(), 0]
+        self.assertTrue(manager.probe_redis())
+        self.assertIs(manager.redis_client, client)
+        client.pipeline.return_value.zrangebyscore.assert_called_with("yuque:tags:doc:1", ANY, "+inf")
+        
+        status = manager.get_stats()["redis"]
+        self.assertEqual(status["state"], "closed")
+        self.assertEqual([t["to"] for t in status["transitions"][-3:]], ["open", "half_open", "closed"])
+        self.assertIn("open", status["time_in_state"])
+        self.assertEqual(status["pending_invalidations"], 0)
+        manager.close()
+    
+    def test_redis_tag_registration(self):
+        """测试Redis标签按过期时间登记成员，并在登记时删除已过期的成员"""
+        from unittest.mock import MagicMock
+        manager = CacheManager()
+        manager._connect_started = True
+        client = MagicMock()
+        with manager._breaker_lock:
+            manager._redis = manager.redis_client = client
+            manager._transition("closed", "测试")
+        pipe = client.pipeline.return_value
+        before = time.time()
+        manager.set("yuque:tagged", {"a": 1}, expire=60, tags=["search"])
+        (tag_key, members), _ = pipe.zadd.call_args
+        self.assertEqual(tag_key, "yuque:tags:search")
+        self.assertAlmostEqual(members["yuque:tagged"], before + 60, delta=5)
+        tag_key, low, high = pipe.zremrangebyscore.call_args[0]
+        self.assertEqual((tag_key, low), ("yuque:tags:search", "-inf"))
+        self.assertAlmostEqual(high, before, delta=5)
+        manager.set("yuque:forever", {"a": 1}, expire=None, tags=["search"])
+        self.assertEqual(pipe.zadd.call_args[0][1], {"yuque:forever": float("inf")})
+        manager.close()
+    
+    def test_redis_recovery_overflow(self):
+        """测试熔断期间积压的失效操作过多时，恢复后只删除本服务的键，不清空整个数据库"""
+        from unittest.mock import MagicMock
+        manager = CacheManager()
+        manager._connect_started = True
+        manager.redis_max_pending_invalidations = 2
+        client = MagicMock()
+        client.scan_iter.return_value = iter([b"yuque:a", b"yuque:b"])
+        with manager._breaker_lock:
+            manager._redis = client
+            manager._transition("open", "测试")
+        for i in range(3):
+            manager.delete(f"test:overflow:{i}")
+        self.assertEqual(manager.get_redis_status()["pending_invalidations"], 1)
+        
+        self.assertTrue(manager.probe_redis())
+        client.flushdb.assert_not_called()
+        client.scan_iter.assert_called_once_with(match="yuque:*", count=500)
+        client.unlink.assert_called_once_with(b"yuque:a", b"yuque:b")
+        manager.close()
+    
+    def test_schedule_refresh_bounded(self):
+        """测试后台刷新在线程池中执行，排队的键过多时跳过刷新"""
+        manager = CacheManager()
+        manager.refresh_max_pending = 1
+        started, release = threading.Event(), threading.Event()
+        
+        def fetch():
+            started.set()
+            release.wait(5)
+        
+        manager.schedule_refresh("test:refresh:1", fetch)
+        self.assertTrue(started.wait(5))
+        manager.schedule_refresh("test:refresh:2", lambda: self.fail("排队的键过多时不应刷新"))
+        self.assertEqual(manager.refresh_count, 1)
+        release.set()
+        manager.close()
+        manager.refresh_max_pending = 10
+        manager.schedule_refresh("test:refresh:3", lambda: self.fail("关闭后不应刷新"))
+        self.assertEqual(manager.refresh_count, 1)
+    
     def test_cache_key_generation(self):
         """测试缓存键生成函数"""
         # 测试基本键生成
@@ -109,6 +298,273 @@ class TestCacheManager(unittest.TestCase):
         key3 = generate_cache_key("yuque", "search", q="test", page=1, per_page=20)
         self.assertEqual(key3, "yuque:search:page=1:per_page=20:q=test", "参数排序错误")
     
+    def test_request_key_normalization(self):
+        """测试请求缓存键的规范化与超长键的哈希"""
+        token = "token-a"
+        # 查询参数顺序、写在端点中还是通过params传入，都得到同一个键
+        key1 = get_request_cache_key("get", "/search?type=doc&q=a", token)
+        key2 = get_request_cache_key("GET", "/search/", token, params={"q": "a", "type": "doc"})
+        self.assertEqual(key1, key2, "语义相同的请求应得到相同的缓存键")
+        self.assertNotEqual(key1, get_request_cache_key("GET", "/search", token, params={"q": "b", "type": "doc"}))
+        
+        # 已有的键格式保持不变
+        self.assertEqual(get_request_cache_key("GET", "/repos/a/b/docs/doc1", token, params={"raw": 1}),
+                         "yuque:GET:/repos/a/b/docs/doc1?raw=1")
+        
+        # 超长的键截断为固定长度，保留可读前缀
+        long_query = "x" * 1000
+        long_key = get_request_cache_key("GET", "/search", token, params={"q": long_query})
+        self.assertEqual(len(long_key), CACHE_KEY_MAX_LENGTH)
+        self.assertTrue(long_key.startswith(f"yuque:tenant:{get_tenant_id(token)}:GET:/search?"))
+        self.assertNotEqual(long_key, get_request_cache_key("GET", "/search", token, params={"q": long_query + "y"}))
+    
+    def test_dependent_tags_invalidation(self):
+        """测试按依赖表和标签失效写操作影响的缓存条目"""
+        def cache(endpoint, value):
+            tags = get_cache_tags(endpoint, token="token-a", result=value)
+            self.cache_manager.set(f"yuque:GET:{endpoint}", value, tags=tags)
+        
+        cache("/repos/a/b/docs", {"data": []})
+        cache("/repos/a/b/docs/doc1", {"data": {"id": 1}})
+        cache("/repos/a/b/docs/doc1?raw=1", {"data": {"id": 1}})
+        cache("/repos/a/b/docs/doc10", {"data": {"id": 10}})
+        cache("/repos/a/c/docs", {"data": []})
+        
+        self.cache_manager.invalidate_tags(get_dependent_tags("doc", repo="a/b", doc_id=1, slug=None))
+        
+        self.assertIsNone(self.cache_manager.get("yuque:GET:/repos/a/b/docs"))
+        self.assertIsNone(self.cache_manager.get("yuque:GET:/repos/a/b/docs/doc1"))
+        self.assertIsNone(self.cache_manager.get("yuque:GET:/repos/a/b/docs/doc1?raw=1"))
+        self.assertIsNotNone(self.cache_manager.get("yuque:GET:/repos/a/b/docs/doc10"), "不相关文档不应被失效")
+        self.assertIsNotNone(self.cache_manager.get("yuque:GET:/repos/a/c/docs"), "其他知识库不应被失效")
+    
+    def test_cache_tags(self):
+        """测试缓存标签生成"""
+        self.assertEqual(
+            get_cache_tags("/repos/a/b/docs/doc1?raw=1", result={"data": {"id": 7}}),
+            ["repo:a/b", "doc:a/b/doc1", "doc_id:7"]
+        )
+        self.assertEqual(get_cache_tags("/repos/12/toc"), ["repo:12", "toc:12"])
+        self.assertEqual(get_cache_tags("/groups/g/statistics/members"), ["group:g", "group_stats:g"])
+        self.assertEqual(get_cache_tags("/doc_versions", params={"doc_id": 3}), ["doc_id:3"])
+        self.assertTrue(get_cache_tags("/user", token="secret")[0].startswith("token:"))
+        self.assertNotIn("secret", get_cache_tags("/user", token="secret")[0], "Token不应明文出现在标签中")
+    
+    def test_ttl_policies(self):
+        """测试按接口类型配置软/硬过期时间"""
+        policies = load_ttl_policies({"CACHE_TTL_DOC": "600,86400", "CACHE_TTL_SEARCH": "300", "CACHE_TTL_USER": "bad"})
+        self.assertEqual(policies["doc"], (600, 86400))
+        self.assertEqual(policies["search"], (300, 300), "仅配置软过期时硬过期应与其相同")
+        self.assertEqual(policies["user"], (43200, 86400), "无效配置应使用默认值")
+    
+    def test_immutable_ttl(self):
+        """测试文档的历史版本按不可变资源缓存，版本列表仍按默认策略"""
+        self.assertEqual(get_endpoint_class("/doc_versions/9"), "doc_version")
+        self.assertEqual(get_entry_ttl("/doc_versions/9", {"data": {}}), {"soft": None, "hard": 2592000, "source": "immutable"})
+        with patch("cache.IMMUTABLE_TTL", 0):
+            self.assertEqual(get_entry_ttl("/doc_versions/9", {"data": {}})["hard"], None, "0 表示永不过期")
+        self.assertEqual(get_entry_ttl("/doc_versions?doc_id=1", {"data": []})["source"], "policy")
+        self.cache_manager.set("test:immutable", {"a": 1}, expire=None)
+        self.assertEqual(self.cache_manager.inspect("test:immutable")["remaining"], -1)
+    
+    def test_adaptive_ttl(self):
+        """测试按文档修改频率推算过期时间，并限制在上下限之间"""
+        policy = AdaptiveTTL(min_ttl=60, max_ttl=86400, factor=0.1)
+        now = time.time()
+        
+        def iso(ts):
+            return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts))
+        
+        # 刚修改过的文档使用下限
+        soft, hard, source = policy.get_ttl("/repos/a/b/docs/hot", {"data": {"slug": "hot", "updated_at": iso(now - 5)}})
+        self.assertEqual((soft, source), (60, "adaptive"))
+        self.assertGreaterEqual(hard, soft)
+        # 一年未修改的文档使用上限，但不超过默认策略的硬过期
+        cold = {"data": {"slug": "cold", "updated_at": iso(now - 365 * 86400)}}
+        self.assertEqual(policy.get_ttl("/repos/a/b/docs/cold", cold), (10800, 10800, "adaptive"))
+        self.assertEqual(AdaptiveTTL(min_ttl=60, max_ttl=3600, factor=0.1).get_ttl("/repos/a/b/docs/cold", cold), (3600, 7200, "adaptive"))
+        # 文档列表按其中修改最频繁的文档推算
+        docs = {"data": [{"slug": "x", "updated_at": iso(now - 3600)}, {"slug": "y", "updated_at": iso(now - 30 * 86400)}]}
+        soft, _, _ = policy.get_ttl("/repos/a/b/docs", docs)
+        self.assertAlmostEqual(soft, 360, delta=2)
+        # 多次修改记录：按平均修改间隔推算
+        policy.observe("/repos/a/b/docs/x", {"data": {"slug": "x", "updated_at": iso(now - 7200)}})
+        soft, _, _ = policy.get_ttl("/repos/a/b/docs/x", {"data": {"slug": "x", "updated_at": iso(now - 10)}})
+        self.assertAlmostEqual(soft, 359, delta=2)
+        # 没有 updated_at 时使用默认策略
+        self.assertEqual(policy.get_ttl("/repos/a/b/docs/z", {"data": {}})[2], "policy")
+        self.assertEqual(policy.get_ttl("/user", {"data": {}})[2], "policy")
+    
+    def test_inspect(self):
+        """测试查看条目写入时的过期时间"""
+        ttl = {"soft": 60, "hard": 120, "source": "adaptive"}
+        self.cache_manager.set("test:inspect", {"a": 1}, expire=120, soft_expire=60, meta={"ttl": ttl})
+        info = self.cache_manager.inspect("test:inspect")
+        self.assertEqual(info["ttl"], ttl)
+        self.assertGreater(info["remaining"], 100)
+        self.assertFalse(info["stale"])
+        self.assertIsNone(self.cache_manager.inspect("test:missing"))
+    
+    def test_hot_keys(self):
+        """测试按命中次数和大小列出最热的键，已删除的键不再列出"""
+        self.cache_manager.set("test:hot:small", "x", expire=120)
+        self.cache_manager.set("test:hot:large", "x" * 1000)
+        for _ in range(3):
+            self.cache_manager.get("test:hot:small")
+        self.cache_manager.get_many(["test:hot:large", "test:hot:missing"])
+        self.cache_manager.get_entry("test:hot:large", record=False)
+        
+        keys = self.cache_manager.get_hot_keys()
+        self.assertEqual([(row["key"], row["hits"]) for row in keys], [("test:hot:small", 3), ("test:hot:large", 1)])
+        self.assertGreater(keys[0]["remaining"], 100)
+        self.assertEqual(self.cache_manager.get_hot_keys(limit=1, sort="size")[0]["key"], "test:hot:large")
+        
+        self.cache_manager.delete("test:hot:small")
+        self.assertEqual([row["key"] for row in self.cache_manager.get_hot_keys()], ["test:hot:large"])
+        self.assertNotIn("test:hot:small", self.cache_manager.key_hits, "已删除的键不应继续跟踪")
+    
+    def test_hot_keys_bounded(self):
+        """测试跟踪的键数量有上限，超出时保留命中较多的键"""
+        self.cache_manager.hot_keys_limit = 4
+        for i in range(4):
+            for _ in range(i + 1):
+                self.cache_manager.record_lookup(True, key=f"k{i}")
+        self.cache_manager.record_lookup(True, key="new")
+        self.assertEqual(set(self.cache_manager.key_hits), {"k2", "k3", "new"})
+    
+    def test_close(self):
+        """测试关闭后探测线程退出，且不再自动连接Redis"""
+        manager = CacheManager()
+        manager.redis_probe_interval = 60
+        manager._redis = object()
+        manager._start_prober(delay=60)
+        prober = manager._prober
+        manager.close()
+        prober.join(timeout=1)
+        self.assertFalse(prober.is_alive(), "关闭后探测线程应退出")
+        self.assertIsNone(manager.redis_client)
+        self.assertEqual(manager.redis_state, "disabled")
+        manager.close()
+    
+    def test_body_dedup(self):
+        """测试相同的文档正文只存储一次，条目通过内容哈希引用正文"""
+        self.cache_manager.body_dedup = True
+        self.cache_manager.body_min_size = 10
+        body = "正文内容" * 10
+        doc = {"data": {"id": 1, "title": "文档", "body": body, "body_html": "<p>短</p>"}}
+        self.cache_manager.set("test:doc", doc, meta={"size": 100})
+        self.cache_manager.set("test:doc:raw", {"data": {"id": 1, "body": body}})
+        self.assertEqual(doc["data"]["body"], body, "不应修改传入的值")
+        
+        raw = self.cache_manager.memory_cache.get("test:doc")
+        self.assertNotIn("body", raw["value"]["data"])
+        self.assertEqual(raw["value"]["data"]["body_html"], "<p>短</p>", "较短的正文应保留在条目中")
+        digest = raw["meta"]["bodies"]["body"]
+        self.assertEqual(self.cache_manager.memory_cache.get("test:doc:raw")["meta"]["bodies"]["body"], digest)
+        self.assertEqual(self.cache_manager.memory_cache.get(get_body_key(digest)), body)
+        
+        entry = self.cache_manager.get_entry("test:doc")
+        self.assertEqual(entry.value, doc)
+        self.assertEqual(entry.meta, {"size": 100})
+        entries = self.cache_manager.get_many(["test:doc", "test:doc:raw", "test:missing"])
+        self.assertEqual(entries["test:doc:raw"].value["data"]["body"], body)
+        self.assertIsNone(entries["test:missing"])
+        
+        # 正文被淘汰后，引用它的条目按未命中处理
+        self.cache_manager.memory_cache.delete(get_body_key(digest))
+        self.assertIsNone(self.cache_manager.get("test:doc"))
+        self.assertEqual(self.cache_manager.get_many(["test:doc:raw"]), {"test:doc:raw": None})
+    
+    def test_body_dedup_ttl(self):
+        """测试正文的过期时间只延长不缩短、不超过上限，正文字节计入写入者的份额"""
+        self.cache_manager.body_dedup = True
+        self.cache_manager.body_min_size = 10
+        self.cache_manager.body_max_ttl = 7200
+        body = "正文内容" * 10
+        self.cache_manager.set("test:doc", {"data": {"body": body}}, expire=3600, tenant="a")
+        digest = self.cache_manager.memory_cache.get("test:doc")["meta"]["bodies"]["body"]
+        body_key = get_body_key(digest)
+        self.assertGreater(self.cache_manager.memory_cache.owner_bytes["a"], self.cache_manager.memory_cache.size("test:doc"))
+        
+        self.cache_manager.set("test:doc:raw", {"data": {"body": body}}, expire=60, tenant="b")
+        self.assertGreater(self.cache_manager.memory_cache.ttl(body_key), 3500, "较短的条目不应缩短正文的过期时间")
+        self.cache_manager.set("test:version", {"data": {"body": body}}, expire=None)
+        self.assertGreater(self.cache_manager.memory_cache.ttl(body_key), 7100)
+        self.assertLessEqual(self.cache_manager.memory_cache.ttl(body_key), 7200, "正文的过期时间不应超过上限")
+    
+    def test_body_dedup_expire_fallback(self):
+        """测试Redis 7.0 以下不使用 EXPIRE GT，先读取正文的过期时间，只延长较短的正文"""
+        from unittest.mock import MagicMock
+        manager = CacheManager()
+        manager._connect_started = True
+        manager.body_dedup = True
+        manager.body_min_size = 10
+        client = MagicMock()
+        with manager._breaker_lock:
+            manager._redis = manager.redis_client = client
+            manager._transition("closed", "测试")
+        pipe = client.pipeline.return_value
+        
+        client.info.return_value = {"redis_version": "6.2.14"}
+        manager._detect_expire_gt()
+        self.assertFalse(manager.expire_gt)
+        pipe.execute.side_effect = [[True, True], [60], [True]]
+        manager.set("yuque:doc", {"data": {"body": "正文内容" * 10}}, expire=3600)
+        body_key = pipe.set.call_args_list[-1][0][0]
+        self.assertTrue(body_key.startswith("yuque:body:"))
+        pipe.ttl.assert_called_once_with(body_key)
+        pipe.expire.assert_called_once_with(body_key, 3600)
+        
+        client.info.return_value = {"redis_version": "7.2.4"}
+        manager._detect_expire_gt()
+        self.assertTrue(manager.expire_gt)
+        pipe.reset_mock()
+        pipe.execute.side_effect = None
+        manager.set("yuque:doc", {"data": {"body": "正文内容" * 10}}, expire=3600)
+        pipe.expire.assert_called_once_with(body_key, 3600, gt=True)
+        pipe.ttl.assert_not_called()
+        manager.close()
+    
+    def test_purge(self):
+        """测试按知识库、文档、团队和Token清除缓存"""
+        def cache(endpoint, token=None):
+            key = get_request_cache_key("GET", endpoint, token)
+            self.cache_manager.set(key, {"data": {}}, tags=get_cache_tags(endpoint, token=token))
+            return key
+        
+        doc = cache("/repos/a/b/docs/doc1")
+        other_doc = cache("/repos/a/b/docs/doc2")
+        repo = cache("/repos/a/c")
+        group = cache("/groups/g/users")
+        private = cache("/user", token="token-a")
+        
+        self.assertEqual(self.cache_manager.purge(namespace="a/b", doc="doc1"), ["doc:a/b/doc1"])
+        self.assertIsNone(self.cache_manager.get(doc))
+        self.assertIsNotNone(self.cache_manager.get(other_doc), "同一知识库的其他文档不应被清除")
+        
+        self.cache_manager.purge(namespace="a/c", group="g")
+        self.assertIsNone(self.cache_manager.get(repo))
+        self.assertIsNone(self.cache_manager.get(group))
+        
+        self.cache_manager.purge(tenant=get_tenant_id("token-a"))
+        self.assertIsNone(self.cache_manager.get(private))
+        self.assertIsNotNone(self.cache_manager.get(other_doc))
+        
+        self.assertEqual(get_purge_tags(token="token-a"), get_purge_tags(tenant=get_tenant_id("token-a")))
+        self.assertEqual(get_purge_tags(namespace="a/b", doc="12"), ["doc:a/b/12", "doc_id:12"])
+        self.assertEqual(get_purge_tags(namespace="a/b", repo_id=7), ["repo:a/b", "repo:7"])
+        
+        # 以命名空间清除时，按缓存的知识库信息一并清除以数字ID缓存的条目
+        by_id = cache("/repos/7/docs/doc3")
+        self.cache_manager.set(get_request_cache_key("GET", "/repos/a/b", None), {"data": {"id": 7, "namespace": "a/b"}})
+        self.assertEqual(self.cache_manager.purge(namespace="a/b"), ["repo:a/b", "repo:7"])
+        self.assertIsNone(self.cache_manager.get(by_id))
+        self.assertIsNone(self.cache_manager.get(other_doc))
+        with self.assertRaises(ValueError):
+            get_purge_tags(doc="doc1")
+        with self.assertRaises(ValueError):
+            self.cache_manager.purge()
+    
     def test_cache_clear(self):
         """测试清空缓存功能"""
         # 设置多个缓存项
@@ -222,11 +678,379 @@ class TestCacheManager(unittest.TestCase):
         result = self.cache_manager.get("test:invalid")
         # 应该返回None或抛出异常，但不应导致程序崩溃
     
+    def test_l1_invalidation_message(self):
+        """测试L1缓存按失效通知删除条目，忽略自身发出的通知"""
+        self.cache_manager.l1_cache = MemoryCache()
+        self.cache_manager._set_l1("yuque:GET:/repos/a/b", {"v": 1}, 3600)
+        self.cache_manager._set_l1("yuque:GET:/repos/a/b/docs", {"v": 2}, 3600)
+        
+        # 自身发出的通知不重复处理
+        own = self.cache_manager._build_invalidation("key", "yuque:GET:/repos/a/b")
+        self.cache_manager._apply_invalidation(own)
+        self.assertIsNotNone(self.cache_manager.l1_cache.get("yuque:GET:/repos/a/b"))
+        
+        # 其他worker发出的通知
+        other = json.dumps({"origin": "other", "type": "pattern", "value": "yuque:GET:/repos/a/b*"})
+        self.cache_manager._apply_invalidation(other.encode())
+        self.assertEqual(len(self.cache_manager.l1_cache), 0, "L1条目未按通知失效")
+    
     def tearDown(self):
         """清理测试环境"""
         # 清空缓存
         self.cache_manager.clear()
 
 
+class TestMemoryCache(unittest.TestCase):
+    """测试进程内缓存后端"""
+    
+    def test_lru_eviction_by_entries(self):
+        """测试超出条目数上限时按LRU淘汰"""
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # 访问a，使b成为最久未使用
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        
+        self.assertIsNone(cache.get("b"), "最久未使用的条目应被淘汰")
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.get_stats()["eviction_count"], 1)
+    
+    def test_eviction_by_bytes(self):
+        """测试超出字节数上限时淘汰"""
+        cache = MemoryCache(max_entries=100, max_bytes=250)
+        for i in range(5):
+            cache.set(f"doc:{i}", "x" * 100)
+        
+        stats = cache.get_stats()
+        self.assertLessEqual(stats["bytes"], 250, "字节数超出上限")
+        self.assertEqual(stats["entries"], 2)
+        self.assertIsNotNone(cache.get("doc:4"))
+        self.assertIsNone(cache.get("doc:0"))
+    
+    def test_entry_expire(self):
+        """测试条目过期并计入过期统计"""
+        cache = MemoryCache()
+        cache.set("short", {"v": 1}, expire=1)
+        cache.set("long", {"v": 2})
+        time.sleep(1.1)
+        
+        self.assertIsNone(cache.get("short"), "条目未按时过期")
+        self.assertEqual(cache.get("long"), {"v": 2})
+        self.assertEqual(cache.get_stats()["expiration_count"], 1)
+        self.assertEqual(len(cache), 1)
+    
+    def test_gdsf_eviction(self):
+        """测试 gdsf 策略下大文档先于小而热的条目被淘汰，并按分类统计字节数"""
+        cache = MemoryCache(max_entries=1000, max_bytes=5000, policy="gdsf")
+        for i in range(20):
+            cache.set(f"user:{i}", "u" * 100, category="user")
+        for _ in range(3):
+            for i in range(20):
+                cache.get(f"user:{i}")
+        cache.set("doc:big", "d" * 2500, category="doc")
+        cache.set("doc:other", "d" * 2500, category="doc")
+        
+        self.assertTrue(all(cache.get(f"user:{i}") is not None for i in range(20)), "小而热的条目不应被大文档挤掉")
+        self.assertIsNone(cache.get("doc:big"))
+        stats = cache.get_stats()
+        self.assertEqual(stats["policy"], "gdsf")
+        self.assertLessEqual(stats["bytes"], 5000)
+        self.assertLessEqual(stats["peak_bytes"], 5000)
+        self.assertEqual(stats["categories"]["user"]["bytes"], 20 * 102)
+        self.assertEqual(stats["categories"]["user"]["evicted_bytes"], 0)
+        self.assertEqual(stats["categories"]["doc"]["evicted_bytes"], 2502)
+        self.assertEqual(stats["categories"]["doc"]["peak_bytes"], 2502)
+    
+    def test_owner_quota(self):
+        """测试单个写入者超出份额时只淘汰自己的条目"""
+        cache = MemoryCache(max_entries=100, max_bytes=10000, max_owner_bytes=300)
+        cache.set("quiet", "x" * 100, owner="tenant-a")
+        for i in range(10):
+            cache.set(f"noisy:{i}", "y" * 100, owner="tenant-b")
+        self.assertIsNotNone(cache.get("quiet"), "其他租户的条目不应被淘汰")
+        self.assertIsNotNone(cache.get("noisy:9"))
+        self.assertIsNone(cache.get("noisy:0"))
+        self.assertLessEqual(cache.owner_bytes["tenant-b"], 300)
+        cache.delete("quiet")
+        self.assertNotIn("tenant-a", cache.owner_bytes)
+    
+    def test_delete_tag(self):
+        """测试按标签删除，并在条目被淘汰后清理标签索引"""
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1, tags=["repo:x"])
+        cache.set("b", 2, tags=["repo:x", "doc:x/b"])
+        cache.set("c", 3, tags=["repo:y"])
+        
+        # a 已被淘汰，标签索引中不应残留
+        self.assertEqual(cache.delete_tag("repo:x"), ["b"])
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.get_stats()["tags"], 1)
+    
+    def test_delete_pattern_glob(self):
+        """测试按glob模式删除"""
+        cache = MemoryCache()
+        cache.set("yuque:GET:/repos/a/b/docs", 1)
+        cache.set("yuque:GET:/repos/a/b", 2)
+        cache.set("yuque:GET:/user", 3)
+        
+        self.assertEqual(cache.delete_pattern("yuque:GET:/repos/a/b*"), 2)
+        self.assertEqual(cache.get("yuque:GET:/user"), 3)
+
+
+def _write_sqlite(path, worker):
+    """子进程写入磁盘缓存"""
+    cache = SqliteCache(path)
+    for i in range(100):
+        cache.set(f"worker:{worker}:{i}", {"worker": worker, "i": i}, tags=[f"worker:{worker}"])
+
+
+class TestSqliteCache(unittest.TestCase):
+    """测试磁盘缓存后端"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.db")
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_persistence(self):
+        """测试重新打开数据库后缓存仍然存在"""
+        cache = SqliteCache(self.path)
+        cache.set("key", {"data": "值"}, expire=60, tags=["tag"])
+        cache = SqliteCache(self.path)
+        self.assertEqual(cache.get("key"), {"data": "值"})
+        self.assertEqual(cache.delete_tag("tag"), ["key"])
+        self.assertIsNone(cache.get("key"))
+    
+    def test_expire(self):
+        """测试条目过期"""
+        cache = SqliteCache(self.path)
+        cache.set("key", "value", expire=1)
+        self.assertGreater(cache.ttl("key"), 0)
+        time.sleep(1.1)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.expiration_count, 1)
+    
+    def test_eviction(self):
+        """测试超出条目数和字节数上限时按访问时间淘汰"""
+        cache = SqliteCache(self.path, max_entries=3, max_bytes=10000)
+        for i in range(5):
+            cache.set(f"key:{i}", i)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get("key:0"))
+        self.assertEqual(cache.get("key:4"), 4)
+        
+        cache = SqliteCache(os.path.join(self.tmpdir.name, "owner.db"), max_owner_bytes=300)
+        cache.set("quiet", "x" * 100, owner="tenant-a")
+        for i in range(10):
+            cache.set(f"noisy:{i}", "y" * 100, owner="tenant-b")
+        self.assertIsNotNone(cache.get("quiet"), "其他租户的条目不应被淘汰")
+        self.assertLessEqual(cache.owner_bytes["tenant-b"], 300)
+    
+    def test_running_totals(self):
+        """测试累计条目数与字节数在各种写入和删除后与实际数据一致"""
+        cache = SqliteCache(self.path, max_entries=5, max_owner_bytes=300)
+        for i in range(8):
+            cache.set(f"key:{i}", "x" * (10 * i), expire=1 if i % 2 else None, tags=["tag"] if i < 3 else [], owner=f"tenant-{i % 2}")
+        cache.set("key:7", "y", owner="tenant-1")
+        cache.delete("key:6")
+        cache.delete_tag("tag")
+        time.sleep(1.1)
+        cache.set("key:8", "z", owner="tenant-0")
+        
+        conn = cache._connect()
+        actual = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        self.assertEqual(tuple(cache._totals(conn)), tuple(actual))
+        owners = dict(conn.execute("SELECT owner, SUM(size) FROM entries WHERE owner IS NOT NULL GROUP BY owner").fetchall())
+        self.assertEqual(cache.owner_bytes, owners)
+        
+        cache.clear()
+        self.assertEqual(tuple(cache._totals(cache._connect())), (0, 0))
+        self.assertEqual(cache.owner_bytes, {})
+    
+    def test_category_stats(self):
+        """测试按分类统计当前、峰值与被淘汰的字节数"""
+        cache = SqliteCache(self.path, max_bytes=250)
+        cache.set("doc:1", "x" * 100, category="doc")
+        cache.set("doc:2", "x" * 100, category="doc")
+        cache.set("user:1", "u" * 100, category="user")
+        categories = cache.get_stats()["categories"]
+        self.assertEqual(categories["doc"]["bytes"], 102)
+        self.assertEqual(categories["doc"]["evicted_bytes"], 102)
+        self.assertEqual(categories["user"]["bytes"], 102)
+        self.assertLessEqual(cache.get_stats()["peak_bytes"], 250)
+    
+    def test_delete_pattern(self):
+        """测试按glob模式删除"""
+        cache = SqliteCache(self.path)
+        cache.set("yuque:a:1", 1)
+        cache.set("yuque:a:2", 2)
+        cache.set("yuque:b:1", 3)
+        self.assertEqual(cache.delete_pattern("yuque:a:*"), 2)
+        self.assertEqual(cache.get("yuque:b:1"), 3)
+    
+    def test_multiple_processes(self):
+        """测试多个进程同时写入同一个数据库"""
+        SqliteCache(self.path)
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_write_sqlite, args=(self.path, worker)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+        cache = SqliteCache(self.path)
+        self.assertEqual(len(cache), 400)
+        self.assertEqual(len(cache.delete_tag("worker:2")), 100)
+
+
+class TestValueCompressor(unittest.TestCase):
+    """测试缓存值压缩"""
+    
+    def test_compress_large_value(self):
+        """测试超过阈值的值被压缩，并可以正确还原"""
+        compressor = ValueCompressor(algorithm="zlib", threshold=100)
+        value = {"data": {"body": "语雀文档正文" * 200}}
+        data = compressor.encode(value)
+        self.assertTrue(data.startswith(b"\x00zlib:"))
+        self.assertEqual(compressor.decode(data), value)
+        stats = compressor.get_stats()
+        self.assertEqual(stats["compress_count"], 1)
+        self.assertEqual(stats["decompress_count"], 1)
+        self.assertLess(stats["ratio"], 0.5)
+    
+    def test_small_and_legacy_values(self):
+        """测试小于阈值的值以及旧的未压缩条目按JSON读取"""
+        compressor = ValueCompressor(algorithm="zlib", threshold=100)
+        self.assertEqual(compressor.encode({"a": 1}), b'{"a": 1}')
+        self.assertEqual(compressor.decode(b'{"a": 1}'), {"a": 1})
+        self.assertEqual(compressor.decode('{"a": 1}'), {"a": 1})
+        self.assertEqual(compressor.get_stats()["compress_count"], 0)
+    
+    def test_codec_tag(self):
+        """测试不同编解码器写入的条目可以相互读取"""
+        value = {"data": [{"id": 1, "title": "文档", "updated_at": "2024-01-01T00:00:00.000Z"}] * 50}
+        for name in ("json", "orjson", "msgpack"):
+            writer = ValueCompressor(algorithm="zlib", threshold=100, codec=get_codec(name))
+            reader = ValueCompressor(algorithm="none", codec=JsonCodec())
+            self.assertEqual(reader.decode(writer.encode(value)), value, name)
+            self.assertEqual(reader.decode(ValueCompressor(algorithm="none", codec=get_codec(name)).encode({"a": 1})), {"a": 1})
+    
+    def test_auto_codec(self):
+        """测试 auto 只选择 orjson 或 json，msgpack 需要明确指定"""
+        with patch("cache.orjson", None):
+            self.assertIsInstance(get_codec("auto"), JsonCodec)
+    
+    def test_zstd_per_thread(self):
+        """测试每个线程使用各自的zstd压缩器与解压器"""
+        created = []
+        
+        class FakeZstd:
+            """记录创建线程的zstd替身，压缩结果与zlib相同"""
+            
+            class ZstdCompressor:
+                def __init__(self, level):
+                    created.append(("compressor", threading.get_ident()))
+                
+                def compress(self, data):
+                    return zlib.compress(data)
+            
+            class ZstdDecompressor:
+                def __init__(self):
+                    created.append(("decompressor", threading.get_ident()))
+                
+                def decompress(self, data):
+                    return zlib.decompress(data)
+        
+        value = {"data": "x" * 2000}
+        with patch("cache.zstd", FakeZstd):
+            compressor = ValueCompressor(algorithm="zstd", threshold=100)
+            barrier = threading.Barrier(4)
+            def roundtrip():
+                for _ in range(3):
+                    self.assertEqual(compressor.decode(compressor.encode(value)), value)
+                # 等待所有线程完成，避免线程标识被复用
+                barrier.wait()
+            threads = [threading.Thread(target=roundtrip) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(created), 8)
+        self.assertEqual(len(set(created)), 8, "同一线程应复用压缩器与解压器，不同线程不应共享")
+    
+    def test_disabled(self):
+        """测试关闭压缩"""
+        compressor = ValueCompressor(algorithm="none", threshold=0)
+        value = {"data": "x" * 2000}
+        self.assertEqual(json.loads(compressor.encode(value)), value)
+
+
+class TestAsyncCacheManager(unittest.TestCase):
+    """测试异步缓存管理器"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.sync_manager = CacheManager()
+        self.sync_manager._connect_started = True
+        self.sync_manager.clear()
+        self.cache_manager = AsyncCacheManager(self.sync_manager)
+    
+    def test_async_basic_operations(self):
+        """测试异步设置、获取、删除及统计共享"""
+        async def run():
+            await self.cache_manager.set("test:async", {"v": 1}, expire=60)
+            self.assertEqual(await self.cache_manager.get("test:async"), {"v": 1})
+            await self.cache_manager.delete("test:async")
+            self.assertIsNone(await self.cache_manager.get("test:async"))
+            return await self.cache_manager.get_stats()
+        
+        stats = asyncio.run(run())
+        self.assertEqual(stats["hit_count"], 1)
+        self.assertEqual(stats["miss_count"], 1)
+        self.assertIn("redis_connected", stats)
+    
+    def test_coalesce_concurrent_requests(self):
+        """测试相同键的并发请求只执行一次上游调用"""
+        calls = []
+        
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"data": len(calls)}
+        
+        async def run():
+            return await asyncio.gather(*(self.cache_manager.coalesce("test:coalesce", fetch) for _ in range(10)))
+        
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1, "并发请求未被合并")
+        self.assertEqual(results, [{"data": 1}] * 10)
+        self.assertEqual(self.cache_manager.coalesced_count, 9)
+    
+    def test_coalesce_shares_exception(self):
+        """测试上游异常传递给所有等待者，且不会残留进行中的请求"""
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream error")
+        
+        async def run():
+            return await asyncio.gather(
+                *(self.cache_manager.coalesce("test:coalesce:error", fetch) for _ in range(3)),
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(self.cache_manager._inflight, {})
+    
+    def tearDown(self):
+        """清理测试环境"""
+        asyncio.run(self.cache_manager.clear())
+        asyncio.run(self.cache_manager.close())
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
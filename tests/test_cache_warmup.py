@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from cache_warmup import CacheWarmer, load_warmup_namespaces
+
+
+class FakeClient:
+    """记录调用的异步客户端"""
+    
+    def __init__(self, token):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+    
+    async def _call(self, *args, result=None):
+        self.calls.append(args)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if args[0] == "get_doc" and args[2] == "broken":
+            raise RuntimeError("文档不存在")
+        return result
+    
+    async def get_repo(self, namespace):
+        return await self._call("get_repo", namespace, result={"data": {"id": 7}})
+    
+    async def list_docs(self, namespace):
+        docs = [
+            {"slug": "old", "updated_at": "2024-01-01T00:00:00Z"},
+            {"slug": "new", "updated_at": "2024-03-01T00:00:00Z"},
+            {"slug": "broken", "updated_at": "2024-02-01T00:00:00Z"},
+        ]
+        return await self._call("list_docs", namespace, result={"data": docs})
+    
+    async def get_repo_toc(self, repo_id=None):
+        return await self._call("get_repo_toc", repo_id, result={"data": []})
+    
+    async def get_doc(self, namespace, slug):
+        return await self._call("get_doc", namespace, slug, result={"data": {}})
+
+
+class TestCacheWarmer(unittest.TestCase):
+    """测试缓存预热"""
+    
+    def test_load_namespaces(self):
+        """测试读取预热知识库配置"""
+        self.assertEqual(load_warmup_namespaces({"CACHE_WARMUP_NAMESPACES": " a/b, c/d ,"}), ["a/b", "c/d"])
+        self.assertEqual(load_warmup_namespaces({}), [])
+    
+    def test_run(self):
+        """测试预取详情、目录、文档列表和最近更新的文档，并限制并发"""
+        client = FakeClient("token")
+        warmer = CacheWarmer(["a/b", "c/d"], "token", concurrency=2, recent_docs=2, client_factory=lambda token: client)
+        self.assertTrue(asyncio.run(warmer.run()))
+        
+        self.assertIn(("get_repo_toc", 7), client.calls)
+        docs = [call[2] for call in client.calls if call[0] == "get_doc"]
+        self.assertEqual(sorted(docs), ["broken", "broken", "new", "new"], "应只预取最近更新的文档")
+        self.assertLessEqual(client.max_active, 2)
+        
+        status = warmer.get_status()
+        self.assertEqual(status["state"], "completed")
+        self.assertEqual(status["total"], 10)
+        self.assertEqual(status["completed"], 8)
+        self.assertEqual(status["failed"], 2)
+        self.assertEqual(status["run_count"], 1)
+    
+    def test_disabled(self):
+        """测试未配置知识库或Token时不预热"""
+        warmer = CacheWarmer([], "token")
+        self.assertFalse(asyncio.run(warmer.run()))
+        self.assertEqual(warmer.get_status()["state"], "disabled")
+        self.assertFalse(CacheWarmer(["a/b"], None).enabled)
+    
+    def test_targeted_run(self):
+        """测试管理接口指定知识库和Token预热，未配置预热知识库时也可执行"""
+        tokens = []
+        client = FakeClient("token")
+        
+        def factory(token):
+            tokens.append(token)
+            return client
+        
+        warmer = CacheWarmer([], None, recent_docs=1, client_factory=factory)
+        self.assertTrue(asyncio.run(warmer.run(["x/y"], "admin-token")))
+        self.assertEqual(tokens, ["admin-token"])
+        self.assertEqual({call[1] for call in client.calls if call[0] != "get_repo_toc"}, {"x/y"})
+        self.assertEqual(warmer.get_status()["targets"], ["x/y"])
+        
+        async def trigger():
+            self.assertTrue(warmer.trigger(["a/b"], "admin-token"))
+            await warmer._manual_task
+        
+        asyncio.run(trigger())
+        self.assertEqual(warmer.get_status()["targets"], ["a/b"])
+        self.assertFalse(CacheWarmer([], None).trigger(["a/b"]), "缺少Token时不应预热")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+启动耗时测试
+导入服务模块不应建立网络连接：Redis无响应时，stdio 与自动启动方式的冷启动导入耗时仍应在预算之内
+"""
+
+import os
+import sys
+import json
+import socket
+import tempfile
+import unittest
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入耗时预算（毫秒），较慢的环境可通过环境变量 IMPORT_BUDGET_MS 放宽
+IMPORT_BUDGET_MS = int(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+MEASURE_SCRIPT = """
+import json
+import time
+start = time.perf_counter()
+import {modules}
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+
+class TestStartupTime(unittest.TestCase):
+    """测试导入耗时"""
+    
+    def setUp(self):
+        """启动一个只监听、从不响应的端口，模拟无响应的Redis：连接成功，但命令一直等到超时"""
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.port = self.server.getsockname()[1]
+    
+    def tearDown(self):
+        """关闭监听端口"""
+        self.server.close()
+    
+    def measure_import(self, modules: str) -> float:
+        """在新的解释器中导入模块，返回导入耗时（毫秒）"""
+        with tempfile.TemporaryDirectory() as cwd:
+            with open(os.path.join(cwd, "yuque-config.env"), "w") as f:
+                f.write(f"REDIS_URL=redis://127.0.0.1:{self.port}/0\n")
+                f.write("REDIS_SOCKET_TIMEOUT=10\n")
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+            result = subprocess.run(
+                [sys.executable, "-c", MEASURE_SCRIPT.format(modules=modules)],
+                cwd=cwd, env=env, capture_output=True, text=True, timeout=60
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])["ms"]
+    
+    def test_import_clients(self):
+        """测试导入缓存模块与语雀客户端不等待Redis连接"""
+        elapsed = self.measure_import("cache, yuque_client, async_yuque_client")
+        self.assertLess(elapsed, IMPORT_BUDGET_MS, f"导入耗时 {elapsed:.0f}ms 超出预算")
+    
+    def test_import_async_app(self):
+        """测试导入异步服务（自动启动方式运行的服务）不等待Redis连接"""
+        elapsed = self.measure_import("app_async")
+        self.assertLess(elapsed, IMPORT_BUDGET_MS, f"导入耗时 {elapsed:.0f}ms 超出预算")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import json
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 from yuque_client import YuqueMCPClient
@@ -245,6 +247,330 @@ class TestYuqueMCPClient(unittest.TestCase):
         # 验证请求
         self.client.session.request.assert_called_once_with('DELETE', 'https://www.yuque.com/api/v2/repos/test-user/test-repo/docs/1')
     
+    def test_update_doc_invalidates_cache(self):
+        """测试更新文档后失效文档内容和文档列表缓存"""
+        mock_doc = MagicMock()
+        mock_doc.json.return_value = {"data": {"id": 1, "slug": "test-doc", "body": "旧内容"}}
+        mock_list = MagicMock()
+        mock_list.json.return_value = {"data": [{"id": 1, "slug": "test-doc"}]}
+        mock_update = MagicMock()
+        mock_update.json.return_value = {"data": {"id": 1, "slug": "test-doc", "body": "新内容"}}
+        mock_new_doc = MagicMock()
+        mock_new_doc.json.return_value = {"data": {"id": 1, "slug": "test-doc", "body": "新内容"}}
+        self.client.session.request.side_effect = [mock_doc, mock_list, mock_update, mock_new_doc, mock_list]
+        
+        # 预热缓存，再次读取不应请求上游
+        self.client.get_doc("test-user/test-repo", "test-doc")
+        self.client.list_docs("test-user/test-repo")
+        self.client.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(self.client.session.request.call_count, 2)
+        
+        # 更新后重新读取，应从上游获取新内容
+        self.client.update_doc("test-user/test-repo", 1, content="新内容")
+        result = self.client.get_doc("test-user/test-repo", "test-doc")
+        self.client.list_docs("test-user/test-repo")
+        self.assertEqual(result["data"]["body"], "新内容")
+        self.assertEqual(self.client.session.request.call_count, 5)
+    
+    def test_immutable_doc_version(self):
+        """测试文档的历史版本只有较长的硬过期，更新文档后仍从缓存读取"""
+        from cache import cache_manager, get_request_cache_key
+        mock_version = MagicMock()
+        mock_version.json.return_value = {"data": {"id": 9, "doc_id": 1, "body": "历史内容"}}
+        mock_update = MagicMock()
+        mock_update.json.return_value = {"data": {"id": 1, "slug": "test-doc"}}
+        self.client.session.request.side_effect = [mock_version, mock_update]
+        
+        self.client.get_doc_version(9)
+        self.client.update_doc("test-user/test-repo", 1, content="新内容")
+        result = self.client.get_doc_version(9)
+        self.assertEqual(result["data"]["body"], "历史内容")
+        self.assertEqual(self.client.session.request.call_count, 2)
+        
+        info = cache_manager.inspect(get_request_cache_key("GET", "/doc_versions/9", self.token))
+        self.assertEqual(info["ttl"]["source"], "immutable")
+        self.assertGreater(info["remaining"], 30 * 86400 - 60, "历史版本默认30天后过期")
+        self.assertIsNone(info["fresh_until"], "历史版本不应软过期")
+    
+    def test_stale_while_revalidate(self):
+        """测试软过期后先返回旧值，并在后台刷新缓存"""
+        from cache import cache_manager
+        cache_key = "yuque:GET:/repos/test-user/test-repo/docs/test-doc"
+        cache_manager.set(cache_key, {"data": {"body": "旧内容"}}, expire=3600, soft_expire=1)
+        cache_manager.grant_access("test-user/test-repo", self.client.tenant)
+        time.sleep(1.1)
+        
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": {"id": 1, "body": "新内容"}}
+        self.client.session.request.return_value = mock_response
+        
+        # 软过期期间立即返回旧值
+        result = self.client.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(result["data"]["body"], "旧内容")
+        
+        # 等待后台刷新完成
+        for _ in range(50):
+            if cache_manager.get(cache_key)["data"]["body"] == "新内容":
+                break
+            time.sleep(0.02)
+        self.assertEqual(cache_manager.get(cache_key)["data"]["body"], "新内容", "后台刷新未更新缓存")
+        self.assertFalse(cache_manager.get_entry(cache_key).is_stale)
+        self.client.session.request.assert_called_once()
+
+    def test_conditional_revalidation(self):
+        """测试软过期后携带 ETag 重验证，304 时沿用旧值并续期"""
+        from cache import cache_manager
+        cache_key = "yuque:GET:/repos/test-user/test-repo/docs/test-doc"
+        cache_manager.set(cache_key, {"data": {"body": "旧内容"}}, expire=3600, soft_expire=1,
+                          meta={"validators": {"etag": '"v1"'}, "size": 1024})
+        cache_manager.grant_access("test-user/test-repo", self.client.tenant)
+        time.sleep(1.1)
+        saved = cache_manager.revalidation_bytes_saved
+
+        mock_response = MagicMock()
+        mock_response.status_code = 304
+        self.client.session.request.return_value = mock_response
+
+        result = self.client.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(result["data"]["body"], "旧内容")
+        for _ in range(50):
+            if not cache_manager.get_entry(cache_key).is_stale:
+                break
+            time.sleep(0.02)
+        self.assertFalse(cache_manager.get_entry(cache_key).is_stale, "304 后未续期")
+        self.assertEqual(cache_manager.revalidation_bytes_saved - saved, 1024)
+        _, kwargs = self.client.session.request.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": '"v1"'})
+
+    def test_revalidation_with_doc_list(self):
+        """测试文档列表中的 updated_at 未变化时，无需请求上游即可续期"""
+        from cache import cache_manager
+        cache_key = "yuque:GET:/repos/test-user/test-repo/docs/test-doc"
+        cache_manager.set("yuque:GET:/repos/test-user/test-repo/docs",
+                          {"data": [{"slug": "test-doc", "updated_at": "2024-01-01T00:00:00Z"}]}, expire=3600,
+                          meta={"fetched_at": time.time()})
+        cache_manager.set(cache_key, {"data": {"body": "旧内容"}}, expire=3600, soft_expire=1,
+                          meta={"validators": {"updated_at": "2024-01-01T00:00:00Z"}, "fetched_at": time.time() - 60})
+        cache_manager.grant_access("test-user/test-repo", self.client.tenant)
+        time.sleep(1.1)
+
+        result = self.client.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(result["data"]["body"], "旧内容")
+        self.assertFalse(cache_manager.get_entry(cache_key).is_stale)
+        self.client.session.request.assert_not_called()
+
+    def test_revalidation_ignores_older_doc_list(self):
+        """测试早于文档条目获取的文档列表不能用于续期，仍发送条件请求"""
+        from cache import cache_manager
+        cache_key = "yuque:GET:/repos/test-user/test-repo/docs/test-doc"
+        cache_manager.set("yuque:GET:/repos/test-user/test-repo/docs",
+                          {"data": [{"slug": "test-doc", "updated_at": "2024-01-01T00:00:00Z"}]}, expire=3600,
+                          meta={"fetched_at": time.time() - 60})
+        cache_manager.set(cache_key, {"data": {"body": "旧内容"}}, expire=3600, soft_expire=1,
+                          meta={"validators": {"updated_at": "2024-01-01T00:00:00Z"}, "fetched_at": time.time()})
+        cache_manager.grant_access("test-user/test-repo", self.client.tenant)
+        time.sleep(1.1)
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": {"body": "新内容", "updated_at": "2024-02-01T00:00:00Z"}}
+        self.client.session.request.return_value = mock_response
+        
+        self.assertEqual(self.client.get_doc("test-user/test-repo", "test-doc")["data"]["body"], "旧内容")
+        for _ in range(50):
+            if cache_manager.get(cache_key)["data"]["body"] == "新内容":
+                break
+            time.sleep(0.02)
+        self.assertEqual(cache_manager.get(cache_key)["data"]["body"], "新内容")
+        self.client.session.request.assert_called_once()
+    
+    def test_cache_partitioned_by_token(self):
+        """测试用户类接口按Token隔离，知识库内容只在已证明有权访问的Token间共享"""
+        other = YuqueMCPClient("other-token")
+        other.session = MagicMock()
+        
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": {"login": "user-a"}}
+        self.client.session.request.return_value = mock_response
+        other_response = MagicMock()
+        other_response.json.return_value = {"data": {"login": "user-b"}}
+        other.session.request.return_value = other_response
+        self.assertEqual(self.client.get_user_info()["data"]["login"], "user-a")
+        self.assertEqual(other.get_user_info()["data"]["login"], "user-b")
+        self.assertEqual(self.client.get_user_info()["data"]["login"], "user-a")
+        
+        # 其他Token第一次读取私有知识库的文档需要请求上游，成功后才共享缓存
+        mock_response.json.return_value = {"data": {"id": 1, "body": "内容"}}
+        self.client.get_doc("test-user/test-repo", "test-doc")
+        other_response.json.return_value = {"data": {"id": 1, "body": "内容"}}
+        other.get_doc("test-user/test-repo", "test-doc")
+        other.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(self.client.session.request.call_count, 2)
+        self.assertEqual(other.session.request.call_count, 2)
+        
+        from cache import cache_manager
+        tenants = cache_manager.get_stats()["tenants"]
+        self.assertEqual(tenants[other.tenant]["hit_count"], 1)
+        self.assertNotIn("other-token", json.dumps(tenants), "Token不应明文出现在统计中")
+    
+    def test_negative_cache(self):
+        """测试 404 结果被短暂缓存，并在创建同名文档后失效"""
+        import requests
+        error_response = requests.Response()
+        error_response.status_code = 404
+        error_response._content = b'{"message": "Not Found"}'
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404", response=error_response)
+        self.client.session.request.return_value = mock_response
+        
+        for _ in range(3):
+            with self.assertRaises(requests.exceptions.HTTPError) as ctx:
+                self.client.get_doc("test-user/test-repo", "missing")
+            self.assertEqual(ctx.exception.response.status_code, 404)
+        self.client.session.request.assert_called_once()
+        
+        created = MagicMock()
+        created.json.return_value = {"data": {"id": 9, "slug": "missing"}}
+        self.client.session.request.return_value = created
+        self.client.create_doc("test-user/test-repo", "新文档", "内容")
+        self.client.get_doc("test-user/test-repo", "missing")
+        self.assertEqual(self.client.session.request.call_count, 3, "创建文档后否定缓存应失效")
+    
+    def test_negative_cache_keeps_shared_entry(self):
+        """测试未证明有权访问知识库的Token得到 404 时，不删除其他租户写入的共享条目"""
+        import requests
+        from cache import cache_manager
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": {"id": 1, "body": "内容"}}
+        self.client.session.request.return_value = mock_response
+        self.client.get_doc("test-user/test-repo", "test-doc")
+        
+        other = YuqueMCPClient("other-token")
+        other.session = MagicMock()
+        error_response = requests.Response()
+        error_response.status_code = 404
+        error_response._content = b'{"message": "Not Found"}'
+        other.session.request.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError("404", response=error_response)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            other.get_doc("test-user/test-repo", "test-doc")
+        
+        self.assertIsNotNone(cache_manager.get("yuque:GET:/repos/test-user/test-repo/docs/test-doc"))
+        self.assertEqual(self.client.get_doc("test-user/test-repo", "test-doc")["data"]["body"], "内容")
+        self.client.session.request.assert_called_once()
+        
+        # 已证明有权访问的Token得到 404，说明文档确已删除
+        self.client._store_negative("/repos/test-user/test-repo/docs/test-doc",
+                                    "yuque:GET:/repos/test-user/test-repo/docs/test-doc", 404, "Not Found")
+        self.assertIsNone(cache_manager.get("yuque:GET:/repos/test-user/test-repo/docs/test-doc"))
+    
+    def test_doc_write_invalidates_toc_by_repo_id(self):
+        """测试文档写操作同时按知识库的数字ID失效目录与知识库详情"""
+        def respond(method, url, **kwargs):
+            response = MagicMock()
+            if method == "GET" and url.endswith("/repos/123/toc"):
+                response.json.return_value = {"data": [{"title": "目录"}]}
+            elif method == "GET":
+                response.json.return_value = {"data": {"id": 123, "namespace": "test-user/test-repo"}}
+            else:
+                response.json.return_value = {"data": {"id": 1, "slug": "new-doc", "book_id": 123}}
+            return response
+        self.client.session.request.side_effect = respond
+        
+        for write in (lambda: self.client.create_doc("test-user/test-repo", "新文档", "内容"),
+                      lambda: self.client.update_doc("test-user/test-repo", 1, content="新内容"),
+                      lambda: self.client.delete_doc("test-user/test-repo", 1)):
+            self.client.get_repo_toc(repo_id=123)
+            self.client.get_repo(123)
+            calls = self.client.session.request.call_count
+            self.client.get_repo_toc(repo_id=123)
+            self.client.get_repo(123)
+            self.assertEqual(self.client.session.request.call_count, calls, "写操作前应命中缓存")
+            write()
+            calls = self.client.session.request.call_count
+            self.client.get_repo_toc(repo_id=123)
+            self.client.get_repo(123)
+            self.assertEqual(self.client.session.request.call_count, calls + 2, "文档写操作后目录与知识库详情应失效")
+    
+    def test_get_doc_with_repo_prefetch(self):
+        """测试文档与知识库详情的缓存通过一次批量读取取得"""
+        def respond(method, url, **kwargs):
+            response = MagicMock()
+            if url.endswith("/docs/test-doc"):
+                response.json.return_value = {"data": {"id": 1, "slug": "test-doc", "body": "内容"}}
+            else:
+                response.json.return_value = {"data": {"id": 7, "namespace": "test-user/test-repo"}}
+            return response
+        self.client.session.request.side_effect = respond
+        
+        doc, repo = self.client.get_doc_with_repo("test-user/test-repo", "test-doc")
+        self.assertEqual(doc["data"]["body"], "内容")
+        self.assertEqual(repo["data"]["id"], 7)
+        self.assertEqual(self.client.session.request.call_count, 2)
+        
+        from cache import cache_manager
+        with patch.object(cache_manager, "get_entry") as get_entry, patch.object(cache_manager, "has_access") as has_access:
+            doc, repo = self.client.get_doc_with_repo("test-user/test-repo", "test-doc")
+        get_entry.assert_not_called()
+        has_access.assert_not_called()
+        self.assertEqual(doc["data"]["body"], "内容")
+        self.assertEqual(repo["data"]["id"], 7)
+        self.assertEqual(self.client.session.request.call_count, 2)
+        self.assertEqual(self.client._prefetched, {}, "预取结果用完后应清空")
+    
+    def test_list_repos_prefetch(self):
+        """测试已知登录名时，用户信息与知识库列表一次批量读取"""
+        def respond(method, url, **kwargs):
+            response = MagicMock()
+            if url.endswith("/user"):
+                response.json.return_value = {"data": {"login": "test-user"}}
+            else:
+                response.json.return_value = {"data": [{"id": 1, "name": "测试知识库"}]}
+            return response
+        self.client.session.request.side_effect = respond
+        self.client.list_repos()
+        
+        from cache import cache_manager
+        with patch.object(cache_manager, "get_entry") as get_entry:
+            result = self.client.list_repos()
+        get_entry.assert_not_called()
+        self.assertEqual(result["data"][0]["name"], "测试知识库")
+        self.assertEqual(self.client.session.request.call_count, 2)
+    
+    def test_render_cache(self):
+        """测试渲染结果按源条目版本缓存，源条目变化后重新渲染"""
+        bodies = ["旧内容", "旧内容", "新内容"]
+        def respond(method, url, **kwargs):
+            response = MagicMock()
+            response.json.return_value = {"data": {"id": 1, "slug": "test-doc", "body": bodies.pop(0)}}
+            return response
+        self.client.session.request.side_effect = respond
+        formatter = MagicMock(side_effect=lambda: f"渲染: {result['data']['body']}")
+        arguments = {"namespace": "test-user/test-repo", "slug": "test-doc"}
+        
+        # 首次渲染后，相同版本的源条目直接返回缓存的渲染结果
+        for _ in range(2):
+            client = YuqueMCPClient(self.token)
+            client.session = self.client.session
+            result = client.get_doc("test-user/test-repo", "test-doc")
+            self.assertEqual(client.render("get_doc", arguments, formatter), "渲染: 旧内容")
+        self.assertEqual(formatter.call_count, 1)
+        
+        # 源条目被重新获取但内容未变，版本相同，渲染结果仍然有效
+        from cache import cache_manager, get_request_cache_key
+        doc_key = get_request_cache_key("GET", "/repos/test-user/test-repo/docs/test-doc", self.token)
+        cache_manager.delete(doc_key)
+        client = YuqueMCPClient(self.token)
+        client.session = self.client.session
+        result = client.get_doc("test-user/test-repo", "test-doc")
+        client.render("get_doc", arguments, formatter)
+        self.assertEqual(formatter.call_count, 1)
+        
+        # 源条目内容变化后重新渲染
+        cache_manager.delete(doc_key)
+        client = YuqueMCPClient(self.token)
+        client.session = self.client.session
+        result = client.get_doc("test-user/test-repo", "test-doc")
+        self.assertEqual(client.render("get_doc", arguments, formatter), "渲染: 新内容")
+        self.assertEqual(formatter.call_count, 2)
+    
     def test_build_repo_path_with_repo_id(self):
         """测试使用repo_id构建路径"""
         path = self.client._build_repo_path(repo_id=123)
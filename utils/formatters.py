@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 def format_user_info(user_data: Dict[str, Any]) -> str:
@@ -344,3 +344,23 @@ def format_repo_toc(toc_data: Dict[str, Any]) -> str:
     body: str = toc.get('body', '')
     return f"""📑 知识库目录：
 {body}"""
+
+
+def format_cache_hot_keys(keys: List[Dict[str, Any]]) -> str:
+    """格式化最热的缓存键"""
+    if not keys:
+        return "暂无缓存命中记录"
+    
+    result: list[str] = ["🔥 最热的缓存键:"]
+    for item in keys:
+        remaining = item.get('remaining')
+        if remaining is None:
+            expire = '未知'
+        elif remaining < 0:
+            expire = '永不过期'
+        else:
+            expire = f"{int(remaining)} 秒"
+        result.append(f"- {item.get('key')}")
+        result.append(f"  命中: {item.get('hits', 0)} | 大小: {item.get('size') or 0} 字节 | 剩余: {expire}")
+    
+    return "\n".join(result)